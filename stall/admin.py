@@ -1,19 +1,69 @@
+from django import forms
 from django.contrib import admin
-from .models import Category, Author, Publisher, Book, Member, BorrowRecord, BookCopy, Reservation
+from django.core.paginator import Paginator
+from django.db import connections
+from django.urls import reverse
+from django.utils.functional import cached_property
+from .circulation import checkout, return_copy
+from .models import Category, Author, Publisher, Book, Member, BorrowRecord, BookCopy, Reservation, FinePolicy, FineEntry, BookRecommendation, Job, CirculationEvent, ArchivedBorrowRecord
+
+class EstimatedCountPaginator(Paginator):
+    """Uses the planner's row estimate for unfiltered changelists on big tables.
+
+    An exact COUNT(*) over millions of rows is a full scan; the estimate is a
+    catalog lookup. Filtered lists, small tables and backends without an
+    estimate fall back to the exact count.
+    """
+    threshold = 100000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = self._estimate(self.object_list)
+            if estimate is not None and estimate > self.threshold:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def _estimate(queryset):
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+            elif connection.vendor == 'mysql':
+                cursor.execute(
+                    'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s',
+                    [table]
+                )
+            else:
+                return None
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables that grow without bound"""
+    paginator = EstimatedCountPaginator
+    # Skip the second COUNT(*) Django runs to show "x of y" on filtered lists
+    show_full_result_count = False
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
+    ordering = ['name']
     list_display = ['name', 'created_at']
     search_fields = ['name']
 
 @admin.register(Author)
 class AuthorAdmin(admin.ModelAdmin):
+    ordering = ['last_name', 'first_name']
     list_display = ['first_name', 'last_name', 'nationality', 'birth_date']
     search_fields = ['first_name', 'last_name', 'nationality']
     list_filter = ['nationality']
 
 @admin.register(Publisher)
 class PublisherAdmin(admin.ModelAdmin):
+    ordering = ['name']
     list_display = ['name', 'established_year', 'created_at']
     search_fields = ['name']
     list_filter = ['established_year']
@@ -21,30 +71,94 @@ class PublisherAdmin(admin.ModelAdmin):
 class BookCopyInline(admin.TabularInline):
     model = BookCopy
     extra = 1
+    fields = ['copy_number', 'barcode', 'condition', 'is_available', 'location_shelf', 'notes']
+    # Availability follows loans; it changes through checkout and return only
+    readonly_fields = ['is_available']
 
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
-    list_display = ['title', 'author_names', 'category', 'publisher', 'isbn', 'is_available']
+class BookAdmin(LargeTableAdmin):
+    ordering = ['title']
+    list_display = ['title', 'author_names', 'category', 'publisher', 'isbn', 'available_copies', 'total_copies', 'is_available']
     list_filter = ['category', 'language', 'is_available', 'publication_date']
+    list_select_related = ['category', 'publisher']
     search_fields = ['title', 'isbn', 'authors__first_name', 'authors__last_name']
-    filter_horizontal = ['authors']
-    list_editable = ['is_available']
+    autocomplete_fields = ['authors', 'category', 'publisher']
+    readonly_fields = ['total_copies', 'available_copies', 'is_available']
     inlines = [BookCopyInline]
 
+    class Media:
+        # Prefills a new book from the local ISBN index when its ISBN is entered
+        js = ['stall/isbn_autofill.js']
+
+    def formfield_for_dbfield(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_dbfield(db_field, request, **kwargs)
+        if db_field.name == 'isbn':
+            formfield.widget.attrs['data-lookup-url'] = reverse('isbn_lookup_api')
+        return formfield
+
+    def get_queryset(self, request):
+        # author_names reads the prefetched authors: one query per page, not per row
+        return super().get_queryset(request).prefetch_related('authors')
+
 @admin.register(Member)
-class MemberAdmin(admin.ModelAdmin):
+class MemberAdmin(LargeTableAdmin):
+    ordering = ['membership_id']
     list_display = ['membership_id', 'first_name', 'last_name', 'email', 'membership_type', 'is_active']
     list_filter = ['membership_type', 'is_active', 'date_joined']
     search_fields = ['membership_id', 'first_name', 'last_name', 'email']
     list_editable = ['is_active']
 
+class BorrowRecordAdminForm(forms.ModelForm):
+    class Meta:
+        model = BorrowRecord
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        book, copy = cleaned_data.get('book'), cleaned_data.get('copy')
+        if self.instance.pk is None and book is not None:
+            # A new loan takes a copy off the shelf, so one has to be there
+            if copy is not None and copy.book_id != book.pk:
+                self.add_error('copy', f'This copy belongs to "{copy.book.title}".')
+            elif copy is not None and not copy.is_available:
+                self.add_error('copy', 'This copy is already checked out.')
+            elif copy is None and not book.available_copies:
+                self.add_error('book', f'No copies of "{book.title}" are available.')
+        return cleaned_data
+
 @admin.register(BorrowRecord)
-class BorrowRecordAdmin(admin.ModelAdmin):
+class BorrowRecordAdmin(LargeTableAdmin):
+    form = BorrowRecordAdminForm
     list_display = ['book', 'member', 'borrow_date', 'due_date', 'return_date', 'status', 'is_overdue']
     list_filter = ['status', 'borrow_date', 'due_date', 'return_date']
+    list_select_related = ['book', 'member']
     search_fields = ['book__title', 'member__first_name', 'member__last_name', 'member__membership_id']
-    list_editable = ['status', 'return_date']
+    autocomplete_fields = ['member', 'book', 'copy']
     readonly_fields = ['borrow_date', 'is_overdue', 'days_overdue']
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None:
+            # A new loan is a checkout; it is returned afterwards
+            return self.readonly_fields + ['return_date', 'status']
+        # Moving a loan to another book or copy would leave the copy counters behind
+        readonly = self.readonly_fields + ['member', 'book', 'copy']
+        # Reopening a returned loan would need a copy claimed back; do that with a new loan
+        if obj.return_date:
+            readonly += ['return_date', 'status']
+        return readonly
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            # Claims the copy and updates the counters like the desk does
+            loan = checkout(obj.member, obj.book, obj.due_date, issued_by=request.user, copy=obj.copy, notes=obj.notes)
+            obj.pk, obj.copy, obj.due_date, obj.borrow_date, obj.status = loan.pk, loan.copy, loan.due_date, loan.borrow_date, loan.status
+            return
+        was_open = BorrowRecord.objects.filter(pk=obj.pk, return_date__isnull=True).exists()
+        if was_open and (obj.return_date or obj.status == 'returned'):
+            # A return entered here releases the copy, assesses the fine and serves holds like the desk does
+            return_copy(obj, issued_by=request.user, returned_on=obj.return_date)
+        else:
+            super().save_model(request, obj, form, change)
     
     def is_overdue(self, obj):
         return obj.is_overdue
@@ -52,15 +166,78 @@ class BorrowRecordAdmin(admin.ModelAdmin):
     is_overdue.short_description = 'Overdue'
 
 @admin.register(BookCopy)
-class BookCopyAdmin(admin.ModelAdmin):
-    list_display = ['book', 'copy_number', 'condition', 'is_available', 'location_shelf']
+class BookCopyAdmin(LargeTableAdmin):
+    ordering = ['book', 'copy_number']
+    list_display = ['book', 'copy_number', 'barcode', 'condition', 'is_available', 'location_shelf']
     list_filter = ['condition', 'is_available', 'acquisition_date']
-    search_fields = ['book__title', 'copy_number', 'location_shelf']
-    list_editable = ['condition', 'is_available', 'location_shelf']
+    list_select_related = ['book']
+    search_fields = ['book__title', 'copy_number', 'barcode', 'location_shelf']
+    autocomplete_fields = ['book']
+    list_editable = ['condition', 'location_shelf']
+    readonly_fields = ['is_available']
 
 @admin.register(Reservation)
-class ReservationAdmin(admin.ModelAdmin):
+class ReservationAdmin(LargeTableAdmin):
     list_display = ['book', 'member', 'reservation_date', 'status', 'expiry_date']
     list_filter = ['status', 'reservation_date', 'expiry_date']
+    list_select_related = ['book', 'member']
     search_fields = ['book__title', 'member__first_name', 'member__last_name']
+    autocomplete_fields = ['member', 'book']
     list_editable = ['status']
+
+@admin.register(FinePolicy)
+class FinePolicyAdmin(admin.ModelAdmin):
+    list_display = ['membership_type', 'rate_per_day', 'grace_days', 'max_fine']
+    list_editable = ['rate_per_day', 'grace_days', 'max_fine']
+
+@admin.register(FineEntry)
+class FineEntryAdmin(LargeTableAdmin):
+    ordering = ['-created_at']
+    list_display = ['member', 'kind', 'amount', 'days_late', 'borrow_record', 'updated_at']
+    list_filter = ['kind', 'created_at']
+    list_select_related = ['member', 'borrow_record__book', 'borrow_record__member']
+    search_fields = ['member__first_name', 'member__last_name', 'member__membership_id']
+    autocomplete_fields = ['member', 'borrow_record']
+
+@admin.register(BookRecommendation)
+class BookRecommendationAdmin(LargeTableAdmin):
+    list_display = ['book', 'rank', 'recommended', 'score', 'shared_borrowers']
+    list_select_related = ['book', 'recommended']
+    search_fields = ['book__title']
+    autocomplete_fields = ['book', 'recommended']
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ['name', 'status', 'attempts', 'run_after', 'started_at', 'finished_at', 'worker']
+    list_filter = ['status', 'name']
+    search_fields = ['name', 'dedup_key']
+    readonly_fields = ['result', 'last_error', 'worker', 'started_at', 'finished_at', 'created_at']
+
+@admin.register(CirculationEvent)
+class CirculationEventAdmin(LargeTableAdmin):
+    list_display = ['occurred_at', 'kind', 'loan_id', 'book_id', 'member_id', 'copy_id', 'status', 'due_date']
+    list_filter = ['kind', 'occurred_at']
+
+    # The log is append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(ArchivedBorrowRecord)
+class ArchivedBorrowRecordAdmin(LargeTableAdmin):
+    list_display = ['book', 'member', 'borrow_date', 'due_date', 'return_date', 'status', 'fine_amount', 'archived_at']
+    list_filter = ['status', 'borrow_date', 'return_date']
+    list_select_related = ['book', 'member']
+    search_fields = ['book__title', 'member__first_name', 'member__last_name', 'member__membership_id']
+
+    # Archived loans are history; they are only ever added by the archive job
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,65 @@
+"""Moving old returned loans out of the hot BorrowRecord table.
+
+Open-loan lookups, dashboard counts and member histories all read
+BorrowRecord, so years of returned loans slow every one of them down.
+archive_returned_loans() moves loans returned before a cutoff into
+ArchivedBorrowRecord, keeping their ids (the circulation log and fine ledger
+still point at them), one chunk per transaction so desk traffic is never
+blocked for long. Reports, trending and recommendations read both tables;
+member pages read the archive only when asked.
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import ArchivedBorrowRecord, BorrowRecord, FineEntry
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 365
+
+ARCHIVED_FIELDS = (
+    'id', 'member_id', 'book_id', 'copy_id', 'borrow_date', 'due_date', 'return_date',
+    'status', 'fine_amount', 'notes', 'issued_by_id',
+)
+
+
+def cutoff(days=None, today=None):
+    """Loans returned before this date are archived"""
+    if days is None:
+        days = getattr(settings, 'LOAN_ARCHIVE_AFTER_DAYS', DEFAULT_ARCHIVE_AFTER_DAYS)
+    return (today or date.today()) - timedelta(days=days)
+
+
+def archivable(days=None):
+    # Served by borrow_open_due_idx, which leads with return_date
+    return BorrowRecord.objects.filter(return_date__lt=cutoff(days))
+
+
+def _archive_chunk(days, chunk_size):
+    with transaction.atomic():
+        ids = list(
+            archivable(days).order_by().select_for_update(skip_locked=True).values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return 0
+        loans = BorrowRecord.objects.filter(pk__in=ids)
+        ArchivedBorrowRecord.objects.bulk_create(
+            [ArchivedBorrowRecord(**row) for row in loans.values(*ARCHIVED_FIELDS)],
+            batch_size=1000,
+        )
+        FineEntry.objects.filter(borrow_record_id__in=ids).update(archived_loan_id=F('borrow_record_id'), borrow_record=None)
+        # Overdue reminders for these loans go with them
+        loans.delete()
+    return len(ids)
+
+
+def archive_returned_loans(days=None, chunk_size=1000):
+    """Move loans returned more than `days` ago to the archive; returns how many moved"""
+    moved = 0
+    while True:
+        count = _archive_chunk(days, chunk_size)
+        if not count:
+            return moved
+        moved += count
+
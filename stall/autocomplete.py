@@ -0,0 +1,199 @@
+"""In-memory prefix index for the typeahead search boxes.
+
+Each searchable object contributes a few normalized terms (the whole title
+plus each word, names, membership ID, email). Terms are kept in sorted lists,
+one per kind and term length, so a prefix lookup bisects the shortest lengths
+first and stops once a page of results is filled; kinds that weren't asked
+for are never scanned. Signals keep the index current within this process; a
+periodic full rebuild on a background thread picks up changes made by other
+worker processes.
+"""
+import heapq
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connections
+from django.urls import reverse
+
+from .models import Author, Book, Member
+
+KINDS = ('book', 'author', 'member')
+
+MIN_PREFIX_LENGTH = 1
+
+MAX_LIMIT = 20
+
+
+def normalize(text):
+    """Lowercase and strip accents so 'Émile' matches 'emile'"""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).casefold().strip()
+
+
+def _book_entry(book):
+    title = normalize(book.title)
+    return book.title, reverse('book_detail', args=[book.pk]), {title, *title.split()}
+
+
+def _author_entry(author):
+    first, last = normalize(author.first_name), normalize(author.last_name)
+    return author.full_name, reverse('author_detail', args=[author.pk]), {first, last, f'{first} {last}'.strip()}
+
+
+def _member_entry(member):
+    terms = {
+        normalize(member.membership_id),
+        normalize(member.email),
+        normalize(member.first_name),
+        normalize(member.last_name),
+    }
+    return str(member), reverse('member_detail', args=[member.pk]), terms
+
+
+SOURCES = {
+    'book': (Book, _book_entry, lambda: Book.objects.only('id', 'title')),
+    'author': (Author, _author_entry, lambda: Author.objects.only('id', 'first_name', 'last_name')),
+    'member': (
+        Member,
+        _member_entry,
+        lambda: Member.objects.filter(is_active=True).only(
+            'id', 'membership_id', 'email', 'first_name', 'last_name'
+        ),
+    ),
+}
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {kind: {} for kind in KINDS}   # kind -> {term length -> sorted (term, label, pk)}
+        self._entries = {}     # (kind, pk) -> (label, url, terms)
+        self._built_at = None
+        self._built = threading.Event()
+        self._rebuilding = None   # changes saved while a rebuild reads the database
+        self._thread = None
+
+    def _stale(self):
+        max_age = getattr(settings, 'AUTOCOMPLETE_REFRESH_SECONDS', 300)
+        return self._built_at is None or time.monotonic() - self._built_at > max_age
+
+    def _refresh(self):
+        """Rebuild on a background thread when stale; only the very first search waits for it"""
+        if self._stale():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._rebuild_in_thread, name='autocomplete-rebuild', daemon=True)
+                    self._thread.start()
+        if not self._built.is_set():
+            self._built.wait(getattr(settings, 'AUTOCOMPLETE_FIRST_BUILD_WAIT', 10))
+
+    def _rebuild_in_thread(self):
+        try:
+            self.rebuild()
+        finally:
+            connections.close_all()
+
+    def rebuild(self):
+        with self._lock:
+            self._rebuilding = []
+        buckets, entries = {kind: {} for kind in KINDS}, {}
+        try:
+            for kind, (_, make_entry, queryset) in SOURCES.items():
+                for obj in queryset().iterator():
+                    label, url, terms = make_entry(obj)
+                    terms = tuple(t for t in terms if t)
+                    entries[(kind, obj.pk)] = (label, url, terms)
+                    for term in terms:
+                        buckets[kind].setdefault(len(term), []).append((term, normalize(label), obj.pk))
+            for by_length in buckets.values():
+                for bucket in by_length.values():
+                    bucket.sort()
+        except Exception:
+            with self._lock:
+                self._rebuilding = None
+            raise
+        with self._lock:
+            self._buckets, self._entries = buckets, entries
+            # Replay saves that landed after the querysets above were read
+            pending, self._rebuilding = self._rebuilding, None
+            for kind, pk, entry in pending:
+                self._remove_locked(kind, pk)
+                if entry is not None:
+                    self._insert_locked(kind, pk, entry)
+            self._built_at = time.monotonic()
+        self._built.set()
+
+    def _insert_locked(self, kind, pk, entry):
+        self._entries[(kind, pk)] = entry
+        for term in entry[2]:
+            insort(self._buckets[kind].setdefault(len(term), []), (term, normalize(entry[0]), pk))
+
+    def _remove_locked(self, kind, pk):
+        entry = self._entries.pop((kind, pk), None)
+        if entry is None:
+            return
+        for term in entry[2]:
+            key = (term, normalize(entry[0]), pk)
+            bucket = self._buckets[kind].get(len(term), [])
+            i = bisect_left(bucket, key)
+            if i < len(bucket) and bucket[i] == key:
+                del bucket[i]
+
+    def _change(self, kind, pk, entry):
+        with self._lock:
+            if self._rebuilding is not None:
+                self._rebuilding.append((kind, pk, entry))
+            self._remove_locked(kind, pk)
+            if entry is not None:
+                self._insert_locked(kind, pk, entry)
+
+    def update(self, kind, obj):
+        """Re-index a single object after it was saved"""
+        if self._built_at is None and self._rebuilding is None:
+            return  # nothing built yet; the first search will load everything
+        _, make_entry, queryset = SOURCES[kind]
+        entry = None
+        if kind != 'member' or obj.is_active:
+            label, url, terms = make_entry(obj)
+            entry = (label, url, tuple(t for t in terms if t))
+        self._change(kind, obj.pk, entry)
+
+    def remove(self, kind, pk):
+        self._change(kind, pk, None)
+
+    def search(self, prefix, kinds=KINDS, limit=10):
+        """Objects with any term starting with `prefix`: shortest match first, then by term and label"""
+        prefix = normalize(prefix)
+        if len(prefix) < MIN_PREFIX_LENGTH or limit < 1:
+            return []
+        self._refresh()
+
+        def matching(kind, bucket):
+            i = bisect_left(bucket, (prefix,))
+            while i < len(bucket) and bucket[i][0].startswith(prefix):
+                yield bucket[i], kind
+                i += 1
+
+        found = {}
+        with self._lock:
+            buckets = [(kind, self._buckets[kind]) for kind in kinds]
+            lengths = sorted({length for _, by_length in buckets for length in by_length if length >= len(prefix)})
+            # Shorter terms first; within a length, each kind's run is already in rank order
+            for length in lengths:
+                runs = [matching(kind, by_length[length]) for kind, by_length in buckets if length in by_length]
+                for (_, _, pk), kind in heapq.merge(*runs):
+                    found.setdefault((kind, pk), None)
+                    if len(found) >= limit:
+                        break
+                if len(found) >= limit:
+                    break
+            return [
+                {'type': kind, 'id': pk, 'label': self._entries[(kind, pk)][0], 'url': self._entries[(kind, pk)][1]}
+                for kind, pk in found
+            ]
+
+
+index = PrefixIndex()
@@ -1,14 +1,31 @@
-import google.generativeai as genai
 from django.conf import settings
+from django.utils.functional import cached_property
 from .models import Book, Author, Category, Member, BorrowRecord
+from .recommendations import also_borrowed_for
+from .trending import top_books
+from . import metrics
 from django.db.models import Q
 import json
+import time
+
+# Seconds to wait for Gemini before giving up on a reply
+RESPONSE_TIMEOUT = 30
+
+def _failure(error):
+    """Outcome label for a failed Gemini call"""
+    # google.api_core raises DeadlineExceeded; checked by name to keep the SDK import lazy
+    if isinstance(error, TimeoutError) or type(error).__name__ == 'DeadlineExceeded':
+        return 'timeout'
+    return 'error'
 
 class LibraryChatbot:
-    def __init__(self):
+    @cached_property
+    def model(self):
+        # The Gemini SDK takes about a second to import, so only load it once someone chats
+        import google.generativeai as genai
         genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
-        
+        return genai.GenerativeModel('gemini-2.0-flash-exp')
+    
     def get_library_context(self):
         """Get current library context for the chatbot"""
         total_books = Book.objects.count()
@@ -26,13 +43,15 @@ class LibraryChatbot:
     
     def search_books(self, query):
         """Search for books based on user query"""
-        books = Book.objects.filter(
+        books = list(Book.objects.filter(
             Q(title__icontains=query) |
-            Q(authors__name__icontains=query) |
+            Q(authors__first_name__icontains=query) |
+            Q(authors__last_name__icontains=query) |
             Q(description__icontains=query) |
             Q(isbn__icontains=query)
-        ).distinct()[:5]
+        ).distinct().select_related('category').prefetch_related('authors')[:5])
         
+        also_borrowed = also_borrowed_for([book.id for book in books])
         book_list = []
         for book in books:
             book_list.append({
@@ -40,10 +59,24 @@ class LibraryChatbot:
                 'authors': book.author_names,
                 'category': book.category.name,
                 'available': book.is_available,
-                'isbn': book.isbn
+                'isbn': book.isbn,
+                'members_also_borrowed': also_borrowed.get(book.id, [])
             })
         return book_list
     
+    def get_popular_books(self):
+        """Most borrowed books this month with what their readers also borrowed"""
+        books = top_books(days=30, limit=5)
+        also_borrowed = also_borrowed_for([book.id for book in books])
+        return [
+            {
+                'title': book.title,
+                'times_borrowed': book.borrow_count,
+                'members_also_borrowed': also_borrowed.get(book.id, [])
+            }
+            for book in books
+        ]
+    
     def get_chat_response(self, user_message):
         """Generate response using Gemini AI"""
         try:
@@ -58,6 +91,10 @@ class LibraryChatbot:
                 if search_terms:
                     search_results = self.search_books(search_terms)
             
+            popular_books = None
+            if any(keyword in user_message.lower() for keyword in ['recommend', 'popular', 'suggest']):
+                popular_books = self.get_popular_books()
+            
             # Create system prompt
             system_prompt = f"""
             You are a helpful library assistant chatbot for a digital library management system. 
@@ -87,8 +124,19 @@ class LibraryChatbot:
             
             if search_results:
                 system_prompt += f"\n\nRelevant books found: {json.dumps(search_results, indent=2)}"
+            if popular_books:
+                system_prompt += f"\n\nPopular books this month, with what their readers also borrowed: {json.dumps(popular_books, indent=2)}"
             
-            response = self.model.generate_content(system_prompt)
+            model = self.model
+            started = time.perf_counter()
+            try:
+                response = model.generate_content(system_prompt, request_options={'timeout': RESPONSE_TIMEOUT})
+            except Exception as e:
+                metrics.CHATBOT_CALLS.inc(outcome=_failure(e))
+                raise
+            finally:
+                metrics.CHATBOT_LATENCY.observe(time.perf_counter() - started)
+            metrics.CHATBOT_CALLS.inc(outcome='ok')
             return response.text
             
         except Exception as e:
@@ -0,0 +1,229 @@
+"""Checkout, return and holds, keeping BookCopy rows and the Book copy counters in step."""
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from .models import Book, BookCopy, BorrowRecord, Member, Reservation
+from . import fines, metrics
+
+BARCODE_CACHE_PREFIX = 'copy-barcode:'
+# Barcode changes clear the entry only in the cache of the process that made
+# them, so with the default per-process cache another worker may keep a stale
+# copy for this long; point CACHES at a shared backend to close the gap
+BARCODE_CACHE_TIMEOUT = 60 * 5
+
+# Days a member has to pick up a held book once a copy is waiting
+HOLD_PICKUP_DAYS = 3
+
+
+class CirculationError(Exception):
+    """Raised when a circulation action can't be carried out"""
+
+
+def _flip_copy(copy_id, book_id, available):
+    """Move one copy from `available` to the opposite state; False if someone beat us to it"""
+    # The conditional UPDATE guards against a concurrent desk claiming the same copy
+    if not BookCopy.objects.filter(pk=copy_id, is_available=available).update(is_available=not available):
+        return False
+    Book.adjust_copies(book_id, available=-1 if available else 1)
+    return True
+
+
+def _claim_copy(book, available):
+    """Flip one copy of `book` from `available` to the opposite state, or return None"""
+    candidates = BookCopy.objects.filter(book=book, is_available=available).order_by('pk')
+    for copy in candidates.select_for_update(skip_locked=True)[:5]:
+        if _flip_copy(copy.pk, book.pk, available):
+            copy.is_available = not available
+            return copy
+    return None
+
+
+def _ensure_not_borrowed(member, book):
+    if BorrowRecord.objects.filter(member=member, book=book, return_date__isnull=True).exists():
+        raise CirculationError(f'{member.full_name} already has "{book.title}" borrowed.')
+
+
+def _lend(member, book, copy, due_date=None, issued_by=None, notes=''):
+    # Borrowing a book you were waiting for closes your hold
+    Reservation.objects.filter(member=member, book=book, status='pending').update(status='fulfilled')
+    transaction.on_commit(lambda: metrics.CHECKOUTS.inc(via='direct'))
+    return BorrowRecord.objects.create(
+        member=member,
+        book=book,
+        copy=copy,
+        due_date=due_date,
+        notes=notes,
+        issued_by=issued_by,
+    )
+
+
+def checkout(member, book, due_date, issued_by=None, copy=None, notes=''):
+    """Lend `copy`, or any available copy, of `book` to `member`"""
+    with transaction.atomic():
+        if copy is None:
+            copy = _claim_copy(book, available=True)
+            if copy is None:
+                raise CirculationError(f'No copies of "{book.title}" are available.')
+        elif not _flip_copy(copy.pk, book.pk, available=True):
+            raise CirculationError(f'Copy {copy.copy_number} of "{book.title}" is already checked out.')
+        else:
+            copy.is_available = False
+        return _lend(member, book, copy, due_date, issued_by, notes)
+
+
+def release_copy(book, copy=None):
+    """Put a checked-out copy of `book` back on the shelf (a specific one if known)"""
+    if copy is not None and _flip_copy(copy.pk, book.pk, available=False):
+        copy.is_available = True
+    else:
+        copy = _claim_copy(book, available=False)
+    if copy is not None:
+        start_pickup_window(book)
+    return copy
+
+
+def check_in(borrow_record, returned_on=None):
+    """Mark a loan returned and charge any overdue fine under the member's policy"""
+    borrow_record.return_date = returned_on or date.today()
+    borrow_record.status = 'returned'
+    fines.assess(borrow_record)
+
+
+def hold_queue(book):
+    """Pending, unexpired holds for `book` in FIFO order (served by reservation_queue_idx)"""
+    return Reservation.objects.filter(
+        Q(expiry_date__isnull=True) | Q(expiry_date__gte=date.today()),
+        book=book,
+        status='pending',
+    ).order_by('reservation_date', 'pk')
+
+
+def start_pickup_window(book):
+    """Give the head of the queue HOLD_PICKUP_DAYS to collect a copy, if one is on the shelf"""
+    book_id = getattr(book, 'pk', book)
+    if not Book.objects.filter(pk=book_id, available_copies__gt=0).exists():
+        return
+    head = hold_queue(book_id).values_list('pk', 'expiry_date').first()
+    if head is not None and head[1] is None:
+        Reservation.objects.filter(pk=head[0]).update(expiry_date=date.today() + timedelta(days=HOLD_PICKUP_DAYS))
+
+
+def queue_position(reservation):
+    """1-based position of a pending hold in its book's queue"""
+    ahead = hold_queue(reservation.book_id).filter(reservation_date__lt=reservation.reservation_date).count()
+    return ahead + 1
+
+
+def place_hold(member, book, notes=''):
+    """Add `member` to the end of the hold queue for `book`"""
+    if Reservation.objects.filter(member=member, book=book, status='pending').exists():
+        raise CirculationError(f'{member.full_name} already has a hold on "{book.title}".')
+    _ensure_not_borrowed(member, book)
+    with transaction.atomic():
+        reservation = Reservation.objects.create(member=member, book=book, notes=notes)
+        start_pickup_window(book)
+        reservation.refresh_from_db(fields=['expiry_date'])
+    return reservation
+
+
+def fulfil_next_hold(book, copy=None, issued_by=None):
+    """Lend a just-returned copy straight to the head of the queue.
+
+    Must run inside the transaction that returned the copy; the copy stays
+    checked out, so the Book counters don't change. Returns the new loan,
+    or None when nobody is waiting.
+    """
+    hold = (
+        hold_queue(book)
+        .filter(member__is_active=True)
+        .select_related('member')
+        .select_for_update(skip_locked=True, of=('self',))
+        .first()
+    )
+    if hold is None:
+        return None
+    Reservation.objects.filter(pk=hold.pk).update(status='fulfilled')
+    transaction.on_commit(lambda: metrics.CHECKOUTS.inc(via='hold'))
+    return BorrowRecord.objects.create(
+        member=hold.member,
+        book=book,
+        copy=copy,
+        due_date=None,
+        notes=f'Issued from hold #{hold.pk}',
+        issued_by=issued_by,
+    )
+
+
+def return_copy(borrow_record, issued_by=None, returned_on=None):
+    """Check a loan back in and pass the copy to the next hold, if any"""
+    with transaction.atomic():
+        # Lock the loan so a second return (a resubmitted form, two scans at once) waits and then sees it closed
+        returned = BorrowRecord.objects.select_for_update().filter(pk=borrow_record.pk).values_list('return_date', flat=True).first()
+        if returned is not None:
+            raise CirculationError(f'"{borrow_record.book.title}" was already returned on {returned:%b %d, %Y}.')
+        check_in(borrow_record, returned_on)
+        borrow_record.save()
+        transaction.on_commit(metrics.RETURNS.inc)
+        next_loan = fulfil_next_hold(borrow_record.book, copy=borrow_record.copy, issued_by=issued_by)
+        if next_loan is None:
+            release_copy(borrow_record.book, borrow_record.copy)
+        return next_loan
+
+
+# Barcode desk
+
+def lookup_barcode(barcode):
+    """(copy_id, book_id) for a scanned copy barcode, cached so repeat scans skip the database"""
+    barcode = barcode.strip()
+    key = BARCODE_CACHE_PREFIX + barcode
+    ids = cache.get(key)
+    metrics.CACHE_LOOKUPS.inc(cache='barcode', result='miss' if ids is None else 'hit')
+    if ids is None:
+        ids = BookCopy.objects.filter(barcode=barcode).values_list('pk', 'book_id').first()
+        if ids is None:
+            raise CirculationError(f'Unknown barcode "{barcode}".')
+        cache.set(key, ids, BARCODE_CACHE_TIMEOUT)
+    return ids
+
+
+def forget_barcode(barcode):
+    if barcode:
+        cache.delete(BARCODE_CACHE_PREFIX + barcode)
+
+
+def lookup_member_card(card):
+    member = Member.objects.filter(membership_id=card.strip(), is_active=True).first()
+    if member is None:
+        raise CirculationError(f'No active member with card "{card.strip()}".')
+    return member
+
+
+def checkout_barcode(member, barcode, issued_by=None):
+    """Lend the scanned copy to `member` in one transaction"""
+    copy_id, book_id = lookup_barcode(barcode)
+    book = Book.objects.only('id', 'title').get(pk=book_id)
+    with transaction.atomic():
+        _ensure_not_borrowed(member, book)
+        if not _flip_copy(copy_id, book_id, available=True):
+            raise CirculationError(f'Copy {barcode.strip()} of "{book.title}" is already checked out.')
+        return _lend(member, book, BookCopy(pk=copy_id, book_id=book_id), issued_by=issued_by)
+
+
+def return_barcode(barcode, issued_by=None):
+    """Check in the scanned copy; returns (returned loan, loan issued to the next hold or None)"""
+    copy_id, book_id = lookup_barcode(barcode)
+    open_loans = BorrowRecord.objects.filter(
+        book_id=book_id,
+        return_date__isnull=True
+    ).select_related('book', 'member', 'copy')
+    # Loans made before copies were tracked have no copy; fall back to the oldest of those
+    borrow_record = (
+        open_loans.filter(copy_id=copy_id).first()
+        or open_loans.filter(copy__isnull=True).order_by('borrow_date', 'pk').first()
+    )
+    if borrow_record is None:
+        raise CirculationError(f'Copy {barcode.strip()} is not on loan.')
+    if borrow_record.copy_id is None:
+        borrow_record.copy = BookCopy.objects.get(pk=copy_id)
+    return borrow_record, return_copy(borrow_record, issued_by=issued_by)
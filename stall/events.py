@@ -0,0 +1,164 @@
+"""Append-only circulation event log and the projections replayed from it.
+
+BorrowRecord is updated in place, so on its own it can't say what was on loan
+at some past moment or rebuild counters after a bug. Every change to a loan
+(checkout, return, renewal, status change) also appends a CirculationEvent in
+the same transaction, via the BorrowRecord signals. Reads are time ranges over
+the (occurred_at, id) index; the replay functions rebuild copy availability,
+the Book copy counters and the DailyBorrowCount rollup from the log with a
+handful of set-based queries.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Q, Subquery, Value, Window
+from django.db.models.functions import Coalesce, Greatest, RowNumber, TruncDate
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from .models import Book, BookCopy, BorrowRecord, CirculationEvent, DailyBorrowCount
+
+MAX_PAGE = 1000
+
+
+def loan_state(loan):
+    """The fields of a loan the log tracks, as stored before a save"""
+    return BorrowRecord.objects.filter(pk=loan.pk).values_list('return_date', 'due_date', 'status').first()
+
+
+def record(loan, previous=None):
+    """Append the events for a loan that was just created (`previous` None) or saved"""
+    base = dict(loan_id=loan.pk, book_id=loan.book_id, member_id=loan.member_id, copy_id=loan.copy_id, status=loan.status)
+    if previous is None:
+        events = [CirculationEvent(kind=CirculationEvent.CHECKOUT, due_date=loan.due_date, **base)]
+    else:
+        old_return_date, old_due_date, old_status = previous
+        events = []
+        if loan.return_date and not old_return_date:
+            events.append(CirculationEvent(kind=CirculationEvent.RETURN, **base))
+        elif not loan.return_date and old_return_date:
+            # A return undone by hand puts the loan back on the books
+            events.append(CirculationEvent(kind=CirculationEvent.CHECKOUT, due_date=loan.due_date, **base))
+        elif loan.due_date != old_due_date and not loan.return_date:
+            events.append(CirculationEvent(kind=CirculationEvent.RENEWAL, due_date=loan.due_date, **base))
+        if not events and loan.status != old_status:
+            events.append(CirculationEvent(kind=CirculationEvent.STATUS, **base))
+    CirculationEvent.objects.bulk_create(events)
+    return events
+
+
+def _moment(value):
+    """An aware datetime for a date (its start) or datetime"""
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time.min)
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def between(start=None, end=None, after=None, kinds=None):
+    """Events with start <= occurred_at < end, oldest first.
+
+    `after` is the (occurred_at, id) of the last event already read, for
+    paging through a range without OFFSET.
+    """
+    events = CirculationEvent.objects.all()
+    if start is not None:
+        events = events.filter(occurred_at__gte=_moment(start))
+    if end is not None:
+        events = events.filter(occurred_at__lt=_moment(end))
+    if after is not None:
+        occurred_at, pk = after
+        events = events.filter(Q(occurred_at__gt=occurred_at) | Q(occurred_at=occurred_at, id__gt=pk))
+    if kinds:
+        events = events.filter(kind__in=kinds)
+    return events.order_by('occurred_at', 'id')
+
+
+def open_checkouts(at=None):
+    """Checkout events of loans still open at `at` (now if None)"""
+    checkouts = CirculationEvent.objects.filter(kind=CirculationEvent.CHECKOUT)
+    returns = CirculationEvent.objects.filter(kind=CirculationEvent.RETURN, loan_id=OuterRef('loan_id'))
+    if at is not None:
+        at = _moment(at)
+        checkouts = checkouts.filter(occurred_at__lte=at)
+        returns = returns.filter(occurred_at__lte=at)
+    # A checkout is open until a return of the same loan follows it (a return
+    # undone by hand logs a second checkout)
+    later = Q(occurred_at__gt=OuterRef('occurred_at')) | Q(occurred_at=OuterRef('occurred_at'), id__gt=OuterRef('id'))
+    return checkouts.filter(~Exists(returns.filter(later)))
+
+
+def on_loan_at(at):
+    """(loan_id, book_id, member_id, copy_id, checked out at) for every loan open at `at`"""
+    return open_checkouts(at).order_by('occurred_at', 'id').values_list(
+        'loan_id', 'book_id', 'member_id', 'copy_id', 'occurred_at'
+    )
+
+
+def _count(queryset, field, outer='pk'):
+    """Correlated COUNT(*) of `queryset` rows whose `field` is the outer row's `outer`, usable in update()"""
+    counts = queryset.filter(**{field: OuterRef(outer)}).order_by().values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def _held_without_copy():
+    """Ids of copies that stand in for open loans the log has no copy for.
+
+    Loans made before copies were tracked (and holds issued without one) still
+    take a copy off the shelf, so each book sets aside that many of the copies
+    no logged loan names, preferring ones already marked checked out.
+    """
+    named = Exists(open_checkouts().filter(copy_id=OuterRef('pk')))
+    free = BookCopy.objects.filter(~named).annotate(
+        unnamed=_count(open_checkouts().filter(copy_id__isnull=True), 'book', outer='book_id'),
+        rank=Window(RowNumber(), partition_by=F('book_id'), order_by=[F('is_available').asc(), F('pk').asc()]),
+    )
+    return list(free.filter(rank__lte=F('unnamed')).values_list('pk', flat=True))
+
+
+def replay_availability():
+    """Set copy availability and the Book copy counters from the loans the log has open.
+
+    Returns (copies changed, books changed).
+    """
+    total = _count(BookCopy.objects.all(), 'book')
+    available = Greatest(total - _count(open_checkouts(), 'book'), Value(0))
+    with transaction.atomic():
+        out = Q(Exists(open_checkouts().filter(copy_id=OuterRef('pk')))) | Q(pk__in=_held_without_copy())
+        # Only rows that disagree with the log are written
+        copies = BookCopy.objects.filter(out, is_available=True).update(is_available=False)
+        copies += BookCopy.objects.filter(~out, is_available=False).update(is_available=True)
+        drifted = Book.objects.annotate(actual_total=total, actual_available=available).filter(
+            ~Q(total_copies=F('actual_total'))
+            | ~Q(available_copies=F('actual_available'))
+            | ~Q(is_available=GreaterThan(F('actual_available'), 0))
+        )
+        books = Book.objects.filter(pk__in=list(drifted.values_list('pk', flat=True))).update(
+            total_copies=total,
+            available_copies=available,
+            is_available=GreaterThan(available, 0),
+        )
+    return copies, books
+
+
+def replay_borrow_counts(start=None, end=None):
+    """Rebuild DailyBorrowCount rows for days in [start, end] from checkout events"""
+    checkouts = between(start, end and end + timedelta(days=1), kinds=[CirculationEvent.CHECKOUT])
+    rollups = DailyBorrowCount.objects.all()
+    if start:
+        rollups = rollups.filter(day__gte=start)
+    if end:
+        rollups = rollups.filter(day__lte=end)
+
+    counts = (
+        checkouts.annotate(day=TruncDate('occurred_at'))
+        .order_by()
+        .values('book', 'day')
+        .annotate(count=Count('loan', distinct=True))
+    )
+    with transaction.atomic():
+        rollups.delete()
+        created = DailyBorrowCount.objects.bulk_create(
+            [DailyBorrowCount(book_id=row['book'], day=row['day'], count=row['count']) for row in counts.iterator()],
+            batch_size=1000,
+        )
+    return len(created)
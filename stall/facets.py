@@ -0,0 +1,236 @@
+"""In-memory facet index for catalog browsing.
+
+Every book gets a small integer code per facet (its category, language,
+publisher, availability and publication decade), held in NumPy arrays
+aligned with a sorted array of book ids. Filtering by several facets is an
+AND of boolean masks, and the counts for a facet are one np.bincount over
+the books that match the other facets, so no COUNT query runs per facet.
+Changed books are marked dirty (by signals and Book.adjust_copies) and
+re-read in one query on the next lookup; a periodic full rebuild picks up
+changes made by other worker processes.
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Book, Category, Publisher
+
+FACETS = ('category', 'language', 'publisher', 'availability', 'decade')
+
+FACET_LABELS = {
+    'category': 'Category',
+    'language': 'Language',
+    'publisher': 'Publisher',
+    'availability': 'Availability',
+    'decade': 'Published',
+}
+
+AVAILABILITY_CHOICES = [('available', 'Available'), ('unavailable', 'Not available')]
+
+# The catalog has always listed only books on the shelf unless asked otherwise
+DEFAULT_SELECTION = {'availability': 'available'}
+
+# Value for books without a publisher or publication date
+MISSING = 'none'
+
+_COLUMNS = ('id', 'category_id', 'language', 'publisher_id', 'is_available', 'publication_date')
+
+
+def _values(row):
+    """Facet values of one Book.values_list(*_COLUMNS) row, as strings"""
+    _, category_id, language, publisher_id, is_available, published = row
+    return (
+        str(category_id),
+        language,
+        str(publisher_id) if publisher_id else MISSING,
+        'available' if is_available else 'unavailable',
+        str(published.year // 10 * 10) if published else MISSING,
+    )
+
+
+def selection(params):
+    """{facet: value} chosen in the query string, with the catalog defaults"""
+    chosen = dict(DEFAULT_SELECTION)
+    for facet in FACETS:
+        value = params.get(facet)
+        if value == 'any':
+            chosen.pop(facet, None)
+        elif value:
+            chosen[facet] = value
+    return chosen
+
+
+def filter_books(books, chosen):
+    """Apply a facet selection to a Book queryset"""
+    for facet, value in chosen.items():
+        if facet == 'category':
+            books = books.filter(category_id=value) if value.isdigit() else books.none()
+        elif facet == 'language':
+            books = books.filter(language=value)
+        elif facet == 'publisher':
+            if value == MISSING:
+                books = books.filter(publisher__isnull=True)
+            else:
+                books = books.filter(publisher_id=value) if value.isdigit() else books.none()
+        elif facet == 'availability':
+            books = books.filter(is_available=value == 'available')
+        elif facet == 'decade':
+            if value == MISSING:
+                books = books.filter(publication_date__isnull=True)
+            elif value.isdigit():
+                start = int(value)
+                books = books.filter(Q(publication_date__year__gte=start) & Q(publication_date__year__lt=start + 10))
+            else:
+                books = books.none()
+    return books
+
+
+class FacetIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = np.empty(0, dtype=np.int64)
+        self._alive = np.empty(0, dtype=bool)
+        self._codes = {facet: np.empty(0, dtype=np.int32) for facet in FACETS}
+        self._lookup = {facet: {} for facet in FACETS}   # facet -> {value: code}
+        self._names = {facet: [] for facet in FACETS}    # facet -> [value by code]
+        self._dirty = set()
+        self._built_at = None
+
+    def _stale(self):
+        max_age = getattr(settings, 'FACET_REFRESH_SECONDS', 300)
+        return self._built_at is None or time.monotonic() - self._built_at > max_age
+
+    def _code_locked(self, facet, value):
+        code = self._lookup[facet].get(value)
+        if code is None:
+            code = self._lookup[facet][value] = len(self._names[facet])
+            self._names[facet].append(value)
+        return code
+
+    def rebuild(self):
+        with self._lock:
+            # Books changed while the rows are read stay dirty and are re-read later
+            self._dirty.clear()
+        rows = list(Book.objects.order_by('pk').values_list(*_COLUMNS).iterator(chunk_size=5000))
+        with self._lock:
+            self._lookup = {facet: {} for facet in FACETS}
+            self._names = {facet: [] for facet in FACETS}
+            self._ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            self._alive = np.ones(len(rows), dtype=bool)
+            values = [_values(row) for row in rows]
+            for i, facet in enumerate(FACETS):
+                self._codes[facet] = np.fromiter(
+                    (self._code_locked(facet, v[i]) for v in values), dtype=np.int32, count=len(rows)
+                )
+            self._built_at = time.monotonic()
+
+    def touch(self, book_id):
+        """Re-read a book's facet values on the next lookup"""
+        with self._lock:
+            self._dirty.add(book_id)
+
+    def remove(self, book_id):
+        with self._lock:
+            self._dirty.discard(book_id)
+            pos = np.searchsorted(self._ids, book_id)
+            if pos < len(self._ids) and self._ids[pos] == book_id:
+                self._alive[pos] = False
+
+    def _set_locked(self, row):
+        book_id = row[0]
+        pos = np.searchsorted(self._ids, book_id)
+        codes = [self._code_locked(facet, value) for facet, value in zip(FACETS, _values(row))]
+        if pos < len(self._ids) and self._ids[pos] == book_id:
+            self._alive[pos] = True
+            for facet, code in zip(FACETS, codes):
+                self._codes[facet][pos] = code
+        else:
+            self._ids = np.insert(self._ids, pos, book_id)
+            self._alive = np.insert(self._alive, pos, True)
+            for facet, code in zip(FACETS, codes):
+                self._codes[facet] = np.insert(self._codes[facet], pos, code)
+
+    def _refresh(self):
+        if self._stale():
+            self.rebuild()
+            return
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return
+        rows = list(Book.objects.filter(pk__in=dirty).values_list(*_COLUMNS))
+        with self._lock:
+            found = set()
+            for row in rows:
+                self._set_locked(row)
+                found.add(row[0])
+            for book_id in dirty - found:
+                pos = np.searchsorted(self._ids, book_id)
+                if pos < len(self._ids) and self._ids[pos] == book_id:
+                    self._alive[pos] = False
+
+    def _base_locked(self, base_ids):
+        if base_ids is None:
+            return self._alive
+        return self._alive & np.isin(self._ids, np.fromiter(base_ids, dtype=np.int64))
+
+    def _mask_locked(self, chosen, base, skip=None):
+        mask = base.copy()
+        for facet, value in chosen.items():
+            if facet == skip:
+                continue
+            code = self._lookup[facet].get(value)
+            if code is None:
+                return np.zeros_like(mask)
+            mask &= self._codes[facet] == code
+        return mask
+
+    def counts(self, chosen, base_ids=None):
+        """({facet: {value: books}}, matching books) for a selection, within `base_ids` if given.
+
+        A facet's counts ignore its own selection, so they show what picking
+        another value of that facet would give.
+        """
+        self._refresh()
+        with self._lock:
+            base = self._base_locked(base_ids)
+            result = {}
+            for facet in FACETS:
+                mask = self._mask_locked(chosen, base, skip=facet)
+                tally = np.bincount(self._codes[facet][mask], minlength=len(self._names[facet]))
+                result[facet] = {self._names[facet][code]: int(n) for code, n in enumerate(tally) if n}
+            total = int(self._mask_locked(chosen, base).sum())
+        return result, total
+
+    def matching(self, book_ids, chosen):
+        """The ids among `book_ids` that match a selection"""
+        self._refresh()
+        with self._lock:
+            return set(self._ids[self._mask_locked(chosen, self._base_locked(book_ids))].tolist())
+
+
+def labels(facet, values):
+    """Display names for a facet's values"""
+    if facet == 'category':
+        names = {str(pk): name for pk, name in Category.objects.filter(pk__in=_ints(values)).values_list('pk', 'name')}
+    elif facet == 'publisher':
+        names = {str(pk): name for pk, name in Publisher.objects.filter(pk__in=_ints(values)).values_list('pk', 'name')}
+        names[MISSING] = 'Not set'
+    elif facet == 'language':
+        names = dict(Book.LANGUAGE_CHOICES)
+    elif facet == 'availability':
+        names = dict(AVAILABILITY_CHOICES)
+    else:
+        names = {value: f'{value}s' for value in values if value.isdigit()}
+        names[MISSING] = 'Unknown'
+    return {value: names.get(value, value) for value in values}
+
+
+def _ints(values):
+    return [int(value) for value in values if value.isdigit()]
+
+
+index = FacetIndex()
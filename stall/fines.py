@@ -0,0 +1,114 @@
+"""Overdue fines: per-membership policies and the FineEntry ledger."""
+from datetime import date
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery, Sum
+from .models import BorrowRecord, FineEntry, FinePolicy
+
+# Used for membership types that have no FinePolicy row
+DEFAULT_POLICY = FinePolicy(rate_per_day=Decimal('5.00'), grace_days=0, max_fine=None)
+
+
+def policies():
+    """FinePolicy per membership type, falling back to DEFAULT_POLICY"""
+    return {policy.membership_type: policy for policy in FinePolicy.objects.all()}
+
+
+def compute_fine(policy, due_date, returned_on):
+    """(days_late, amount) for a loan due on `due_date` and returned (or still out) on `returned_on`"""
+    days_late = max((returned_on - due_date).days, 0)
+    chargeable = max(days_late - policy.grace_days, 0)
+    amount = policy.rate_per_day * chargeable
+    if policy.max_fine is not None:
+        amount = min(amount, policy.max_fine)
+    return days_late, amount
+
+
+def assess(borrow_record, policy_map=None):
+    """Set a loan's fine and record it in the ledger (call inside the return transaction)"""
+    policy_map = policy_map if policy_map is not None else policies()
+    policy = policy_map.get(borrow_record.member.membership_type, DEFAULT_POLICY)
+    days_late, amount = compute_fine(policy, borrow_record.due_date, borrow_record.return_date or date.today())
+
+    borrow_record.fine_amount = amount
+    if amount > 0:
+        FineEntry.objects.update_or_create(
+            borrow_record=borrow_record,
+            kind='overdue',
+            defaults={'member_id': borrow_record.member_id, 'amount': amount, 'days_late': days_late},
+        )
+    elif borrow_record.pk:
+        FineEntry.objects.filter(borrow_record=borrow_record, kind='overdue').delete()
+    return amount
+
+
+def _write_chunk(entries, records, cleared_ids):
+    with transaction.atomic():
+        if entries:
+            FineEntry.objects.bulk_create(
+                entries,
+                update_conflicts=True,
+                unique_fields=['borrow_record', 'kind'],
+                update_fields=['amount', 'days_late', 'updated_at'],
+            )
+        if records:
+            BorrowRecord.objects.bulk_update(records, ['fine_amount'])
+        if cleared_ids:
+            FineEntry.objects.filter(kind='overdue', borrow_record_id__in=cleared_ids).delete()
+
+
+def recompute(today=None, chunk_size=2000):
+    """Recompute every late loan's fine in chunks; returns the number of loans charged"""
+    today = today or date.today()
+    policy_map = policies()
+
+    late = BorrowRecord.objects.filter(
+        Q(return_date__isnull=True, due_date__lt=today) | Q(return_date__gt=F('due_date'))
+    )
+    overdue = FineEntry.objects.filter(borrow_record=OuterRef('pk'), kind='overdue')
+    rows = late.annotate(overdue_amount=Subquery(overdue.values('amount')[:1])).order_by('pk').values_list(
+        'pk', 'member_id', 'member__membership_type', 'due_date', 'return_date', 'fine_amount', 'overdue_amount'
+    )
+
+    charged = 0
+    entries, records, cleared_ids = [], [], []
+    for pk, member_id, membership_type, due_date, return_date, old_amount, old_overdue in rows.iterator(chunk_size=chunk_size):
+        policy = policy_map.get(membership_type, DEFAULT_POLICY)
+        days_late, amount = compute_fine(policy, due_date, return_date or today)
+        if amount > 0:
+            charged += 1
+            entries.append(FineEntry(
+                member_id=member_id, borrow_record_id=pk, kind='overdue', amount=amount, days_late=days_late
+            ))
+        else:
+            cleared_ids.append(pk)
+        # A fine_amount that isn't the last overdue charge was entered by hand (lost, damaged); keep it
+        if amount != old_amount and old_amount in (0, old_overdue):
+            records.append(BorrowRecord(pk=pk, fine_amount=amount))
+
+        if len(entries) + len(cleared_ids) >= chunk_size:
+            _write_chunk(entries, records, cleared_ids)
+            entries, records, cleared_ids = [], [], []
+    _write_chunk(entries, records, cleared_ids)
+
+    # Loans that are no longer late (e.g. due date extended) lose their overdue
+    # charge; archived loans keep theirs, and so do hand-entered fines
+    BorrowRecord.objects.exclude(pk__in=late.values('pk')).exclude(fine_amount=0).filter(
+        Exists(overdue.filter(amount=OuterRef('fine_amount')))
+    ).update(fine_amount=0)
+    FineEntry.objects.filter(kind='overdue', archived_loan__isnull=True).exclude(borrow_record__in=late).delete()
+    return charged
+
+
+def outstanding_balances():
+    """Members who owe money, as rows of {'member': id, 'balance': Decimal}"""
+    return (
+        FineEntry.objects.order_by()
+        .values('member')
+        .annotate(balance=Sum('amount'))
+        .filter(balance__gt=0)
+    )
+
+
+def member_balance(member):
+    return FineEntry.objects.filter(member=member).aggregate(balance=Sum('amount'))['balance'] or Decimal('0')
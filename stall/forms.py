@@ -1,7 +1,47 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.urls import reverse
 from .models import BorrowRecord, Member, Reservation, Book
 from datetime import date, timedelta
 
+# Which books each picker offers; shared with the book_options endpoint
+BOOK_SCOPES = {
+    'available': Q(is_available=True),
+    # Holds are only needed for books with no copy on the shelf
+    'holdable': Q(is_available=False, total_copies__gt=0),
+}
+
+class LazySelect(forms.Select):
+    """Select that renders only the chosen option and fetches the rest from a paged search endpoint"""
+    def __init__(self, url_name, scope, attrs=None):
+        super().__init__(attrs)
+        self.url_name = url_name
+        self.scope = scope
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-options-url'] = f'{reverse(self.url_name)}?scope={self.scope}'
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        choices = self.choices
+        selected = []
+        ids = [v for v in value if v]
+        if ids:
+            try:
+                selected = [
+                    (choices.field.prepare_value(obj), choices.field.label_from_instance(obj))
+                    for obj in choices.queryset.filter(pk__in=ids)
+                ]
+            except (ValueError, ValidationError):
+                pass
+        self.choices = [('', '---------')] + selected
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
+
 class MemberForm(forms.ModelForm):
     class Meta:
         model = Member
@@ -35,14 +75,13 @@ class ReservationForm(forms.ModelForm):
         model = Reservation
         fields = ['book', 'notes']
         widgets = {
-            'book': forms.Select(attrs={'class': 'form-control'}),
+            'book': LazySelect('book_options_api', 'holdable', attrs={'class': 'form-control'}),
             'notes': forms.Textarea(attrs={'class': 'form-control', 'rows': 3, 'placeholder': 'Notes (optional)'}),
         }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Only show available books for reservation
-        self.fields['book'].queryset = Book.objects.filter(is_available=True)
+        self.fields['book'].queryset = Book.objects.filter(BOOK_SCOPES['holdable'])
 
 class BookSearchForm(forms.Form):
     search = forms.CharField(
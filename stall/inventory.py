@@ -0,0 +1,127 @@
+"""Shelf stock-take: reconcile scanned copy barcodes against BookCopy.
+
+A scan file has one scanned copy per line, as CSV: `shelf,barcode` with an
+optional third `condition` column (a header row is skipped). Files dumped
+shelf by shelf can hold just barcodes, with the shelf given separately. The
+file is read as a stream into one set of barcodes per shelf, BookCopy is
+read once as plain tuples, and each shelf is compared with set operations:
+
+- missing: recorded on the shelf, not on loan, and scanned nowhere
+- misplaced: scanned on the shelf but recorded on another one
+- unexpected: scanned, but no copy has that barcode
+
+Only shelves that appear in the scan are checked, so a partial stock-take
+doesn't report the rest of the library as missing.
+"""
+import csv
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import BookCopy
+
+CONDITIONS = {value for value, _ in BookCopy.CONDITION_CHOICES}
+
+# Rows per UPDATE ... WHERE id IN (...)
+UPDATE_CHUNK_SIZE = 1000
+
+
+class ScanFormatError(ValueError):
+    """Raised for a scan line that can't be read"""
+
+
+def read_scans(lines, shelf=None):
+    """({shelf: {barcode}}, {barcode: condition}) from an iterable of scan file lines"""
+    scans = defaultdict(set)
+    conditions = {}
+    for number, row in enumerate(csv.reader(lines), start=1):
+        row = [field.strip() for field in row]
+        if not any(row) or row[0].startswith('#'):
+            continue
+        if number == 1 and row[0].lower() in ('shelf', 'barcode'):
+            continue
+        if shelf is not None and len(row) == 1:
+            scans[shelf].add(row[0])
+            continue
+        if len(row) < 2 or not row[0] or not row[1]:
+            raise ScanFormatError(f'Line {number}: expected "shelf,barcode[,condition]" (give a shelf for barcode-only files).')
+        scans[row[0]].add(row[1])
+        if len(row) > 2 and row[2]:
+            condition = row[2].lower()
+            if condition not in CONDITIONS:
+                raise ScanFormatError(f'Line {number}: unknown condition "{row[2]}".')
+            conditions[row[1]] = condition
+    return dict(scans), conditions
+
+
+def snapshot():
+    """{barcode: (pk, recorded shelf, is_available, condition)} for every copy, read in one pass"""
+    rows = BookCopy.objects.order_by().values_list('barcode', 'pk', 'location_shelf', 'is_available', 'condition')
+    return {row[0]: row[1:] for row in rows.iterator(chunk_size=10000) if row[0]}
+
+
+def reconcile(scans, copies=None):
+    """{shelf: {'expected', 'found', 'missing', 'misplaced', 'unexpected', 'on_loan'}} for the scanned shelves.
+
+    `misplaced` maps barcode -> recorded shelf; the others are sorted barcode lists,
+    with `on_loan` listing copies scanned on the shelf while recorded as checked out.
+    """
+    copies = snapshot() if copies is None else copies
+    recorded = defaultdict(set)
+    for barcode, (_, location, _, _) in copies.items():
+        if location in scans:
+            recorded[location].add(barcode)
+
+    scanned_anywhere = set().union(*scans.values()) if scans else set()
+    report = {}
+    for shelf, found in sorted(scans.items()):
+        expected = recorded[shelf]
+        known = found & copies.keys()
+        report[shelf] = {
+            'expected': len(expected),
+            'found': len(found),
+            'missing': sorted(b for b in expected - scanned_anywhere if copies[b][2]),
+            'misplaced': {b: copies[b][1] for b in sorted(known - expected)},
+            'unexpected': sorted(found - known),
+            'on_loan': sorted(b for b in known if not copies[b][2]),
+        }
+    return report
+
+
+def _update(ids_by_value, field):
+    updated = 0
+    for value, ids in ids_by_value.items():
+        ids = sorted(ids)
+        for start in range(0, len(ids), UPDATE_CHUNK_SIZE):
+            updated += BookCopy.objects.filter(pk__in=ids[start:start + UPDATE_CHUNK_SIZE]).update(**{field: value})
+    return updated
+
+
+def apply(scans, conditions, relocate=False, copies=None):
+    """Record scanned conditions and, with `relocate`, the shelf each copy was found on.
+
+    Returns (conditions changed, copies relocated). Only rows that change are written.
+    """
+    copies = snapshot() if copies is None else copies
+    new_condition, new_shelf = defaultdict(list), defaultdict(list)
+    for barcode, condition in conditions.items():
+        if barcode in copies and copies[barcode][3] != condition:
+            new_condition[condition].append(copies[barcode][0])
+    if relocate:
+        for shelf, barcodes in scans.items():
+            for barcode in barcodes & copies.keys():
+                if copies[barcode][1] != shelf:
+                    new_shelf[shelf].append(copies[barcode][0])
+    with transaction.atomic():
+        return _update(new_condition, 'condition'), _update(new_shelf, 'location_shelf')
+
+
+def totals(report):
+    """Counts per category over every shelf in a report"""
+    summary = {'shelves': len(report), 'expected': 0, 'found': 0, 'missing': 0, 'misplaced': 0, 'unexpected': 0, 'on_loan': 0}
+    for shelf in report.values():
+        summary['expected'] += shelf['expected']
+        summary['found'] += shelf['found']
+        for key in ('missing', 'misplaced', 'unexpected', 'on_loan'):
+            summary[key] += len(shelf[key])
+    return summary
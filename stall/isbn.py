@@ -0,0 +1,222 @@
+"""Local ISBN metadata index for cataloguing, memory-mapped and binary-searched.
+
+build() streams a bibliographic dump (an Open Library editions dump, or any
+file of one JSON edition record per line, optionally after tab-separated
+columns) and writes one index file:
+
+    header   b'ISBNIDX1', record count, table offset   (24 bytes)
+    records  compact JSON metadata, one after another
+    table    sorted ISBN-13s (uint64), then record offsets (uint64) and lengths (uint32)
+
+ISBNIndex maps the file read-only, so a lookup is a np.searchsorted over the
+mapped keys (about 25 probes for tens of millions of ISBNs) and one slice of
+the record it points at. The OS pages in only what lookups touch, and every
+worker process shares the same page cache. A rebuild writes a new file and
+swaps it in; open indexes notice and remap on their next lookup.
+"""
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+from array import array
+from datetime import date, datetime
+
+import numpy as np
+from django.conf import settings
+
+from .models import Book
+
+MAGIC = b'ISBNIDX1'
+HEADER = struct.Struct('<8sQQ')
+
+# MARC language codes used by Open Library, mapped onto Book.LANGUAGE_CHOICES
+LANGUAGES = {
+    'eng': 'en', 'ben': 'bn', 'hin': 'hi', 'urd': 'ur', 'ara': 'ar',
+    'fre': 'fr', 'fra': 'fr', 'spa': 'es',
+}
+
+# Dumps spell dates many ways; anything vaguer than a day only yields the year
+DATE_FORMATS = ('%B %d, %Y', '%b %d, %Y', '%d %B %Y', '%b. %d, %Y')
+
+_NOT_ISBN = re.compile(r'[^0-9Xx]')
+
+
+def default_path():
+    return getattr(settings, 'ISBN_INDEX_PATH', settings.BASE_DIR / 'isbn.idx')
+
+
+def normalize(value):
+    """The ISBN-13 for an ISBN-10 or ISBN-13 in any punctuation, or None if it isn't valid"""
+    digits = _NOT_ISBN.sub('', value or '').upper()
+    if len(digits) == 10 and digits[:9].isdigit():
+        check = sum((10 - i) * (10 if c == 'X' else int(c)) for i, c in enumerate(digits))
+        if check % 11:
+            return None
+        digits = '978' + digits[:9]
+        return digits + str(-sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(digits)) % 10)
+    if len(digits) == 13 and digits.isdigit():
+        if sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(digits)) % 10:
+            return None
+        return digits
+    return None
+
+
+def _publication_date(text):
+    """(ISO date or None, year or None) from a free-text publish date such as 'March 3, 1998'"""
+    text = (text or '').strip()
+    try:
+        day = date.fromisoformat(text)
+        return day.isoformat(), day.year
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            day = datetime.strptime(text, fmt).date()
+            return day.isoformat(), day.year
+        except ValueError:
+            continue
+    year = re.search(r'\b(1[5-9]\d\d|20\d\d)\b', text)
+    return None, int(year.group(1)) if year else None
+
+
+def metadata(record):
+    """Book fields found in one edition record"""
+    title = record.get('title', '').strip()
+    if record.get('subtitle'):
+        title = f"{title}: {record['subtitle'].strip()}"
+    published, year = _publication_date(record.get('publish_date'))
+    pages = record.get('number_of_pages')
+    languages = [LANGUAGES.get(lang.get('key', '').rsplit('/', 1)[-1]) for lang in record.get('languages') or []]
+    fields = {
+        'title': title[:200],
+        'pages': pages if isinstance(pages, int) and pages > 0 else None,
+        'publisher': (record.get('publishers') or [''])[0][:200],
+        'publication_date': published,
+        'year': year,
+        'language': next((lang for lang in languages if lang), 'other' if languages else None),
+        'by': record.get('by_statement', '')[:200],
+    }
+    return {key: value for key, value in fields.items() if value}
+
+
+def _records(lines):
+    """(isbn13s, metadata) for each line of a dump that has at least one valid ISBN"""
+    for line in lines:
+        line = line.rstrip('\n')
+        if not line:
+            continue
+        try:
+            record = json.loads(line if line.startswith('{') else line.rsplit('\t', 1)[-1])
+        except ValueError:
+            continue
+        if not isinstance(record, dict):
+            continue
+        isbns = {normalize(value) for value in (record.get('isbn_13') or []) + (record.get('isbn_10') or [])}
+        isbns.discard(None)
+        if isbns and record.get('title'):
+            yield isbns, metadata(record)
+
+
+def build(source, target=None):
+    """Compile the dump at `source` into an index at `target`; returns the number of ISBNs indexed"""
+    target = str(target or default_path())
+    partial = f'{target}.partial'
+    keys, offsets, lengths = array('Q'), array('Q'), array('I')
+    with open(source, encoding='utf-8', errors='replace') as dump, open(partial, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, 0, 0))
+        position = HEADER.size
+        for isbns, fields in _records(dump):
+            blob = json.dumps(fields, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            out.write(blob)
+            for isbn in isbns:
+                keys.append(int(isbn))
+                offsets.append(position)
+                lengths.append(len(blob))
+            position += len(blob)
+
+        # Sort by ISBN; the first edition listed wins when an ISBN repeats
+        order = np.argsort(np.frombuffer(keys, dtype=np.uint64), kind='stable')
+        sorted_keys = np.frombuffer(keys, dtype=np.uint64)[order]
+        first = np.ones(len(sorted_keys), dtype=bool)
+        first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        order = order[first]
+
+        padding = -position % 8
+        out.write(b'\0' * padding)
+        table = position + padding
+        out.write(sorted_keys[first].tobytes())
+        out.write(np.frombuffer(offsets, dtype=np.uint64)[order].tobytes())
+        out.write(np.frombuffer(lengths, dtype=np.uint32)[order].tobytes())
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, len(order), table))
+    os.replace(partial, target)
+    return len(order)
+
+
+class IndexMissing(Exception):
+    """Raised when the ISBN index hasn't been built"""
+
+
+class ISBNIndex:
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._mapped = None   # (file identity, mmap, keys, offsets, lengths)
+
+    @property
+    def path(self):
+        return str(self._path or default_path())
+
+    def _open(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            raise IndexMissing(f'No ISBN index at {self.path}; run build_isbn_index first.')
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if self._mapped is None or self._mapped[0] != identity:
+                with open(self.path, 'rb') as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, count, table = HEADER.unpack_from(data)
+                if magic != MAGIC:
+                    raise IndexMissing(f'{self.path} is not an ISBN index.')
+                keys = np.frombuffer(data, dtype=np.uint64, count=count, offset=table)
+                offsets = np.frombuffer(data, dtype=np.uint64, count=count, offset=table + 8 * count)
+                lengths = np.frombuffer(data, dtype=np.uint32, count=count, offset=table + 16 * count)
+                self._mapped = (identity, data, keys, offsets, lengths)
+            return self._mapped
+
+    def __len__(self):
+        return len(self._open()[2])
+
+    def lookup(self, isbn):
+        """Metadata for an ISBN (any format), or None if it isn't in the index"""
+        isbn = normalize(isbn)
+        if isbn is None:
+            return None
+        _, data, keys, offsets, lengths = self._open()
+        key = np.uint64(int(isbn))
+        pos = int(np.searchsorted(keys, key))
+        if pos == len(keys) or keys[pos] != key:
+            return None
+        start = int(offsets[pos])
+        fields = json.loads(data[start:start + int(lengths[pos])])
+        fields['isbn'] = isbn
+        return fields
+
+
+def book_fields(fields):
+    """Lookup metadata as Book field values, for forms and the importer"""
+    values = {
+        'isbn': fields['isbn'],
+        'title': fields.get('title', ''),
+        'pages': fields.get('pages'),
+        'language': fields.get('language') if fields.get('language') in dict(Book.LANGUAGE_CHOICES) else None,
+        'publication_date': fields.get('publication_date'),
+    }
+    return {key: value for key, value in values.items() if value}
+
+
+index = ISBNIndex()
@@ -0,0 +1,141 @@
+"""Database-backed background jobs.
+
+Request handlers call enqueue() and return; the run_worker management command
+claims queued jobs and runs them on a thread or process pool. A job is claimed
+with a conditional UPDATE (queued -> running), so several workers can share
+the table without a broker or row locks. Failed jobs are retried with
+exponential backoff until max_attempts is reached.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Task name -> (function, max attempts)
+TASKS = {}
+
+RETRY_DELAY = 30
+
+# Running jobs older than this are assumed to belong to a dead worker
+STALE_AFTER = timedelta(hours=1)
+
+
+def task(func=None, *, name=None, max_attempts=3):
+    """Register a function so it can be enqueued by name"""
+    def register(func):
+        TASKS[name or func.__name__] = (func, max_attempts)
+        func.task_name = name or func.__name__
+        return func
+    return register(func) if func else register
+
+
+def enqueue(name, dedup_key=None, delay=None, **kwargs):
+    """Queue `name` to run with `kwargs` (JSON-serializable).
+
+    With a dedup_key, an identical job that is already queued or running is
+    returned instead of adding another.
+    """
+    name = getattr(name, 'task_name', name)
+    if name not in TASKS:
+        raise KeyError(f'Unknown job "{name}"')
+    if dedup_key:
+        existing = Job.objects.filter(dedup_key=dedup_key, status__in=['queued', 'running']).first()
+        if existing:
+            return existing
+    try:
+        with transaction.atomic():
+            return Job.objects.create(
+                name=name,
+                kwargs=kwargs,
+                dedup_key=dedup_key,
+                max_attempts=TASKS[name][1],
+                run_after=timezone.now() + (delay or timedelta()),
+            )
+    except IntegrityError:
+        # Another request queued the same job in the meantime
+        return Job.objects.get(dedup_key=dedup_key, status__in=['queued', 'running'])
+
+
+def enqueue_on_commit(name, dedup_key=None, **kwargs):
+    """Queue a job once the current transaction commits"""
+    transaction.on_commit(lambda: enqueue(name, dedup_key=dedup_key, **kwargs))
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker, limit=1):
+    """Mark up to `limit` due jobs as running for `worker` and return their ids"""
+    now = timezone.now()
+    candidates = Job.objects.filter(status='queued', run_after__lte=now).order_by('run_after', 'pk')
+    claimed = []
+    for pk in candidates.values_list('pk', flat=True)[:limit * 2]:
+        # Only one worker's UPDATE can still see the job as queued
+        if Job.objects.filter(pk=pk, status='queued').update(status='running', worker=worker, started_at=now):
+            claimed.append(pk)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def run(job_id):
+    """Run one claimed job and record the outcome"""
+    try:
+        job = Job.objects.get(pk=job_id)
+        try:
+            func, _ = TASKS[job.name]
+            result = func(**job.kwargs)
+        except Exception:
+            _failed(job, traceback.format_exc())
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status='done',
+                attempts=job.attempts + 1,
+                result=result,
+                last_error='',
+                finished_at=timezone.now(),
+            )
+    finally:
+        connections.close_all()
+
+
+def fail(job_id, error):
+    """Record a failure for a claimed job whose run never reported back (e.g. its process died)"""
+    job = Job.objects.filter(pk=job_id, status='running').first()
+    if job is not None:
+        _failed(job, error)
+
+
+def _failed(job, error):
+    attempts = job.attempts + 1
+    if attempts < job.max_attempts:
+        logger.warning('Job %s #%s failed (attempt %s), retrying', job.name, job.pk, attempts)
+        Job.objects.filter(pk=job.pk).update(
+            status='queued',
+            attempts=attempts,
+            last_error=error,
+            run_after=timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (attempts - 1)),
+        )
+    else:
+        logger.error('Job %s #%s failed after %s attempts', job.name, job.pk, attempts)
+        Job.objects.filter(pk=job.pk).update(
+            status='failed',
+            attempts=attempts,
+            last_error=error,
+            finished_at=timezone.now(),
+        )
+
+
+def requeue_stale(now=None):
+    """Put jobs left running by a worker that died back in the queue"""
+    now = now or timezone.now()
+    return Job.objects.filter(status='running', started_at__lt=now - STALE_AFTER).update(status='queued')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from stall import archive
+
+class Command(BaseCommand):
+    help = 'Move returned loans older than LOAN_ARCHIVE_AFTER_DAYS out of BorrowRecord into the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive loans returned more than this many days ago (default: LOAN_ARCHIVE_AFTER_DAYS, 365)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Loans moved per transaction (default: 1000)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the loans that would move')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archive.archivable(options['days']).count()
+            self.stdout.write(f'{count} loan(s) returned before {archive.cutoff(options["days"])} would be archived.')
+            return
+        moved = archive.archive_returned_loans(options['days'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} returned loan(s).'))
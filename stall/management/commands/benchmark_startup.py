@@ -0,0 +1,31 @@
+from statistics import median
+from django.core.management.base import BaseCommand, CommandError
+from stall import startup
+
+class Command(BaseCommand):
+    help = 'Time cold starts of "manage.py check" and fail if they are over budget (for CI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Number of cold starts to time (default: 5)')
+        parser.add_argument('--budget', type=float, default=1.0, help='Maximum median seconds (default: 1.0)')
+
+    def handle(self, *args, **options):
+        args = startup.manage_py('check')
+        try:
+            startup.cold_starts(args, 1)  # Warm the OS file cache so the first run isn't an outlier
+            timings = startup.cold_starts(args, options['runs'])
+            imported = {module for module, _, _ in startup.imports(args)}
+        except RuntimeError as e:
+            raise CommandError(f'manage.py check failed: {e}')
+
+        typical = median(timings)
+        self.stdout.write(
+            f'manage.py check: median {typical:.2f}s, best {min(timings):.2f}s over {len(timings)} run(s)'
+        )
+
+        problems = [f'{module} is imported at startup' for module in startup.LAZY_MODULES if module in imported]
+        if typical > options['budget']:
+            problems.append(f'median {typical:.2f}s is over the {options["budget"]:.2f}s budget')
+        if problems:
+            raise CommandError('Startup regressed: ' + '; '.join(problems))
+        self.stdout.write(self.style.SUCCESS(f'Within the {options["budget"]:.2f}s budget.'))
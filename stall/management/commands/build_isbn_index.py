@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from stall import isbn
+
+class Command(BaseCommand):
+    help = 'Compile a local bibliographic dump (e.g. an Open Library editions dump) into the memory-mapped ISBN index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dump', help='Uncompressed dump file: JSON edition records, one per line (tab-separated columns allowed)')
+        parser.add_argument('--output', help='Index file to write (default: ISBN_INDEX_PATH, or isbn.idx next to manage.py)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            count = isbn.build(options['dump'], options['output'])
+        except OSError as e:
+            raise CommandError(f'Cannot build the ISBN index: {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {count} ISBN(s) into {options["output"] or isbn.default_path()} in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from stall import recommendations
+
+class Command(BaseCommand):
+    help = 'Rebuild "members also borrowed" recommendations from borrowing history (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=recommendations.TOP_K, help='Recommendations kept per book')
+        parser.add_argument(
+            '--min-shared',
+            type=int,
+            default=recommendations.MIN_SHARED,
+            help='Members who must have borrowed both books'
+        )
+
+    def handle(self, *args, **options):
+        stored = recommendations.build(k=options['top'], min_shared=options['min_shared'])
+        self.stdout.write(self.style.SUCCESS(f'Stored {stored} recommendation(s).'))
@@ -0,0 +1,22 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from stall.circulation import start_pickup_window
+from stall.models import Reservation
+
+class Command(BaseCommand):
+    help = 'Expire ready holds whose pickup window has passed'
+
+    def handle(self, *args, **options):
+        # Holds still queued have no expiry date and wait for a copy
+        lapsed = Reservation.objects.filter(
+            status='pending',
+            expiry_date__isnull=False,
+            expiry_date__lt=date.today()
+        )
+        book_ids = set(lapsed.values_list('book_id', flat=True))
+        expired = lapsed.update(status='expired')
+        # The copy those members didn't collect passes to the next in line
+        for book_id in book_ids:
+            start_pickup_window(book_id)
+
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired} hold(s).'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from stall.models import Book, Member
+from stall import thumbnails
+
+class Command(BaseCommand):
+    help = 'Generate missing or stale thumbnails for book covers and member photos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate thumbnails even if they look current')
+
+    def handle(self, *args, **options):
+        for model, field_name in ((Book, 'cover_image'), (Member, 'photo')):
+            count = 0
+            queryset = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            for instance in queryset.iterator():
+                if options['force'] or thumbnails.needs_thumbnails(instance, field_name):
+                    thumbnails.generate(model, instance.pk, field_name)
+                    count += 1
+            self.stdout.write(f'{model.__name__}: generated thumbnails for {count} image(s)')
+
+        self.stdout.write(self.style.SUCCESS('Thumbnails are up to date.'))
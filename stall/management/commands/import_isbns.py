@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from stall import isbn
+from stall.models import Book, BookCopy, Category, Publisher
+
+class Command(BaseCommand):
+    help = 'Add books for a list of ISBNs, filling title, pages, publisher, language and date from the local ISBN index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('isbn_file', help='One ISBN per line, optionally followed by ",copies"')
+        parser.add_argument('--category', required=True, help='Category for the new books (created if needed)')
+        parser.add_argument('--copies', type=int, default=0, help='Copies to add per book when the line gives none (default: 0)')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['isbn_file'], encoding='utf-8-sig') as isbn_file:
+                lines = [line.strip() for line in isbn_file if line.strip() and not line.startswith('#')]
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["isbn_file"]}: {e}')
+
+        category, _ = Category.objects.get_or_create(name=options['category'])
+        created, skipped = 0, []
+        for line in lines:
+            raw, _, copies = line.partition(',')
+            number = isbn.normalize(raw)
+            try:
+                fields = isbn.index.lookup(number) if number else None
+            except isbn.IndexMissing as e:
+                raise CommandError(str(e))
+            if fields is None:
+                skipped.append(f'{raw.strip()}: {"not in the ISBN index" if number else "invalid ISBN"}')
+                continue
+            if Book.objects.filter(isbn=number).exists():
+                skipped.append(f'{raw.strip()}: already catalogued')
+                continue
+
+            with transaction.atomic():
+                publisher = None
+                if fields.get('publisher'):
+                    publisher = (
+                        Publisher.objects.filter(name__iexact=fields['publisher']).first()
+                        or Publisher.objects.create(name=fields['publisher'])
+                    )
+                book = Book.objects.create(category=category, publisher=publisher, **isbn.book_fields(fields))
+                count = int(copies) if copies.strip().isdigit() else options['copies']
+                for n in range(1, count + 1):
+                    BookCopy.objects.create(book=book, copy_number=f'{number}-{n:02d}')
+            created += 1
+
+        for reason in skipped:
+            self.stdout.write(f'  skipped {reason}')
+        self.stdout.write(self.style.SUCCESS(f'Added {created} book(s); skipped {len(skipped)}.'))
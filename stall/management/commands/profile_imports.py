@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from stall import startup
+
+class Command(BaseCommand):
+    help = 'List the slowest imports when Django starts and loads the URLconf'
+
+    def add_arguments(self, parser):
+        parser.add_argument('modules', nargs='*', help='Modules to import after setup (default: the URLconf)')
+        parser.add_argument('--limit', type=int, default=20, help='Number of imports to list (default: 20)')
+        parser.add_argument('--self', action='store_true', dest='by_self', help="Sort by each module's own time, not including its imports")
+
+    def handle(self, *args, **options):
+        modules = options['modules'] or [settings.ROOT_URLCONF]
+        code = 'import django, importlib; django.setup(); ' + ''.join(
+            f'importlib.import_module({module!r}); ' for module in modules
+        )
+        try:
+            rows = startup.imports(['-c', code])
+        except RuntimeError as e:
+            raise CommandError(f'Import failed: {e}')
+
+        total = sum(self_us for _, self_us, _ in rows)
+        key = 1 if options['by_self'] else 2
+        self.stdout.write(f'{len(rows)} modules imported in {total / 1000:.0f} ms\n')
+        self.stdout.write(f'{"cumulative":>12} {"self":>10}  module')
+        for module, self_us, cumulative_us in sorted(rows, key=lambda row: -row[key])[:options['limit']]:
+            self.stdout.write(f'{cumulative_us / 1000:>9.1f} ms {self_us / 1000:>7.1f} ms  {module}')
+
+        loaded = [module for module in startup.LAZY_MODULES if module in {row[0] for row in rows}]
+        if loaded:
+            self.stdout.write(self.style.WARNING(f'Imported at startup but meant to load lazily: {", ".join(loaded)}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from stall import search
+
+class Command(BaseCommand):
+    help = 'Rebuild the trigram index behind typo-tolerant title and author search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Books indexed per batch (default: 2000)')
+
+    def handle(self, *args, **options):
+        if search.unidecode is None:
+            self.stdout.write(self.style.WARNING('unidecode is not installed; indexing without transliteration.'))
+        books = search.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {books} book(s).'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from stall import fines
+
+class Command(BaseCommand):
+    help = 'Recompute overdue fines for every late loan under the current fine policies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Loans written per transaction')
+
+    def handle(self, *args, **options):
+        charged = fines.recompute(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Recomputed fines; {charged} loan(s) carry a charge.'))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan
+from stall.models import Book, BookCopy
+
+
+def copy_count_subquery(**filters):
+    """Correlated COUNT(*) of a book's copies, usable in annotate() and update()"""
+    counts = (
+        BookCopy.objects.filter(book=OuterRef('pk'), **filters)
+        .order_by()
+        .values('book')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Recompute Book copy counters and availability from BookCopy rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+
+    def handle(self, *args, **options):
+        actual_total = copy_count_subquery()
+        actual_available = copy_count_subquery(is_available=True)
+
+        with transaction.atomic():
+            drifted = Book.objects.annotate(
+                actual_total=actual_total,
+                actual_available=actual_available,
+            ).filter(
+                ~Q(total_copies=F('actual_total'))
+                | ~Q(available_copies=F('actual_available'))
+                | ~Q(is_available=GreaterThan(F('actual_available'), 0))
+            )
+            drifted_ids = list(drifted.values_list('pk', flat=True))
+
+            if drifted_ids and not options['dry_run']:
+                Book.objects.filter(pk__in=drifted_ids).update(
+                    total_copies=actual_total,
+                    available_copies=actual_available,
+                    is_available=GreaterThan(actual_available, 0),
+                )
+
+        if options['dry_run']:
+            self.stdout.write(f'{len(drifted_ids)} book(s) have drifted copy counters.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Reconciled copy counters for {len(drifted_ids)} book(s).'))
@@ -0,0 +1,53 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from stall import inventory
+
+class Command(BaseCommand):
+    help = 'Compare scanned copy barcodes per shelf with BookCopy and report missing, misplaced and unexpected copies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scan_file', help='CSV of shelf,barcode[,condition] lines, or "-" for stdin')
+        parser.add_argument('--shelf', help='Shelf for files that list only barcodes')
+        parser.add_argument('--apply', action='store_true', help='Save scanned conditions')
+        parser.add_argument('--relocate', action='store_true', help='With --apply, record misplaced copies on the shelf they were found on')
+
+    def handle(self, *args, **options):
+        try:
+            if options['scan_file'] == '-':
+                scans, conditions = inventory.read_scans(sys.stdin, shelf=options['shelf'])
+            else:
+                with open(options['scan_file'], newline='', encoding='utf-8-sig') as scan_file:
+                    scans, conditions = inventory.read_scans(scan_file, shelf=options['shelf'])
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["scan_file"]}: {e}')
+        except inventory.ScanFormatError as e:
+            raise CommandError(str(e))
+
+        copies = inventory.snapshot()
+        report = inventory.reconcile(scans, copies)
+        for shelf, result in report.items():
+            self.stdout.write(
+                f'{shelf or "(no shelf)"}: {result["found"]} scanned, {result["expected"]} expected, '
+                f'{len(result["missing"])} missing, {len(result["misplaced"])} misplaced, '
+                f'{len(result["unexpected"])} unexpected, {len(result["on_loan"])} on loan'
+            )
+            if options['verbosity'] > 1:
+                for barcode in result['missing']:
+                    self.stdout.write(f'  missing     {barcode}')
+                for barcode, recorded in result['misplaced'].items():
+                    self.stdout.write(f'  misplaced   {barcode} (recorded on {recorded or "no shelf"})')
+                for barcode in result['unexpected']:
+                    self.stdout.write(f'  unexpected  {barcode}')
+                for barcode in result['on_loan']:
+                    self.stdout.write(f'  on loan     {barcode}')
+
+        totals = inventory.totals(report)
+        self.stdout.write(
+            f'{totals["shelves"]} shelf(s) checked: {totals["missing"]} missing, '
+            f'{totals["misplaced"]} misplaced, {totals["unexpected"]} unexpected.'
+        )
+        if options['apply']:
+            changed, relocated = inventory.apply(scans, conditions, relocate=options['relocate'], copies=copies)
+            self.stdout.write(self.style.SUCCESS(f'Saved {changed} condition change(s) and {relocated} shelf move(s).'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Report only; pass --apply to save conditions.'))
@@ -0,0 +1,26 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from stall import events
+from stall.models import CirculationEvent
+
+class Command(BaseCommand):
+    help = 'Rebuild copy availability, Book copy counters and daily borrow counts from the circulation event log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild daily borrow counts from this date (YYYY-MM-DD)')
+        parser.add_argument('--skip-borrow-counts', action='store_true', help='Only replay availability')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError(f'Invalid date "{options["since"]}"; use YYYY-MM-DD.')
+
+        copies, books = events.replay_availability()
+        self.stdout.write(f'Replayed {CirculationEvent.objects.count()} event(s): corrected {copies} copy row(s) and {books} book(s).')
+        if not options['skip_borrow_counts']:
+            rows = events.replay_borrow_counts(start=since)
+            self.stdout.write(f'Rebuilt {rows} daily borrow count row(s).')
+        self.stdout.write(self.style.SUCCESS('Circulation projections match the event log.'))
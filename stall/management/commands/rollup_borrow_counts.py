@@ -0,0 +1,19 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from stall import trending
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily per-book borrow counts used for trending books (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help='Number of recent days to rebuild (default: 2)')
+        parser.add_argument('--all', action='store_true', help='Rebuild the whole history')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            rows = trending.rebuild()
+        else:
+            start = date.today() - timedelta(days=options['days'] - 1)
+            rows = trending.rebuild(start=start)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} daily borrow count row(s).'))
@@ -0,0 +1,93 @@
+import logging
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from stall import jobs
+
+logger = logging.getLogger(__name__)
+
+def _forget_parent_connections():
+    # A forked process must open its own connections rather than reuse (or close) the parent's
+    for conn in connections.all(initialized_only=True):
+        conn.connection = None
+
+def _process_pool(concurrency):
+    if 'fork' in multiprocessing.get_all_start_methods():
+        # Forked children inherit the set-up app registry; ask for fork explicitly, as
+        # macOS (and Linux from Python 3.14) default to spawning fresh interpreters
+        return ProcessPoolExecutor(
+            max_workers=concurrency,
+            mp_context=multiprocessing.get_context('fork'),
+            initializer=_forget_parent_connections,
+        )
+    # Spawned children start from scratch and must set Django up before running a job
+    return ProcessPoolExecutor(
+        max_workers=concurrency,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    )
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (thumbnails, fine sweeps, rollups, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='Jobs run at the same time (default: 2)')
+        parser.add_argument('--processes', action='store_true', help='Use a process pool instead of threads')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def _pool(self, options):
+        if options['processes']:
+            return _process_pool(options['concurrency'])
+        return ThreadPoolExecutor(max_workers=options['concurrency'], thread_name_prefix='jobs')
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        worker = jobs.worker_name()
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale job(s).')
+
+        pool = self._pool(options)
+        in_flight = {}
+        finished = 0
+        try:
+            while True:
+                free = concurrency - len(in_flight)
+                claimed = jobs.claim(worker, free) if free else []
+                for job_id in claimed:
+                    in_flight[pool.submit(jobs.run, job_id)] = job_id
+
+                if not in_flight:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+
+                done, _ = wait(in_flight, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    job_id = in_flight.pop(future)
+                    finished += 1
+                    try:
+                        future.result()
+                    except Exception as e:
+                        # jobs.run records the job's own errors; this is the pool or the database
+                        # failing around it, so record it against the job and keep the worker going
+                        logger.exception('Job #%s did not finish', job_id)
+                        jobs.fail(job_id, traceback.format_exc())
+                        broken = broken or isinstance(e, BrokenExecutor)
+                if broken:
+                    # A dead process breaks the whole pool; its other futures fail on later passes
+                    pool.shutdown(wait=False)
+                    pool = self._pool(options)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping; waiting for running jobs to finish...')
+        finally:
+            pool.shutdown(wait=True)
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker} finished {finished} job(s).'))
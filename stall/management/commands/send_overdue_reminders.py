@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from stall import reminders
+
+class Command(BaseCommand):
+    help = 'Email each member one digest of their overdue loans (run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=reminders.CHUNK_SIZE, help='Emails sent per batch')
+        parser.add_argument('--throttle', type=float, default=1.0, help='Seconds to pause between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Count the reminders without sending them')
+
+    def handle(self, *args, **options):
+        members, loans = reminders.send_reminders(
+            chunk_size=options['chunk_size'],
+            throttle=options['throttle'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'Would send' if options['dry_run'] else 'Sent'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {members} reminder(s) covering {loans} overdue loan(s).'))
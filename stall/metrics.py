@@ -0,0 +1,117 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Counters and histograms live in this process's memory and are served by the
+/metrics view. Each metric guards its samples with its own lock, so request
+threads only hold a lock for a dict update. With several worker processes,
+every process keeps its own numbers; Prometheus sums them per instance.
+"""
+import threading
+from bisect import bisect_left
+
+REGISTRY = []
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, extra=()):
+        pairs = [*zip(self.labelnames, key), *extra]
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def collect(self):
+        """Lines of samples for this metric"""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{self._labels(key)} {_number(value)}' for key, value in values]
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def collect(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, n in zip((*self.buckets, '+Inf'), counts):
+                cumulative += n
+                le = bound if bound == '+Inf' else _number(bound)
+                lines.append(f'{self.name}_bucket{self._labels(key, [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{self._labels(key)} {_number(total)}')
+            lines.append(f'{self.name}_count{self._labels(key)} {cumulative}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Every registered metric in the text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+REQUESTS = Counter(
+    'library_http_requests_total', 'HTTP requests by view, method and status code', ['view', 'method', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'library_http_request_duration_seconds', 'Time spent handling a request', ['view', 'method']
+)
+REQUEST_QUERIES = Histogram(
+    'library_http_request_queries', 'Database queries run per request', ['view'], buckets=QUERY_BUCKETS
+)
+CHECKOUTS = Counter('library_checkouts_total', 'Loans issued, directly or from a hold', ['via'])
+RETURNS = Counter('library_returns_total', 'Loans checked back in')
+CHATBOT_CALLS = Counter('library_chatbot_calls_total', 'Gemini calls by outcome (ok, error, timeout)', ['outcome'])
+CHATBOT_LATENCY = Histogram('library_chatbot_call_duration_seconds', 'Time spent waiting for Gemini')
+CACHE_LOOKUPS = Counter('library_cache_lookups_total', 'Cache reads by cache and result (hit, miss)', ['cache', 'result'])
@@ -0,0 +1,76 @@
+import itertools
+import time
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+from . import metrics
+
+# Per-request query counter; context variables follow the request into
+# sync_to_async threads, so queries an async view runs elsewhere still count
+_query_count = ContextVar('query_count', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _query_count.get()
+    if counter is not None:
+        next(counter)  # Atomic, unlike += on a shared int
+    return execute(sql, params, many, context)
+
+
+def _watch(connection):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def _watch_new_connection(sender, connection, **kwargs):
+    _watch(connection)
+
+
+connection_created.connect(_watch_new_connection)
+
+
+class MetricsMiddleware:
+    """Record latency, status and query count for every request, labelled by view name"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            _watch(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = itertools.count()
+        token = _query_count.set(counter)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_count.reset(token)
+        self._record(request, response, time.perf_counter() - started, next(counter))
+        return response
+
+    async def __acall__(self, request):
+        counter = itertools.count()
+        token = _query_count.set(counter)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_count.reset(token)
+        self._record(request, response, time.perf_counter() - started, next(counter))
+        return response
+
+    def _record(self, request, response, elapsed, queries):
+        match = getattr(request, 'resolver_match', None)
+        # Unmatched paths share one label so 404 scans can't grow the registry
+        view = match.view_name if match else 'unmatched'
+        metrics.REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        metrics.REQUEST_LATENCY.observe(elapsed, view=view, method=request.method)
+        metrics.REQUEST_QUERIES.observe(queries, view=view)
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:56
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_copy_counters(apps, schema_editor):
+    Book = apps.get_model('stall', 'Book')
+    for book in Book.objects.annotate(
+        total=Count('copies'),
+        available=Count('copies', filter=Q(copies__is_available=True)),
+    ).iterator():
+        Book.objects.filter(pk=book.pk).update(
+            total_copies=book.total,
+            available_copies=book.available,
+            is_available=book.available > 0,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stall', '0003_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='available_copies',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='total_copies',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='is_available',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(backfill_copy_counters, migrations.RunPython.noop),
+    ]
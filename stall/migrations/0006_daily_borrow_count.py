@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_daily_borrow_counts(apps, schema_editor):
+    BorrowRecord = apps.get_model('stall', 'BorrowRecord')
+    DailyBorrowCount = apps.get_model('stall', 'DailyBorrowCount')
+    counts = BorrowRecord.objects.order_by().values('book', 'borrow_date').annotate(count=Count('pk'))
+    DailyBorrowCount.objects.bulk_create(
+        [DailyBorrowCount(book_id=row['book'], day=row['borrow_date'], count=row['count']) for row in counts],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stall', '0005_reservation_queue_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBorrowCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_borrow_counts', to='stall.book')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='daily_borrow_day_idx')],
+                'unique_together': {('book', 'day')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_borrow_counts, migrations.RunPython.noop),
+    ]
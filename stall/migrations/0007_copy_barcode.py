@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_barcodes(apps, schema_editor):
+    BookCopy = apps.get_model('stall', 'BookCopy')
+    # copy_number is only unique per book; prefix the book id where it clashes
+    shared = set(
+        BookCopy.objects.values('copy_number').annotate(n=Count('pk')).filter(n__gt=1).values_list('copy_number', flat=True)
+    )
+    for copy in BookCopy.objects.filter(barcode__isnull=True).iterator():
+        copy.barcode = f'{copy.book_id}-{copy.copy_number}' if copy.copy_number in shared else copy.copy_number
+        copy.save(update_fields=['barcode'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stall', '0006_daily_borrow_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookcopy',
+            name='barcode',
+            field=models.CharField(blank=True, help_text='Scannable label; defaults to the copy number', max_length=32, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='borrowrecord',
+            name='copy',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='loans', to='stall.bookcopy'),
+        ),
+        migrations.RunPython(backfill_barcodes, migrations.RunPython.noop),
+    ]
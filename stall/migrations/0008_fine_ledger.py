@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_fine_policies(apps, schema_editor):
+    # Start every membership type on the old flat rate of BDT 5/day
+    FinePolicy = apps.get_model('stall', 'FinePolicy')
+    for membership_type in ('student', 'faculty', 'staff', 'general'):
+        FinePolicy.objects.get_or_create(membership_type=membership_type, defaults={'rate_per_day': 5})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stall', '0007_copy_barcode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinePolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('membership_type', models.CharField(choices=[('student', 'Student'), ('faculty', 'Faculty'), ('staff', 'Staff'), ('general', 'General Public')], max_length=20, unique=True)),
+                ('rate_per_day', models.DecimalField(decimal_places=2, default=5, help_text='Fine per day late (BDT)', max_digits=6)),
+                ('grace_days', models.PositiveIntegerField(default=0, help_text='Days late before any fine is charged')),
+                ('max_fine', models.DecimalField(blank=True, decimal_places=2, help_text='Cap per loan; leave blank for no cap', max_digits=8, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Fine Policies',
+            },
+        ),
+        migrations.CreateModel(
+            name='FineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('overdue', 'Overdue Fine'), ('payment', 'Payment'), ('waiver', 'Waiver')], default='overdue', max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('days_late', models.PositiveIntegerField(default=0)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('borrow_record', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fine_entries', to='stall.borrowrecord')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fine_entries', to='stall.member')),
+            ],
+            options={
+                'verbose_name_plural': 'Fine Entries',
+                'indexes': [models.Index(fields=['member', 'amount'], name='fine_entry_balance_idx')],
+                'unique_together': {('borrow_record', 'kind')},
+            },
+        ),
+        migrations.RunPython(seed_fine_policies, migrations.RunPython.noop),
+    ]
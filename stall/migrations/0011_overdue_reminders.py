@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stall', '0010_job_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverdueReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sent_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('days_overdue', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['return_date', 'due_date'], name='borrow_open_due_idx'),
+        ),
+        migrations.AddField(
+            model_name='overduereminder',
+            name='borrow_record',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='stall.borrowrecord'),
+        ),
+        migrations.AddField(
+            model_name='overduereminder',
+            name='member',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='overdue_reminders', to='stall.member'),
+        ),
+        migrations.AddIndex(
+            model_name='overduereminder',
+            index=models.Index(fields=['borrow_record', 'sent_at'], name='overdue_reminder_loan_idx'),
+        ),
+    ]
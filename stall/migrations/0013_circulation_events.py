@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from datetime import datetime, time
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_circulation_events(apps, schema_editor):
+    """Seed the log with a checkout, and a return if any, for every existing loan"""
+    BorrowRecord = apps.get_model('stall', 'BorrowRecord')
+    CirculationEvent = apps.get_model('stall', 'CirculationEvent')
+    loans = BorrowRecord.objects.order_by('pk').values_list(
+        'pk', 'book_id', 'member_id', 'copy_id', 'borrow_date', 'due_date', 'return_date', 'status'
+    )
+    events = []
+    for pk, book_id, member_id, copy_id, borrow_date, due_date, return_date, status in loans.iterator(chunk_size=2000):
+        base = dict(loan_id=pk, book_id=book_id, member_id=member_id, copy_id=copy_id)
+        events.append(CirculationEvent(
+            kind=1, occurred_at=timezone.make_aware(datetime.combine(borrow_date, time.min)),
+            status='borrowed', due_date=due_date, **base
+        ))
+        if return_date:
+            events.append(CirculationEvent(
+                kind=2, occurred_at=timezone.make_aware(datetime.combine(return_date, time.min)),
+                status=status, **base
+            ))
+        if len(events) >= 2000:
+            CirculationEvent.objects.bulk_create(events)
+            events = []
+    CirculationEvent.objects.bulk_create(events)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stall', '0012_search_trigrams'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CirculationEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Checkout'), (2, 'Return'), (3, 'Renewal'), (4, 'Status change')])),
+                ('status', models.CharField(choices=[('borrowed', 'Borrowed'), ('returned', 'Returned'), ('overdue', 'Overdue'), ('lost', 'Lost'), ('damaged', 'Damaged')], max_length=20)),
+                ('due_date', models.DateField(null=True)),
+                ('book', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='stall.book')),
+                ('copy', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='stall.bookcopy')),
+                ('loan', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='events', to='stall.borrowrecord')),
+                ('member', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='stall.member')),
+            ],
+            options={
+                'ordering': ['occurred_at', 'id'],
+                'indexes': [models.Index(fields=['occurred_at', 'id'], name='circulation_event_time_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_circulation_events, migrations.RunPython.noop),
+    ]
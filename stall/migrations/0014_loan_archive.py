@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stall', '0013_circulation_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBorrowRecord',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('borrow_date', models.DateField()),
+                ('due_date', models.DateField()),
+                ('return_date', models.DateField()),
+                ('status', models.CharField(choices=[('borrowed', 'Borrowed'), ('returned', 'Returned'), ('overdue', 'Overdue'), ('lost', 'Lost'), ('damaged', 'Damaged')], default='returned', max_length=20)),
+                ('fine_amount', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('notes', models.TextField(blank=True)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='stall.book')),
+                ('copy', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='stall.bookcopy')),
+                ('issued_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_loans', to='stall.member')),
+            ],
+            options={
+                'ordering': ['-borrow_date', '-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='fineentry',
+            name='archived_loan',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fine_entries', to='stall.archivedborrowrecord'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedborrowrecord',
+            index=models.Index(fields=['member', 'borrow_date', 'id'], name='archived_loan_member_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedborrowrecord',
+            index=models.Index(fields=['borrow_date'], name='archived_loan_borrow_idx'),
+        ),
+    ]
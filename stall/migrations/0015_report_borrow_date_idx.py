@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stall', '0014_loan_archive'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='archivedborrowrecord',
+            name='archived_loan_borrow_idx',
+        ),
+        migrations.AddIndex(
+            model_name='archivedborrowrecord',
+            index=models.Index(fields=['borrow_date', 'id'], name='archived_loan_borrow_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['borrow_date', 'id'], name='borrow_date_id_idx'),
+        ),
+    ]
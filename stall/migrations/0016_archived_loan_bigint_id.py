@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stall', '0015_report_borrow_date_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedborrowrecord',
+            name='id',
+            field=models.BigIntegerField(primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:27
+
+from django.db import migrations, models
+
+
+def clear_queued_expiry(apps, schema_editor):
+    # Holds used to expire three days after they were placed; only those with a copy waiting keep a date
+    Reservation = apps.get_model('stall', 'Reservation')
+    Reservation.objects.filter(status='pending', book__available_copies=0).update(expiry_date=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stall', '0016_archived_loan_bigint_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reservation',
+            name='expiry_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(clear_queued_expiry, migrations.RunPython.noop),
+    ]
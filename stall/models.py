@@ -1,7 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.lookups import GreaterThan
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.utils import timezone
+from django.utils.functional import cached_property
 from datetime import date, timedelta
+from . import thumbnails
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
@@ -61,18 +66,56 @@ class Book(models.Model):
     language = models.CharField(max_length=10, choices=LANGUAGE_CHOICES, default='en')
     description = models.TextField(blank=True)
     cover_image = models.ImageField(upload_to='book_covers/', blank=True, null=True)
-    is_available = models.BooleanField(default=True)
+    cover_thumbnails = models.JSONField(default=dict, blank=True, editable=False)
+    # Maintained by Book.adjust_copies(); is_available mirrors available_copies > 0
+    total_copies = models.PositiveIntegerField(default=0, editable=False)
+    available_copies = models.PositiveIntegerField(default=0, editable=False)
+    is_available = models.BooleanField(default=False, editable=False)
     price = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True, help_text="Book price for reference")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    COUNTER_FIELDS = ('total_copies', 'available_copies', 'is_available')
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Counters are only changed through adjust_copies(); never write back a stale in-memory value
+        if not self._state.adding and 'update_fields' not in kwargs and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def adjust_copies(cls, book_id, total=0, available=0):
+        """Apply copy counter deltas in a single UPDATE and keep is_available in step"""
+        from .facets import index as facet_index  # facets imports this module
+
+        new_available = F('available_copies') + available
+        updated = cls.objects.filter(pk=book_id).update(
+            total_copies=F('total_copies') + total,
+            available_copies=new_available,
+            is_available=GreaterThan(new_available, 0),
+        )
+        # Availability may have flipped; the facet counts re-read the book once this commits
+        transaction.on_commit(lambda: facet_index.touch(book_id))
+        return updated
+
     @property
     def author_names(self):
         return ", ".join([author.full_name for author in self.authors.all()])
 
+    @property
+    def cover_srcset(self):
+        return thumbnails.srcset(self.cover_thumbnails)
+
+    @property
+    def cover_thumbnail_url(self):
+        return thumbnails.thumbnail_url(self.cover_thumbnails, 300)
+
 class Member(models.Model):
     MEMBERSHIP_TYPE_CHOICES = [
         ('student', 'Student'),
@@ -91,6 +134,7 @@ class Member(models.Model):
     date_joined = models.DateField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     photo = models.ImageField(upload_to='member_photos/', blank=True, null=True)
+    photo_thumbnails = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.membership_id})"
@@ -99,16 +143,61 @@ class Member(models.Model):
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
 
+    @property
+    def photo_srcset(self):
+        return thumbnails.srcset(self.photo_thumbnails)
+
+    @property
+    def photo_thumbnail_url(self):
+        return thumbnails.thumbnail_url(self.photo_thumbnails, 128)
+
+    @cached_property
+    def borrowing_history(self):
+        """Every loan not yet archived, newest first, fetched once with books and authors"""
+        return list(
+            self.borrowrecord_set.select_related('book').prefetch_related('book__authors')
+        )
+
+    @cached_property
+    def _borrowing_partitions(self):
+        today = date.today()
+        active, overdue, returned = [], [], []
+        for record in self.borrowing_history:
+            if record.return_date:
+                returned.append(record)
+            else:
+                active.append(record)
+                if record.due_date < today:
+                    overdue.append(record)
+        return active, overdue, returned
+
     @property
     def active_borrowings(self):
-        return self.borrowrecord_set.filter(return_date__isnull=True)
+        return self._borrowing_partitions[0]
 
     @property
     def overdue_books(self):
-        return self.borrowrecord_set.filter(
-            return_date__isnull=True,
-            due_date__lt=date.today()
-        )
+        return self._borrowing_partitions[1]
+
+    @property
+    def returned_borrowings(self):
+        return self._borrowing_partitions[2]
+
+    @cached_property
+    def archived_totals(self):
+        """{'loans': n, 'fines': amount} for loans moved to the archive, without loading them"""
+        totals = self.archived_loans.aggregate(loans=models.Count('pk'), fines=models.Sum('fine_amount'))
+        return {'loans': totals['loans'], 'fines': totals['fines'] or 0}
+
+    @cached_property
+    def borrowing_stats(self):
+        archived = self.archived_totals
+        return {
+            'total_borrowed': len(self.borrowing_history) + archived['loans'],
+            'currently_borrowed': len(self.active_borrowings),
+            'overdue_count': len(self.overdue_books),
+            'total_fines': sum((record.fine_amount for record in self.borrowing_history), archived['fines']),
+        }
 
 class BorrowRecord(models.Model):
     STATUS_CHOICES = [
@@ -121,6 +210,7 @@ class BorrowRecord(models.Model):
 
     member = models.ForeignKey(Member, on_delete=models.CASCADE)
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    copy = models.ForeignKey('BookCopy', on_delete=models.SET_NULL, null=True, blank=True, related_name='loans')
     borrow_date = models.DateField(auto_now_add=True)
     due_date = models.DateField()
     return_date = models.DateField(blank=True, null=True)
@@ -155,10 +245,18 @@ class BorrowRecord(models.Model):
         elif self.is_overdue:
             self.status = 'overdue'
         
-        super().save(*args, **kwargs)
+        # The circulation event appended by post_save commits or rolls back with the loan
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     class Meta:
         ordering = ['-borrow_date']
+        indexes = [
+            # Open loans past a date: overdue reminders and fine sweeps
+            models.Index(fields=['return_date', 'due_date'], name='borrow_open_due_idx'),
+            # Loans borrowed in a date range, read in (borrow_date, id) keyset chunks by the reports
+            models.Index(fields=['borrow_date', 'id'], name='borrow_date_id_idx'),
+        ]
 
 class BookCopy(models.Model):
     CONDITION_CHOICES = [
@@ -171,6 +269,7 @@ class BookCopy(models.Model):
 
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='copies')
     copy_number = models.CharField(max_length=20)
+    barcode = models.CharField(max_length=32, unique=True, blank=True, null=True, help_text="Scannable label; defaults to the copy number")
     condition = models.CharField(max_length=20, choices=CONDITION_CHOICES, default='good')
     is_available = models.BooleanField(default=True)
     location_shelf = models.CharField(max_length=50, blank=True, help_text="Shelf location in library")
@@ -180,6 +279,24 @@ class BookCopy(models.Model):
     def __str__(self):
         return f"{self.book.title} - Copy #{self.copy_number}"
 
+    def default_barcode(self):
+        """The copy number, prefixed with the book ID when another copy already uses it (as migration 0007 does)"""
+        if BookCopy.objects.filter(barcode=self.copy_number).exclude(pk=self.pk).exists():
+            return f'{self.book_id}-{self.copy_number}'
+        return self.copy_number
+
+    def clean(self):
+        super().clean()
+        if not self.barcode and self.book_id and self.copy_number:
+            barcode = self.default_barcode()
+            if BookCopy.objects.filter(barcode=barcode).exclude(pk=self.pk).exists():
+                raise ValidationError({'barcode': f'Barcode "{barcode}" is already in use; enter one for this copy.'})
+
+    def save(self, *args, **kwargs):
+        if not self.barcode:
+            self.barcode = self.default_barcode()
+        super().save(*args, **kwargs)
+
     class Meta:
         unique_together = ('book', 'copy_number')
         verbose_name_plural = "Book Copies"
@@ -196,17 +313,212 @@ class Reservation(models.Model):
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
     reservation_date = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-    expiry_date = models.DateField()
+    # Last day to pick up the book; set once a copy is waiting, empty while queued
+    expiry_date = models.DateField(null=True, blank=True)
     notes = models.TextField(blank=True)
 
     def __str__(self):
         return f"{self.book.title} reserved by {self.member.full_name}"
 
-    def save(self, *args, **kwargs):
-        if not self.expiry_date:
-            # Reservation expires after 3 days
-            self.expiry_date = date.today() + timedelta(days=3)
-        super().save(*args, **kwargs)
-
     class Meta:
         ordering = ['-reservation_date']
+        indexes = [
+            # FIFO hold queue per book: WHERE book = ? AND status = 'pending' ORDER BY reservation_date
+            models.Index(fields=['book', 'status', 'reservation_date'], name='reservation_queue_idx'),
+        ]
+
+class DailyBorrowCount(models.Model):
+    """Borrows per book per day, kept current by a signal and rebuilt nightly"""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='daily_borrow_counts')
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.book.title} - {self.day}: {self.count}"
+
+    class Meta:
+        unique_together = ('book', 'day')
+        indexes = [
+            models.Index(fields=['day'], name='daily_borrow_day_idx'),
+        ]
+
+class FinePolicy(models.Model):
+    membership_type = models.CharField(max_length=20, choices=Member.MEMBERSHIP_TYPE_CHOICES, unique=True)
+    rate_per_day = models.DecimalField(max_digits=6, decimal_places=2, default=5, help_text="Fine per day late (BDT)")
+    grace_days = models.PositiveIntegerField(default=0, help_text="Days late before any fine is charged")
+    max_fine = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True, help_text="Cap per loan; leave blank for no cap")
+
+    def __str__(self):
+        return f"{self.get_membership_type_display()}: BDT {self.rate_per_day}/day"
+
+    class Meta:
+        verbose_name_plural = "Fine Policies"
+
+class FineEntry(models.Model):
+    KIND_CHOICES = [
+        ('overdue', 'Overdue Fine'),
+        ('payment', 'Payment'),
+        ('waiver', 'Waiver'),
+    ]
+
+    # Charges are positive, payments and waivers negative; a member's balance is the sum
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='fine_entries')
+    borrow_record = models.ForeignKey(BorrowRecord, on_delete=models.CASCADE, null=True, blank=True, related_name='fine_entries')
+    # Set instead of borrow_record once the loan is archived
+    archived_loan = models.ForeignKey('ArchivedBorrowRecord', on_delete=models.SET_NULL, null=True, blank=True, related_name='fine_entries')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='overdue')
+    amount = models.DecimalField(max_digits=8, decimal_places=2)
+    days_late = models.PositiveIntegerField(default=0)
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.member.full_name} - {self.get_kind_display()}: BDT {self.amount}"
+
+    class Meta:
+        # One overdue entry per loan; payments and waivers have no loan, so they can repeat
+        unique_together = ('borrow_record', 'kind')
+        indexes = [
+            models.Index(fields=['member', 'amount'], name='fine_entry_balance_idx'),
+        ]
+        verbose_name_plural = "Fine Entries"
+
+class BookRecommendation(models.Model):
+    """Top co-borrowed books per book, rebuilt offline by build_recommendations"""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='recommended_for')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    shared_borrowers = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.book.title} -> {self.recommended.title} (#{self.rank})"
+
+    class Meta:
+        unique_together = ('book', 'rank')
+        ordering = ['book', 'rank']
+
+class SearchTrigram(models.Model):
+    """One trigram of a book's normalized title or author names (see stall/search.py)"""
+    trigram = models.CharField(max_length=3)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+
+    def __str__(self):
+        return f"{self.trigram!r} -> {self.book_id}"
+
+    class Meta:
+        # Leads with trigram so a lookup reads only the postings it needs
+        unique_together = ('trigram', 'book')
+
+class Job(models.Model):
+    """A unit of background work picked up by the run_worker command"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # Jobs sharing a key never run or wait in the queue twice at the same time
+    dedup_key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_queue_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='job_active_dedup_key',
+            ),
+        ]
+
+class OverdueReminder(models.Model):
+    """An overdue notice sent for a loan, kept so reminders aren't repeated too often"""
+    borrow_record = models.ForeignKey(BorrowRecord, on_delete=models.CASCADE, related_name='reminders')
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='overdue_reminders')
+    sent_at = models.DateTimeField(default=timezone.now)
+    days_overdue = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.member.full_name} - {self.borrow_record.book.title} ({self.sent_at:%Y-%m-%d})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['borrow_record', 'sent_at'], name='overdue_reminder_loan_idx'),
+        ]
+
+class CirculationEvent(models.Model):
+    """One change to a loan, appended by a signal in the transaction that made it (see stall/events.py)"""
+    CHECKOUT, RETURN, RENEWAL, STATUS = 1, 2, 3, 4
+    KIND_CHOICES = [
+        (CHECKOUT, 'Checkout'),
+        (RETURN, 'Return'),
+        (RENEWAL, 'Renewal'),
+        (STATUS, 'Status change'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    occurred_at = models.DateTimeField(default=timezone.now)
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    # Plain references without constraints: the log outlives the rows it describes
+    loan = models.ForeignKey(BorrowRecord, on_delete=models.DO_NOTHING, db_constraint=False, related_name='events')
+    book = models.ForeignKey(Book, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+')
+    member = models.ForeignKey(Member, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+')
+    copy = models.ForeignKey(BookCopy, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, related_name='+')
+    # Loan status after the change, and the due date for checkouts and renewals
+    status = models.CharField(max_length=20, choices=BorrowRecord.STATUS_CHOICES)
+    due_date = models.DateField(null=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} of loan #{self.loan_id} at {self.occurred_at:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        ordering = ['occurred_at', 'id']
+        indexes = [
+            models.Index(fields=['occurred_at', 'id'], name='circulation_event_time_idx'),
+        ]
+
+class ArchivedBorrowRecord(models.Model):
+    """A returned loan moved out of BorrowRecord by stall/archive.py, keeping its id"""
+    id = models.BigIntegerField(primary_key=True)
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='archived_loans')
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    copy = models.ForeignKey(BookCopy, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    borrow_date = models.DateField()
+    due_date = models.DateField()
+    return_date = models.DateField()
+    status = models.CharField(max_length=20, choices=BorrowRecord.STATUS_CHOICES, default='returned')
+    fine_amount = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    notes = models.TextField(blank=True)
+    issued_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.book.title} - {self.member.full_name} (archived)"
+
+    class Meta:
+        ordering = ['-borrow_date', '-id']
+        indexes = [
+            # A member's older history, newest first, a page at a time
+            models.Index(fields=['member', 'borrow_date', 'id'], name='archived_loan_member_idx'),
+            models.Index(fields=['borrow_date', 'id'], name='archived_loan_borrow_idx'),
+        ]
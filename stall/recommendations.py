@@ -0,0 +1,121 @@
+"""'Members also borrowed' recommendations.
+
+build() takes every member's distinct borrowed books and counts how many
+members borrowed each pair of books, as a sparse co-occurrence matrix held in
+coordinate form (pair key -> count). Pairs are scored by cosine similarity:
+shared borrowers / sqrt(borrowers of A * borrowers of B). The top k per book
+are stored in BookRecommendation, so a lookup is one indexed query.
+"""
+import numpy as np
+from django.db import transaction
+
+from .models import ArchivedBorrowRecord, Book, BookRecommendation, BorrowRecord
+
+TOP_K = 10
+
+# Pairs shared by fewer members than this are treated as noise
+MIN_SHARED = 2
+
+# Histories longer than this (test or staff accounts) would add too many pairs and say little
+MAX_HISTORY = 500
+
+# Pair keys buffered before they are folded into the running counts
+MERGE_EVERY = 5_000_000
+
+
+def _merge(keys, counts, new_keys, new_counts):
+    merged, inverse = np.unique(np.concatenate([keys, new_keys]), return_inverse=True)
+    return merged, np.bincount(inverse, weights=np.concatenate([counts, new_counts])).astype(np.int64)
+
+
+def cooccurrence(member_codes, book_codes, n_books):
+    """Sparse co-borrow counts as (pair keys, counts); key = book_a * n_books + book_b.
+
+    `member_codes` and `book_codes` hold one row per distinct (member, book).
+    """
+    order = np.lexsort((book_codes, member_codes))
+    members, books = member_codes[order], book_codes[order]
+    groups = np.split(books, np.flatnonzero(np.diff(members)) + 1)
+
+    keys = np.empty(0, dtype=np.int64)
+    counts = np.empty(0, dtype=np.int64)
+    pending, buffered = [], 0
+    for group in groups:
+        if len(group) < 2 or len(group) > MAX_HISTORY:
+            continue
+        a, b = np.meshgrid(group, group, indexing='ij')
+        off_diagonal = a != b
+        pending.append(a[off_diagonal] * n_books + b[off_diagonal])
+        buffered += len(group) * (len(group) - 1)
+        if buffered >= MERGE_EVERY:
+            new_keys, new_counts = np.unique(np.concatenate(pending), return_counts=True)
+            keys, counts = _merge(keys, counts, new_keys, new_counts)
+            pending, buffered = [], 0
+    if pending:
+        new_keys, new_counts = np.unique(np.concatenate(pending), return_counts=True)
+        keys, counts = _merge(keys, counts, new_keys, new_counts)
+    return keys, counts
+
+
+def top_k(keys, counts, borrowers, n_books, k=TOP_K, min_shared=MIN_SHARED):
+    """(book, recommended, rank, score, shared) arrays for the k best pairs per book"""
+    keep = counts >= min_shared
+    keys, counts = keys[keep], counts[keep]
+    a, b = keys // n_books, keys % n_books
+    scores = counts / np.sqrt(borrowers[a] * borrowers[b])
+
+    # Best score first within each book; ties go to the more borrowed title
+    order = np.lexsort((-borrowers[b], -scores, a))
+    a, b, scores, counts = a[order], b[order], scores[order], counts[order]
+    starts = np.flatnonzero(np.r_[True, a[1:] != a[:-1]])
+    sizes = np.diff(np.r_[starts, len(a)])
+    rank = np.arange(len(a)) - np.repeat(starts, sizes)
+    best = rank < k
+    return a[best], b[best], rank[best] + 1, scores[best], counts[best]
+
+
+def build(k=TOP_K, min_shared=MIN_SHARED):
+    """Recompute and store recommendations for every book; returns the number stored"""
+    rows = np.array(
+        # UNION keeps each (member, book) pair once across live and archived loans
+        list(
+            BorrowRecord.objects.order_by().values_list('member_id', 'book_id')
+            .union(ArchivedBorrowRecord.objects.order_by().values_list('member_id', 'book_id'))
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    book_ids, book_codes = np.unique(rows[:, 1], return_inverse=True)
+    _, member_codes = np.unique(rows[:, 0], return_inverse=True)
+    n_books = len(book_ids)
+
+    keys, counts = cooccurrence(member_codes, book_codes, n_books)
+    borrowers = np.bincount(book_codes, minlength=n_books)
+    a, b, rank, scores, shared = top_k(keys, counts, borrowers, n_books, k, min_shared)
+
+    recommendations = [
+        BookRecommendation(book_id=book, recommended_id=other, rank=r, score=s, shared_borrowers=n)
+        for book, other, r, s, n in zip(
+            book_ids[a].tolist(), book_ids[b].tolist(), rank.tolist(), scores.tolist(), shared.tolist()
+        )
+    ]
+    with transaction.atomic():
+        BookRecommendation.objects.all().delete()
+        BookRecommendation.objects.bulk_create(recommendations, batch_size=1000)
+    return len(recommendations)
+
+
+def also_borrowed(book, limit=6):
+    """Books most often borrowed by members who borrowed `book`"""
+    return [
+        rec.recommended
+        for rec in BookRecommendation.objects.filter(book=book).select_related('recommended')[:limit]
+    ]
+
+
+def also_borrowed_for(book_ids, limit=3):
+    """{book id: [recommended titles]} for several books in one query"""
+    result = {}
+    recs = BookRecommendation.objects.filter(book_id__in=book_ids, rank__lte=limit).select_related('recommended')
+    for rec in recs:
+        result.setdefault(rec.book_id, []).append(rec.recommended.title)
+    return result
@@ -0,0 +1,105 @@
+"""Overdue reminder digests: one email per member listing every overdue loan."""
+import time
+from datetime import date, timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Exists, OuterRef
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import BorrowRecord, OverdueReminder
+
+# A loan is mentioned again only after this many days
+REMIND_EVERY = timedelta(days=7)
+
+CHUNK_SIZE = 50
+
+
+def due_reminders(today=None, remind_every=REMIND_EVERY):
+    """Open overdue loans not reminded about recently, ordered by member (served by borrow_open_due_idx)"""
+    today = today or date.today()
+    recent = OverdueReminder.objects.filter(
+        borrow_record=OuterRef('pk'),
+        sent_at__gte=timezone.now() - remind_every,
+    )
+    return (
+        BorrowRecord.objects.filter(return_date__isnull=True, due_date__lt=today, member__is_active=True)
+        .exclude(member__email='')
+        .filter(~Exists(recent))
+        .select_related('member', 'book')
+        .order_by('member_id', 'due_date', 'pk')
+    )
+
+
+def digests(loans, today=None):
+    """(member, loans, EmailMessage) per member"""
+    today = today or date.today()
+    for _, member_loans in groupby(loans, key=lambda loan: loan.member_id):
+        member_loans = list(member_loans)
+        member = member_loans[0].member
+        context = {
+            'member': member,
+            'loans': [(loan, (today - loan.due_date).days) for loan in member_loans],
+        }
+        message = EmailMessage(
+            subject=render_to_string('stall/email/overdue_reminder_subject.txt', context).strip(),
+            body=render_to_string('stall/email/overdue_reminder.txt', context),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[member.email],
+        )
+        yield member, member_loans, message
+
+
+def send_reminders(today=None, chunk_size=CHUNK_SIZE, throttle=0.0, dry_run=False, connection=None):
+    """Send due digests over one reused connection, `chunk_size` at a time.
+
+    Sleeps `throttle` seconds between chunks to stay under the mail server's
+    rate limit. Each digest's reminders are recorded once it has been sent.
+    Returns (members emailed, loans covered).
+    """
+    today = today or date.today()
+    loans = due_reminders(today).iterator(chunk_size=2000)
+    members = covered = 0
+
+    connection = connection or get_connection()
+    if not dry_run:
+        connection.open()
+    try:
+        chunk = []
+        for member, member_loans, message in digests(loans, today):
+            chunk.append((member, member_loans, message))
+            if len(chunk) >= chunk_size:
+                members, covered = _send_chunk(connection, chunk, today, dry_run, members, covered)
+                chunk = []
+                if throttle:
+                    time.sleep(throttle)
+        if chunk:
+            members, covered = _send_chunk(connection, chunk, today, dry_run, members, covered)
+    finally:
+        if not dry_run:
+            connection.close()
+    return members, covered
+
+
+def _send_chunk(connection, chunk, today, dry_run, members, covered):
+    for member, member_loans, message in chunk:
+        if not dry_run:
+            # Record each digest as soon as it is sent, so a failure later in the
+            # chunk can't leave delivered reminders unrecorded (and sent again)
+            if not connection.send_messages([message]):
+                continue
+            now = timezone.now()
+            OverdueReminder.objects.bulk_create([
+                OverdueReminder(
+                    borrow_record=loan,
+                    member=member,
+                    sent_at=now,
+                    days_overdue=(today - loan.due_date).days,
+                )
+                for loan in member_loans
+            ])
+        members += 1
+        covered += len(member_loans)
+    return members, covered
@@ -0,0 +1,192 @@
+"""Typo-tolerant title and author search backed by a trigram table.
+
+Each book's title and author names are normalized (NFKD, Latin accents and
+optional Arabic/Indic marks folded, common Arabic/Urdu letter variants
+unified, doubled letters squeezed) and cut into padded three-character
+trigrams, which are stored in SearchTrigram. When the optional `unidecode`
+package is installed, non-Latin text is also indexed in a Latin
+transliteration, so "Rabindranath" finds রবীন্দ্রনাথ and the other way round.
+
+A lookup groups the postings of the query's trigrams by book in SQL, keeps
+the best candidates, and ranks them by the share of the query's trigrams
+each one contains (pg_trgm's word similarity). Very common trigrams are left
+out of the SQL pass once the rarer ones give enough to go on, so a lookup
+reads a bounded number of postings however large the catalog grows.
+"""
+import math
+import re
+import unicodedata
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Book, SearchTrigram
+
+try:
+    from unidecode import unidecode
+except ImportError:  # transliteration is optional; same-script search still works
+    unidecode = None
+
+# Marks patrons routinely leave out: Latin accents, Arabic harakat and
+# tatweel, superscript alef, and the Devanagari/Bengali/Gurmukhi nukta
+FOLDED_MARKS = set(range(0x0300, 0x0370)) | set(range(0x064B, 0x0660)) | {0x0640, 0x0670, 0x093C, 0x09BC, 0x0A3C}
+
+# Arabic and Urdu spell some letters with different code points
+LETTER_VARIANTS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه', 'ى': 'ی', 'ي': 'ی', 'ك': 'ک', 'ۀ': 'ه',
+})
+
+_NON_WORD = re.compile(r'[\W_]+')
+_REPEATS = re.compile(r'(.)\1+')
+
+DEFAULT_THRESHOLD = 0.3
+
+# Candidates per requested result rescored after the SQL pass
+CANDIDATES_PER_RESULT = 5
+
+# Postings a lookup reads before it starts leaving out the query's commonest
+# trigrams ("the", " th", ...)
+MAX_POSTINGS = 50000
+MIN_TRIGRAMS = 3
+
+# Book counts of trigrams at least this common are cached for a day; rarer
+# ones are cheap to count and change as books are added
+CACHED_FREQUENCY = 1000
+FREQUENCY_CACHE_PREFIX = 'search-trigram-books:'
+FREQUENCY_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def normalize(text):
+    """Lowercase, fold optional marks and letter variants, squeeze doubled letters"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if ord(ch) not in FOLDED_MARKS)
+    text = unicodedata.normalize('NFC', text).casefold().translate(LETTER_VARIANTS)
+    text = _NON_WORD.sub(' ', text)
+    return _REPEATS.sub(r'\1', text).strip()
+
+
+def transliterate(text):
+    """Normalized Latin spelling of non-ASCII text, or '' without unidecode"""
+    if unidecode is None or (text or '').isascii():
+        return ''
+    return normalize(unidecode(text))
+
+
+def trigrams(text):
+    """Padded trigrams of each word: '  r', ' ra', 'rab', ..., 'th '"""
+    grams = set()
+    for word in text.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def query_variants(text):
+    """Trigram sets for the query as typed and, if different, transliterated"""
+    variants = [trigrams(normalize(text)), trigrams(transliterate(text))]
+    return [grams for grams in variants if grams]
+
+
+def book_trigrams(book):
+    grams = set()
+    for text in [book.title, *(author.full_name for author in book.authors.all())]:
+        grams |= trigrams(normalize(text)) | trigrams(transliterate(text))
+    return grams
+
+
+def index_books(books):
+    """Replace the stored trigrams of `books` (authors should be prefetched)"""
+    books = list(books)
+    rows = [SearchTrigram(trigram=gram, book_id=book.pk) for book in books for gram in book_trigrams(book)]
+    with transaction.atomic():
+        SearchTrigram.objects.filter(book__in=[book.pk for book in books]).delete()
+        SearchTrigram.objects.bulk_create(rows, batch_size=1000)
+
+
+def reindex(book_ids):
+    index_books(Book.objects.filter(pk__in=list(book_ids)).prefetch_related('authors'))
+
+
+def rebuild(chunk_size=2000):
+    """Re-index every book; returns the number of books indexed"""
+    SearchTrigram.objects.all().delete()
+    books = Book.objects.only('id', 'title').order_by('pk')
+    last_pk, total = 0, 0
+    while True:
+        chunk = list(books.filter(pk__gt=last_pk).prefetch_related('authors')[:chunk_size])
+        if not chunk:
+            return total
+        rows = [SearchTrigram(trigram=gram, book_id=book.pk) for book in chunk for gram in book_trigrams(book)]
+        SearchTrigram.objects.bulk_create(rows, batch_size=1000)
+        last_pk = chunk[-1].pk
+        total += len(chunk)
+
+
+def _frequencies(grams):
+    """{trigram: number of books containing it}"""
+    keys = {gram: FREQUENCY_CACHE_PREFIX + gram.encode('utf-8').hex() for gram in grams}
+    cached = cache.get_many(keys.values())
+    frequencies = {gram: cached[key] for gram, key in keys.items() if key in cached}
+    missing = [gram for gram in grams if gram not in frequencies]
+    if missing:
+        counts = dict(
+            SearchTrigram.objects.filter(trigram__in=missing)
+            .values('trigram')
+            .annotate(books=Count('book'))
+            .values_list('trigram', 'books')
+        )
+        frequencies.update({gram: counts.get(gram, 0) for gram in missing})
+        common = {keys[gram]: frequencies[gram] for gram in missing if frequencies[gram] >= CACHED_FREQUENCY}
+        cache.set_many(common, FREQUENCY_CACHE_TIMEOUT)
+    return frequencies
+
+
+def _selective(grams):
+    """The rarest of `grams` that fit in MAX_POSTINGS, and how many indexed ones were left out"""
+    frequencies = _frequencies(grams)
+    indexed = sorted((gram for gram in grams if frequencies[gram]), key=frequencies.get)
+    selected, postings = [], 0
+    for gram in indexed:
+        if postings + frequencies[gram] > MAX_POSTINGS and len(selected) >= MIN_TRIGRAMS:
+            break
+        selected.append(gram)
+        postings += frequencies[gram]
+    return selected, len(indexed) - len(selected)
+
+
+def search_books(query, limit=10, threshold=DEFAULT_THRESHOLD, books=None):
+    """[(book, score)] for books (from the `books` queryset) whose title or authors resemble `query`"""
+    variants = query_variants(query)
+    if not variants:
+        return []
+    grams, skipped = _selective(set().union(*variants))
+    if not grams:
+        return []
+    # A book needs this many shared trigrams to reach `threshold` for any
+    # variant, and can have matched every trigram that was left out
+    min_shared = max(1, math.ceil(threshold * min(len(v) for v in variants)) - skipped)
+    postings = SearchTrigram.objects.filter(trigram__in=grams)
+    if books is None:
+        books = Book.objects.all()
+    else:
+        postings = postings.filter(book__in=books.values('pk'))
+    candidates = (
+        postings.values('book')
+        .annotate(shared=Count('book'))
+        .filter(shared__gte=min_shared)
+        .order_by('-shared', 'book')[:limit * CANDIDATES_PER_RESULT]
+    )
+    matches = books.select_related('category').prefetch_related('authors').in_bulk(
+        [row['book'] for row in candidates]
+    )
+
+    ranked = []
+    for book in matches.values():
+        stored = book_trigrams(book)
+        score = max(len(v & stored) / len(v) for v in variants)
+        if score >= threshold:
+            ranked.append((book, round(score, 3)))
+    ranked.sort(key=lambda item: (-item[1], item[0].title))
+    return ranked[:limit]
@@ -0,0 +1,136 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from .models import Author, Book, BookCopy, BorrowRecord, Member
+from . import autocomplete, circulation, events, facets, search, thumbnails, trending
+
+
+@receiver(post_save, sender=Book)
+def book_cover_thumbnails(sender, instance, **kwargs):
+    if thumbnails.needs_thumbnails(instance, 'cover_image'):
+        thumbnails.schedule(instance, 'cover_image')
+
+
+@receiver(post_save, sender=Member)
+def member_photo_thumbnails(sender, instance, **kwargs):
+    if thumbnails.needs_thumbnails(instance, 'photo'):
+        thumbnails.schedule(instance, 'photo')
+
+
+@receiver(pre_save, sender=BookCopy)
+def remember_copy_state(sender, instance, raw=False, **kwargs):
+    instance._previous_state = None
+    if instance.pk and not raw:
+        instance._previous_state = (
+            BookCopy.objects.filter(pk=instance.pk).values_list('book_id', 'is_available', 'barcode').first()
+        )
+
+
+@receiver(post_save, sender=BookCopy)
+def update_copy_counters(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_state', None)
+    if created or previous is None:
+        Book.adjust_copies(instance.book_id, total=1, available=int(instance.is_available))
+        return
+
+    old_book_id, was_available, old_barcode = previous
+    if old_barcode != instance.barcode or old_book_id != instance.book_id:
+        circulation.forget_barcode(old_barcode)
+    if old_book_id != instance.book_id:
+        Book.adjust_copies(old_book_id, total=-1, available=-int(was_available))
+        Book.adjust_copies(instance.book_id, total=1, available=int(instance.is_available))
+    elif was_available != instance.is_available:
+        Book.adjust_copies(instance.book_id, available=1 if instance.is_available else -1)
+
+
+@receiver(post_delete, sender=BookCopy)
+def release_copy_counters(sender, instance, **kwargs):
+    Book.adjust_copies(instance.book_id, total=-1, available=-int(instance.is_available))
+    circulation.forget_barcode(instance.barcode)
+
+
+@receiver(post_save, sender=BorrowRecord)
+def count_daily_borrow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.record_borrow(instance.book_id, instance.borrow_date)
+
+
+AUTOCOMPLETE_KINDS = {Book: 'book', Author: 'author', Member: 'member'}
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Member)
+def refresh_autocomplete(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # Only once the row is committed, so a rolled-back save leaves no entry behind
+        kind = AUTOCOMPLETE_KINDS[sender]
+        transaction.on_commit(lambda: autocomplete.index.update(kind, instance))
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Member)
+def drop_from_autocomplete(sender, instance, **kwargs):
+    kind, pk = AUTOCOMPLETE_KINDS[sender], instance.pk
+    transaction.on_commit(lambda: autocomplete.index.remove(kind, pk))
+
+
+@receiver(post_save, sender=Book)
+def reindex_book_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.reindex([instance.pk])
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def reindex_book_authors_search(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            search.reindex([instance.pk])
+    elif action == 'pre_clear':
+        instance._search_book_ids = list(instance.books.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        search.reindex(instance._search_book_ids)
+    elif action in ('post_add', 'post_remove'):
+        search.reindex(pk_set)  # Books added to or removed from an author
+
+
+@receiver(post_save, sender=Author)
+def reindex_author_books_search(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        search.reindex(instance.books.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Author)
+def reindex_deleted_author_books_search(sender, instance, **kwargs):
+    # The author's book links are gone by post_delete, so look them up first
+    book_ids = list(instance.books.values_list('pk', flat=True))
+    transaction.on_commit(lambda: search.reindex(book_ids))
+
+
+@receiver(post_save, sender=Book)
+def refresh_facets(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: facets.index.touch(instance.pk))
+
+
+@receiver(post_delete, sender=Book)
+def drop_from_facets(sender, instance, **kwargs):
+    book_id = instance.pk
+    transaction.on_commit(lambda: facets.index.remove(book_id))
+
+
+@receiver(pre_save, sender=BorrowRecord)
+def remember_loan_state(sender, instance, raw=False, **kwargs):
+    instance._logged_state = events.loan_state(instance) if instance.pk and not raw else None
+
+
+@receiver(post_save, sender=BorrowRecord)
+def log_circulation_event(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_logged_state', None)
+    if created or previous is not None:
+        events.record(instance, None if created else previous)
@@ -0,0 +1,48 @@
+"""Startup-time measurements for the profile_imports and benchmark_startup commands.
+
+Both run a fresh interpreter so nothing is already imported, and read the
+per-module timings Python prints with -X importtime.
+"""
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+# Heavy modules that must only be imported on first use, never at startup
+LAZY_MODULES = ['google.generativeai']
+
+
+def manage_py(*args):
+    return [str(settings.BASE_DIR / 'manage.py'), *args]
+
+
+def _run(args, importtime=False):
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), *args]
+    result = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True)
+    if result.returncode:
+        lines = result.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f'{" ".join(args)} exited with {result.returncode}')
+    return result
+
+
+def imports(args):
+    """(module, self µs, cumulative µs) for every module imported by `python args`"""
+    rows = []
+    for line in _run(args, importtime=True).stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        if self_us.strip().isdigit():
+            rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def cold_starts(args, runs):
+    """Wall-clock seconds of `runs` fresh interpreters running `python args`"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        _run(args)
+        timings.append(time.perf_counter() - started)
+    return timings
@@ -0,0 +1,177 @@
+"""Static files storage for collectstatic.
+
+On top of Django's content-hashed names, collectstatic trims the vendored
+stylesheets to the selectors whose classes appear in our templates, and writes
+gzip (and brotli, if the brotli package is installed) copies next to every
+compressible file so serve_static can send them as-is.
+"""
+import gzip
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.template import engines
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip alone is still served
+    brotli = None
+
+# Stylesheets trimmed to the classes the templates use
+TRIMMED_CSS = (
+    'vendor/bootstrap/css/bootstrap.min.css',
+    'vendor/fontawesome/css/all.min.css',
+)
+
+# Classes added at runtime by Bootstrap's JavaScript or built from message tags
+SAFELIST = {
+    'active', 'disabled', 'show', 'showing', 'hiding', 'fade', 'collapse', 'collapsing',
+    'tooltip', 'tooltip-inner', 'tooltip-arrow',
+    'bs-tooltip-top', 'bs-tooltip-bottom', 'bs-tooltip-start', 'bs-tooltip-end', 'bs-tooltip-auto',
+    'alert-success', 'alert-info', 'alert-warning', 'alert-danger', 'alert-debug',
+    'was-validated', 'is-valid', 'is-invalid',
+}
+
+COMPRESSIBLE = {'.css', '.js', '.svg', '.ttf', '.otf', '.eot', '.json', '.txt', '.map', '.html'}
+
+# Skip compressed copies that save less than this fraction
+MIN_SAVING = 0.05
+
+_TOKEN = re.compile(r'[A-Za-z][\w-]*')
+_CLASS = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+_NEGATION = re.compile(r':not\([^)]*\)')
+_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+
+
+def template_tokens():
+    """Every word-like token in the project's templates: a superset of the classes they use"""
+    tokens = set(SAFELIST)
+    dirs = []
+    for engine in engines.all():
+        dirs.extend(getattr(engine, 'template_dirs', ()))
+    for directory in dirs:
+        if not str(directory).startswith(str(settings.BASE_DIR)):
+            continue  # Django's own apps (admin) bring their own stylesheets
+        for path in Path(directory).rglob('*.html'):
+            tokens.update(_TOKEN.findall(path.read_text(encoding='utf-8')))
+    return tokens
+
+
+def _blocks(css):
+    """Top-level (prelude, body) pairs; body is None for statements such as @charset"""
+    blocks, depth, start, brace, quote = [], 0, 0, 0, None
+    for i, ch in enumerate(css):
+        if quote:
+            if ch == quote and css[i - 1] != '\\':
+                quote = None
+        elif ch in '"\'':
+            quote = ch
+        elif ch == '{':
+            if depth == 0:
+                brace = i
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((css[start:brace].strip(), css[brace + 1:i]))
+                start = i + 1
+        elif ch == ';' and depth == 0:
+            blocks.append((css[start:i].strip(), None))
+            start = i + 1
+    return blocks
+
+
+def _selectors(prelude):
+    """Split a selector list on commas that aren't inside parentheses or brackets"""
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(prelude):
+        if ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            parts.append(prelude[start:i])
+            start = i + 1
+    parts.append(prelude[start:])
+    return parts
+
+
+def trim_css(css, used):
+    """Drop style rules whose selectors need a class that isn't in `used`"""
+    license = re.search(r'/\*!.*?\*/', css, re.S)
+    trimmed = _trim(_COMMENT.sub('', css), used)
+    if license:
+        # Keep the license comment, after @charset, which has to come first
+        at = trimmed.index(';') + 1 if trimmed.startswith('@charset') else 0
+        trimmed = trimmed[:at] + license.group() + trimmed[at:]
+    return trimmed
+
+
+def _trim(css, used):
+    out = []
+    for prelude, body in _blocks(css):
+        if body is None:
+            out.append(f'{prelude};')
+        elif prelude.startswith(('@media', '@supports')):
+            inner = _trim(body, used)
+            if inner:
+                out.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            out.append(f'{prelude}{{{body}}}')  # @font-face, @keyframes, ...
+        else:
+            kept = [
+                selector for selector in _selectors(prelude)
+                if all(name in used for name in _CLASS.findall(_NEGATION.sub('', selector)))
+            ]
+            if kept:
+                out.append(f'{",".join(kept)}{{{body}}}')
+    return ''.join(out)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # Files that haven't been collected (no collectstatic yet, as under the test
+    # runner) are served under their plain name instead of failing the page
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            if self.manifest_strict:
+                raise
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            used = template_tokens()
+            for name in TRIMMED_CSS:
+                if name not in paths:
+                    continue
+                storage, path = paths[name]
+                with storage.open(path) as f:
+                    css = f.read().decode('utf-8')
+                self.delete(name)
+                self._save(name, ContentFile(trim_css(css, used).encode('utf-8')))
+                # Hash the trimmed copy rather than the original
+                paths[name] = (self, name)
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        if not dry_run:
+            for name in set(self.hashed_files.values()):
+                if Path(name).suffix in COMPRESSIBLE:
+                    self._compress(name)
+
+    def _compress(self, name):
+        with self.open(name) as f:
+            data = f.read()
+        variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(data, quality=11)
+        for suffix, compressed in variants.items():
+            if len(compressed) < len(data) * (1 - MIN_SAVING):
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
@@ -0,0 +1,61 @@
+"""Jobs that run on the background worker (see jobs.py)."""
+from datetime import date, timedelta
+
+from django.apps import apps
+
+from . import archive, events, fines, recommendations, reminders, search, thumbnails, trending
+from .jobs import task
+
+
+@task
+def generate_thumbnails(model, pk, field_name):
+    thumbnails.generate(apps.get_model(model), pk, field_name)
+
+
+@task
+def recompute_fines():
+    return {'charged': fines.recompute()}
+
+
+@task
+def rollup_borrow_counts(days=2):
+    return {'rows': trending.rebuild(start=date.today() - timedelta(days=days - 1))}
+
+
+@task
+def replay_circulation():
+    copies, books = events.replay_availability()
+    return {'copies': copies, 'books': books, 'rows': events.replay_borrow_counts()}
+
+
+@task
+def build_recommendations():
+    return {'stored': recommendations.build()}
+
+
+@task
+def rebuild_search_index():
+    return {'books': search.rebuild()}
+
+
+@task
+def archive_returned_loans():
+    return {'archived': archive.archive_returned_loans()}
+
+
+@task(max_attempts=1)
+def send_overdue_reminders():
+    members, loans = reminders.send_reminders(throttle=1.0)
+    return {'members': members, 'loans': loans}
+
+
+# Jobs staff can start from the job status page
+MAINTENANCE_TASKS = [
+    ('recompute_fines', 'Recompute overdue fines'),
+    ('rollup_borrow_counts', 'Rebuild recent borrow counts'),
+    ('replay_circulation', 'Rebuild copy counters and borrow counts from the circulation log'),
+    ('build_recommendations', 'Rebuild "also borrowed" recommendations'),
+    ('rebuild_search_index', 'Rebuild the title search index'),
+    ('archive_returned_loans', 'Archive old returned loans'),
+    ('send_overdue_reminders', 'Email overdue reminders'),
+]
@@ -0,0 +1,31 @@
+from django.test import TestCase
+
+from stall.models import Book, BookCopy, Category, Member
+
+
+def make_member(i, **fields):
+    return Member.objects.create(**{
+        'membership_id': f'M{i}',
+        'first_name': 'Member',
+        'last_name': str(i),
+        'email': f'member{i}@example.com',
+        'phone': '0123',
+        'address': 'Dhaka',
+        **fields,
+    })
+
+
+class CirculationTestCase(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Fiction')
+        self.book = Book.objects.create(title='Gitanjali', category=self.category)
+        for number in range(1, 3):
+            BookCopy.objects.create(book=self.book, copy_number=f'C{number}')
+        self.members = [make_member(i) for i in range(4)]
+
+    def assertCounters(self, total, available):
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.total_copies, self.book.available_copies), (total, available))
+        self.assertEqual(self.book.is_available, available > 0)
+        # The counters always agree with the copy rows
+        self.assertEqual(BookCopy.objects.filter(book=self.book, is_available=True).count(), available)
@@ -0,0 +1,110 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from stall.admin import EstimatedCountPaginator
+from stall.models import Author, Book, BookCopy, BorrowRecord
+
+from .base import CirculationTestCase
+
+
+class LoanAdminTests(CirculationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.add_url = reverse('admin:stall_borrowrecord_add')
+
+    def add_loan(self, **fields):
+        data = {
+            'member': self.members[0].pk,
+            'book': self.book.pk,
+            'due_date': date.today() + timedelta(days=14),
+            'fine_amount': '0',
+            'notes': '',
+        }
+        data.update(fields)
+        return self.client.post(self.add_url, data)
+
+    def test_add_claims_a_copy(self):
+        response = self.add_loan()
+        self.assertEqual(response.status_code, 302)
+        loan = BorrowRecord.objects.get()
+        self.assertIsNotNone(loan.copy)
+        self.assertFalse(BookCopy.objects.get(pk=loan.copy.pk).is_available)
+        self.assertCounters(2, 1)
+
+    def test_add_with_a_chosen_copy(self):
+        copy = BookCopy.objects.get(copy_number='C2')
+        self.add_loan(copy=copy.pk)
+        self.assertEqual(BorrowRecord.objects.get().copy, copy)
+        self.assertCounters(2, 1)
+
+    def test_add_refuses_a_checked_out_copy(self):
+        copy = BookCopy.objects.get(copy_number='C1')
+        self.add_loan(copy=copy.pk)
+        response = self.add_loan(copy=copy.pk, member=self.members[1].pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'already checked out')
+        self.assertEqual(BorrowRecord.objects.count(), 1)
+        self.assertCounters(2, 1)
+
+    def test_add_refuses_when_no_copy_is_left(self):
+        self.add_loan()
+        self.add_loan(member=self.members[1].pk)
+        response = self.add_loan(member=self.members[2].pk)
+        self.assertContains(response, 'No copies of')
+        self.assertCounters(2, 0)
+
+    def test_copy_availability_is_read_only(self):
+        copy = BookCopy.objects.get(copy_number='C1')
+        url = reverse('admin:stall_bookcopy_change', args=[copy.pk])
+        response = self.client.get(url)
+        self.assertNotContains(response, 'name="is_available"')
+        self.client.post(url, {
+            'book': self.book.pk, 'copy_number': 'C1', 'barcode': copy.barcode,
+            'condition': copy.condition, 'is_available': '', 'location_shelf': '', 'notes': '',
+        })
+        self.assertCounters(2, 2)
+
+
+class EstimatedCountPaginatorTests(CirculationTestCase):
+    class Paginator(EstimatedCountPaginator):
+        threshold = 1
+
+        @staticmethod
+        def _estimate(queryset):
+            return 5000
+
+    def test_unfiltered_list_uses_the_estimate(self):
+        self.assertEqual(self.Paginator(Book.objects.all(), 100).count, 5000)
+
+    def test_filtered_list_is_counted(self):
+        self.assertEqual(self.Paginator(Book.objects.filter(title='Gitanjali'), 100).count, 1)
+
+    def test_no_estimate_on_sqlite(self):
+        self.assertIsNone(EstimatedCountPaginator._estimate(Book.objects.all()))
+        self.assertEqual(EstimatedCountPaginator(Book.objects.all(), 100).count, 1)
+
+
+class ChangelistQueryTests(CirculationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+
+    def add_books(self, count):
+        author = Author.objects.create(first_name='Kazi', last_name='Nazrul')
+        for i in range(count):
+            Book.objects.create(title=f'Book {author.pk}.{i}', category=self.category).authors.add(author)
+
+    def test_book_changelist_queries_do_not_grow_with_rows(self):
+        url = reverse('admin:stall_book_changelist')
+        self.add_books(1)
+        with CaptureQueriesContext(connection) as before:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.add_books(5)
+        with CaptureQueriesContext(connection) as after:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(len(after), len(before))
@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+from django.urls import reverse
+
+from stall import archive, fines, trending
+from stall.circulation import checkout, return_copy
+from stall.models import ArchivedBorrowRecord, BorrowRecord, CirculationEvent, DailyBorrowCount, FineEntry, Member
+
+from .base import CirculationTestCase
+
+
+class ArchiveTests(CirculationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.member = self.members[0]
+        long_ago = date.today() - timedelta(days=400)
+        self.old = checkout(self.member, self.book, long_ago + timedelta(days=14))
+        return_copy(self.old, returned_on=long_ago + timedelta(days=20))
+        BorrowRecord.objects.filter(pk=self.old.pk).update(borrow_date=long_ago)
+        self.old.refresh_from_db()
+        self.recent = checkout(self.member, self.book, date.today() - timedelta(days=1))
+        return_copy(self.recent)
+
+    def test_round_trip(self):
+        fine = FineEntry.objects.get(borrow_record=self.old)
+        balance = fines.member_balance(self.member)
+        self.assertEqual(archive.archive_returned_loans(chunk_size=1), 1)
+
+        self.assertFalse(BorrowRecord.objects.filter(pk=self.old.pk).exists())
+        archived = ArchivedBorrowRecord.objects.get(pk=self.old.pk)
+        for field in archive.ARCHIVED_FIELDS:
+            self.assertEqual(getattr(archived, field), getattr(self.old, field), field)
+        # The fine ledger and the circulation log still reach the loan
+        fine.refresh_from_db()
+        self.assertEqual((fine.borrow_record_id, fine.archived_loan_id), (None, self.old.pk))
+        self.assertEqual(fines.member_balance(self.member), balance)
+        self.assertTrue(CirculationEvent.objects.filter(loan_id=self.old.pk).exists())
+        self.assertCounters(total=2, available=2)
+
+    def test_nothing_recent_is_archived(self):
+        archive.archive_returned_loans()
+        self.assertEqual(archive.archive_returned_loans(), 0)
+        self.assertTrue(BorrowRecord.objects.filter(pk=self.recent.pk).exists())
+
+    def test_archived_loans_still_count(self):
+        archive.archive_returned_loans()
+        member = Member.objects.get(pk=self.member.pk)
+        self.assertEqual(member.borrowing_stats['total_borrowed'], 2)
+        self.assertEqual(member.archived_totals['loans'], 1)
+
+        trending.rebuild()
+        self.assertEqual(DailyBorrowCount.objects.get(day=self.old.borrow_date).count, 1)
+
+        url = reverse('member_detail', args=[self.member.pk])
+        response = self.client.get(url)
+        self.assertNotIn('archived_loans', response.context)
+        response = self.client.get(url, {'history': 'archived'})
+        self.assertEqual([loan.pk for loan in response.context['archived_loans']], [self.old.pk])
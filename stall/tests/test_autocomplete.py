@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.test import TestCase
+
+from stall import autocomplete
+from stall.models import Author, Book, Category
+
+from .base import make_member
+
+
+class PrefixIndexTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Poetry')
+        self.gitanjali = Book.objects.create(title='Gitanjali', category=category)
+        self.gitabitan = Book.objects.create(title='Gitabitan', category=category)
+        self.author = Author.objects.create(first_name='Rabindranath', last_name='Tagore')
+        self.member = make_member(1, first_name='Gita')
+        autocomplete.index.rebuild()
+
+    def search(self, prefix, **kwargs):
+        return [(row['type'], row['id']) for row in autocomplete.index.search(prefix, **kwargs)]
+
+    def test_shortest_term_first(self):
+        self.assertEqual(
+            self.search('git'),
+            [('member', self.member.pk), ('book', self.gitabitan.pk), ('book', self.gitanjali.pk)],
+        )
+
+    def test_kinds_and_limit(self):
+        self.assertEqual(self.search('git', kinds=('book',), limit=1), [('book', self.gitabitan.pk)])
+        self.assertEqual(self.search('tag', kinds=('book', 'member')), [])
+        self.assertEqual(self.search('tag'), [('author', self.author.pk)])
+
+    def test_accents_are_ignored(self):
+        self.author.first_name = 'Émile'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save()
+        self.assertEqual(self.search('emi'), [('author', self.author.pk)])
+
+    def test_saves_show_up_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            book = Book.objects.create(title='Gitali', category=self.gitanjali.category)
+            # Not searchable until the transaction commits
+            self.assertNotIn(('book', book.pk), self.search('gitali'))
+        self.assertIn(('book', book.pk), self.search('gitali'))
+
+        pk = book.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+        self.assertNotIn(('book', pk), self.search('gitali'))
+
+    def test_rolled_back_save_leaves_no_entry(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    Book.objects.create(title='Gitali', category=self.gitanjali.category)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.search('gitali'), [])
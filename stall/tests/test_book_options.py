@@ -0,0 +1,46 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from stall import views
+from stall.forms import ReservationForm
+from stall.models import Book, BookCopy, Category
+
+
+class BookOptionsApiTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Poetry')
+        self.shelved = [Book.objects.create(title=f'Sonnet {i:02}', category=category) for i in range(25)]
+        for book in self.shelved:
+            BookCopy.objects.create(book=book, copy_number='C1')
+        # A book whose only copy is out can be held but not borrowed
+        self.out = Book.objects.create(title='Sonnet out', category=category)
+        copy = BookCopy.objects.create(book=self.out, copy_number='C1')
+        BookCopy.objects.filter(pk=copy.pk).update(is_available=False)
+        Book.adjust_copies(self.out.pk, available=-1)
+
+    def options(self, **params):
+        return self.client.get(reverse('book_options_api'), params)
+
+    def test_pages_through_scope(self):
+        first = self.options(scope='available').json()
+        self.assertEqual(len(first['results']), views.BOOK_OPTIONS_PAGE_SIZE)
+        self.assertTrue(first['has_more'])
+        second = self.options(scope='available', page=2).json()
+        self.assertEqual([row['id'] for row in second['results']], [book.pk for book in self.shelved[20:]])
+        self.assertFalse(second['has_more'])
+
+    def test_query_and_holdable_scope(self):
+        rows = self.options(scope='available', q='sonnet 1').json()['results']
+        self.assertEqual(len(rows), 10)
+        rows = self.options(scope='holdable', q='sonnet').json()['results']
+        self.assertEqual([row['id'] for row in rows], [self.out.pk])
+
+    def test_unknown_scope_and_bad_page(self):
+        self.assertEqual(self.options(scope='everything').status_code, 400)
+        self.assertEqual(self.options(scope='available', page='x').json()['page'], 1)
+
+    def test_widget_renders_only_the_chosen_book(self):
+        html = ReservationForm(initial={'book': self.out.pk}).as_p()
+        self.assertIn('data-options-url="/api/books/options/?scope=holdable"', html)
+        self.assertIn('Sonnet out', html)
+        self.assertNotIn('Sonnet 00', html)
@@ -0,0 +1,39 @@
+from datetime import date, timedelta
+
+from django.urls import reverse
+
+from stall.circulation import checkout, return_copy
+from stall.models import BorrowRecord
+
+from .base import CirculationTestCase
+
+
+class BorrowingSummaryTests(CirculationTestCase):
+    def setUp(self):
+        super().setUp()
+        returned = checkout(self.members[0], self.book, date.today() - timedelta(days=3))
+        return_copy(returned)
+        checkout(self.members[1], self.book, date.today() - timedelta(days=1))
+        checkout(self.members[2], self.book, date.today() + timedelta(days=7))
+        BorrowRecord.objects.filter(pk=returned.pk).update(fine_amount='15.00')
+
+    def summary(self, **params):
+        return self.client.get(reverse('borrowing_summary_api'), params).json()
+
+    def test_summary_counts(self):
+        summary = self.summary()
+        self.assertEqual(summary['by_status'], {'borrowed': 1, 'returned': 1, 'overdue': 1, 'lost': 0, 'damaged': 0})
+        self.assertEqual(
+            (summary['total'], summary['currently_borrowed'], summary['overdue'], summary['total_fines']),
+            (3, 2, 1, '15.00'),
+        )
+
+    def test_summary_follows_filters(self):
+        summary = self.summary(member=self.members[1].pk)
+        self.assertEqual((summary['total'], summary['overdue'], summary['total_fines']), (1, 1, '0.00'))
+        self.assertEqual(self.summary(status='returned')['total'], 1)
+
+    def test_list_page_shows_the_same_summary(self):
+        response = self.client.get(reverse('borrowing_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['summary']['overdue'], 1)
@@ -0,0 +1,26 @@
+from datetime import date, timedelta
+
+from stall.circulation import CirculationError, checkout, return_copy
+from stall.models import BookCopy
+
+from .base import CirculationTestCase
+
+
+class CopyCounterTests(CirculationTestCase):
+    def test_checkout_and_return_move_counters(self):
+        self.assertCounters(total=2, available=2)
+        loan = checkout(self.members[0], self.book, date.today() + timedelta(days=14))
+        self.assertCounters(total=2, available=1)
+        self.assertFalse(BookCopy.objects.get(pk=loan.copy_id).is_available)
+
+        return_copy(loan)
+        self.assertCounters(total=2, available=2)
+        loan.refresh_from_db()
+        self.assertEqual(loan.status, 'returned')
+
+    def test_checkout_without_copies_fails(self):
+        checkout(self.members[0], self.book, date.today())
+        checkout(self.members[1], self.book, date.today())
+        with self.assertRaises(CirculationError):
+            checkout(self.members[2], self.book, date.today())
+        self.assertCounters(total=2, available=0)
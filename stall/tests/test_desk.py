@@ -0,0 +1,65 @@
+import json
+
+from django.db import IntegrityError
+from django.urls import reverse
+
+from stall.circulation import CirculationError, checkout_barcode, return_barcode
+from stall.models import Book, BookCopy
+
+from .base import CirculationTestCase
+
+
+class BarcodeTests(CirculationTestCase):
+    def test_barcode_checkout_and_return(self):
+        copy = BookCopy.objects.get(book=self.book, copy_number='C1')
+        loan = checkout_barcode(self.members[0], copy.barcode)
+        self.assertEqual(loan.copy_id, copy.pk)
+        self.assertCounters(total=2, available=1)
+
+        returned, next_loan = return_barcode(copy.barcode)
+        self.assertEqual((returned.pk, next_loan), (loan.pk, None))
+        self.assertCounters(total=2, available=2)
+        with self.assertRaises(CirculationError):
+            return_barcode(copy.barcode)
+
+    def test_default_barcode_is_unique_across_books(self):
+        other = Book.objects.create(title='Gora', category=self.category)
+        try:
+            copy = BookCopy.objects.create(book=other, copy_number='C1')
+        except IntegrityError:
+            self.fail('a copy number used by another book clashed with its barcode')
+        self.assertEqual(copy.barcode, f'{other.pk}-C1')
+
+
+class DeskScanApiTests(CirculationTestCase):
+    def scan(self, mode, code):
+        response = self.client.post(
+            reverse('desk_scan_api'), json.dumps({'mode': mode, 'code': code}), content_type='application/json'
+        )
+        return response.status_code, response.json()
+
+    def test_member_then_copy(self):
+        copy = BookCopy.objects.get(book=self.book, copy_number='C1')
+        status, body = self.scan('member', self.members[0].membership_id)
+        self.assertEqual((status, body['member']['id']), (200, self.members[0].pk))
+        status, body = self.scan('checkout', copy.barcode)
+        self.assertEqual(status, 200)
+        self.assertCounters(total=2, available=1)
+        status, body = self.scan('return', copy.barcode)
+        self.assertEqual(status, 200)
+        self.assertCounters(total=2, available=2)
+
+    def test_errors_are_json(self):
+        copy = BookCopy.objects.get(book=self.book, copy_number='C1')
+        self.assertEqual(self.scan('checkout', copy.barcode)[0], 400)
+        self.assertEqual(self.scan('member', 'nobody')[0], 409)
+        self.assertEqual(self.scan('return', 'no-such-barcode')[0], 409)
+
+    def test_member_removed_after_card_scan(self):
+        copy = BookCopy.objects.get(book=self.book, copy_number='C1')
+        self.scan('member', self.members[0].membership_id)
+        self.members[0].delete()
+        status, body = self.scan('checkout', copy.barcode)
+        self.assertEqual(status, 404)
+        self.assertIn('scan the card again', body['error'])
+        self.assertCounters(total=2, available=2)
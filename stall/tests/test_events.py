@@ -0,0 +1,70 @@
+from datetime import date
+
+from django.urls import reverse
+
+from stall import events
+from stall.circulation import checkout, return_copy
+from stall.models import Book, BookCopy, BorrowRecord, CirculationEvent
+
+from .base import CirculationTestCase
+
+
+class ReplayTests(CirculationTestCase):
+    def test_replay_matches_live_state(self):
+        loan = checkout(self.members[0], self.book, date.today())
+        checkout(self.members[1], self.book, date.today())
+        return_copy(loan)
+        self.book.refresh_from_db()
+        live = (self.book.available_copies, set(BookCopy.objects.filter(is_available=True).values_list('pk', flat=True)))
+
+        self.assertEqual(events.replay_availability(), (0, 0))
+
+        # Corrupt the derived state; the replay restores it from the log
+        Book.objects.filter(pk=self.book.pk).update(available_copies=0, total_copies=7, is_available=False)
+        BookCopy.objects.update(is_available=False)
+        events.replay_availability()
+        self.book.refresh_from_db()
+        replayed = (self.book.available_copies, set(BookCopy.objects.filter(is_available=True).values_list('pk', flat=True)))
+        self.assertEqual(replayed, live)
+        self.assertCounters(total=2, available=1)
+
+    def test_replay_holds_a_copy_for_loans_without_one(self):
+        # A loan from before copies were tracked still has a copy off the shelf
+        BorrowRecord.objects.create(member=self.members[0], book=self.book, due_date=date.today())
+        Book.adjust_copies(self.book.pk, available=-1)
+
+        events.replay_availability()
+        self.assertCounters(total=2, available=1)
+
+
+class EventsApiTests(CirculationTestCase):
+    def setUp(self):
+        super().setUp()
+        loan = checkout(self.members[0], self.book, date.today())
+        checkout(self.members[1], self.book, date.today())
+        return_copy(loan)
+        self.url = reverse('circulation_events_api')
+
+    def page(self, **params):
+        return self.client.get(self.url, params).json()
+
+    def test_pages_follow_the_next_cursor(self):
+        ids, after = [], None
+        while True:
+            page = self.page(limit=2, **({'after': after} if after else {}))
+            ids += [event['id'] for event in page['events']]
+            after = page['next']
+            if after is None:
+                break
+        self.assertEqual(ids, list(CirculationEvent.objects.order_by('occurred_at', 'pk').values_list('pk', flat=True)))
+        self.assertEqual(len(ids), 3)
+
+    def test_limit_is_clamped(self):
+        for limit in (-1, 0):
+            page = self.page(limit=limit)
+            self.assertEqual(len(page['events']), 1)
+            self.assertEqual(page['next'], page['events'][0]['id'])
+
+    def test_bad_limit_is_refused(self):
+        response = self.client.get(self.url, {'limit': 'ten'})
+        self.assertEqual(response.status_code, 400)
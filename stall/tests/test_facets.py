@@ -0,0 +1,53 @@
+from datetime import date
+
+from django.test import TestCase
+
+from stall import facets
+from stall.models import Book, BookCopy, Category, Publisher
+
+
+class FacetIndexTests(TestCase):
+    def setUp(self):
+        self.poetry = Category.objects.create(name='Poetry')
+        self.novels = Category.objects.create(name='Novels')
+        publisher = Publisher.objects.create(name='Visva-Bharati')
+        self.gitanjali = Book.objects.create(
+            title='Gitanjali', category=self.poetry, language='bn', publisher=publisher, publication_date=date(1910, 8, 1)
+        )
+        self.gora = Book.objects.create(title='Gora', category=self.novels, language='bn')
+        self.kim = Book.objects.create(title='Kim', category=self.novels, language='en', publication_date=date(1901, 1, 1))
+        BookCopy.objects.create(book=self.gitanjali, copy_number='C1')
+        BookCopy.objects.create(book=self.kim, copy_number='C1')
+        self.index = facets.FacetIndex()
+
+    def test_counts_ignore_the_facets_own_selection(self):
+        counts, total = self.index.counts({'language': 'bn'})
+        self.assertEqual(total, 2)
+        self.assertEqual(counts['language'], {'bn': 2, 'en': 1})
+        self.assertEqual(counts['category'], {str(self.poetry.pk): 1, str(self.novels.pk): 1})
+        self.assertEqual(counts['publisher'], {str(self.gitanjali.publisher_id): 1, facets.MISSING: 1})
+        self.assertEqual(counts['decade'], {'1910': 1, facets.MISSING: 1})
+        self.assertEqual(counts['availability'], {'available': 1, 'unavailable': 1})
+
+    def test_index_agrees_with_the_queryset_filter(self):
+        for chosen in ({}, {'availability': 'available'}, {'category': str(self.novels.pk), 'language': 'en'},
+                       {'decade': '1900'}, {'publisher': facets.MISSING}, {'language': 'ur'}):
+            expected = set(facets.filter_books(Book.objects.all(), chosen).values_list('pk', flat=True))
+            self.assertEqual(self.index.matching(None, chosen), expected, chosen)
+            self.assertEqual(self.index.counts(chosen)[1], len(expected), chosen)
+
+    def test_changed_and_removed_books(self):
+        self.index.rebuild()
+        Book.objects.filter(pk=self.gora.pk).update(language='en')
+        self.index.touch(self.gora.pk)
+        self.assertEqual(self.index.counts({})[0]['language'], {'bn': 1, 'en': 2})
+
+        self.index.remove(self.kim.pk)
+        self.assertEqual(self.index.matching(None, {'language': 'en'}), {self.gora.pk})
+        added = Book.objects.create(title='Chokher Bali', category=self.novels, language='bn')
+        self.index.touch(added.pk)
+        self.assertEqual(self.index.matching([added.pk, self.kim.pk], {}), {added.pk})
+
+    def test_selection_defaults_to_available(self):
+        self.assertEqual(facets.selection({}), {'availability': 'available'})
+        self.assertEqual(facets.selection({'availability': 'any', 'language': 'bn'}), {'language': 'bn'})
@@ -0,0 +1,80 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from stall import fines
+from stall.circulation import checkout, return_copy
+from stall.models import BorrowRecord, FineEntry, FinePolicy
+
+from .base import CirculationTestCase
+
+
+class FineTests(CirculationTestCase):
+    def test_late_return_is_charged_under_policy(self):
+        FinePolicy.objects.update_or_create(
+            membership_type='general',
+            defaults={'rate_per_day': Decimal('2.00'), 'grace_days': 1, 'max_fine': Decimal('10.00')},
+        )
+        loan = checkout(self.members[0], self.book, date.today() - timedelta(days=4))
+        return_copy(loan)
+
+        loan.refresh_from_db()
+        self.assertEqual(loan.fine_amount, Decimal('6.00'))
+        entry = FineEntry.objects.get(borrow_record=loan, kind='overdue')
+        self.assertEqual((entry.amount, entry.days_late), (Decimal('6.00'), 4))
+
+    def test_fine_is_capped(self):
+        FinePolicy.objects.update_or_create(
+            membership_type='general',
+            defaults={'rate_per_day': Decimal('2.00'), 'grace_days': 0, 'max_fine': Decimal('5.00')},
+        )
+        loan = checkout(self.members[0], self.book, date.today() - timedelta(days=30))
+        return_copy(loan)
+        loan.refresh_from_db()
+        self.assertEqual(loan.fine_amount, Decimal('5.00'))
+
+    def test_on_time_return_is_not_charged(self):
+        loan = checkout(self.members[0], self.book, date.today() + timedelta(days=1))
+        return_copy(loan)
+        loan.refresh_from_db()
+        self.assertEqual(loan.fine_amount, 0)
+        self.assertFalse(FineEntry.objects.filter(borrow_record=loan).exists())
+
+
+class RecomputeTests(CirculationTestCase):
+    def setUp(self):
+        super().setUp()
+        FinePolicy.objects.update_or_create(
+            membership_type='general',
+            defaults={'rate_per_day': Decimal('2.00'), 'grace_days': 0, 'max_fine': None},
+        )
+
+    def test_open_late_loans_are_charged(self):
+        loan = checkout(self.members[0], self.book, date.today() - timedelta(days=3))
+        self.assertEqual(fines.recompute(), 1)
+        loan.refresh_from_db()
+        self.assertEqual(loan.fine_amount, Decimal('6.00'))
+        self.assertEqual(fines.member_balance(self.members[0]), Decimal('6.00'))
+
+    def test_extended_loan_loses_overdue_charge(self):
+        loan = checkout(self.members[0], self.book, date.today() - timedelta(days=3))
+        fines.recompute()
+        BorrowRecord.objects.filter(pk=loan.pk).update(due_date=date.today() + timedelta(days=7))
+        self.assertEqual(fines.recompute(), 0)
+        loan.refresh_from_db()
+        self.assertEqual(loan.fine_amount, 0)
+        self.assertFalse(FineEntry.objects.filter(borrow_record=loan).exists())
+
+    def test_hand_entered_fine_survives(self):
+        # Charged for a damaged book, returned on time
+        loan = checkout(self.members[0], self.book, date.today() + timedelta(days=7))
+        BorrowRecord.objects.filter(pk=loan.pk).update(fine_amount=Decimal('250.00'))
+        # Lost while overdue: the ledger gets the overdue charge, the loan keeps its lost-book fine
+        lost = checkout(self.members[1], self.book, date.today() - timedelta(days=2))
+        BorrowRecord.objects.filter(pk=lost.pk).update(fine_amount=Decimal('100.00'))
+
+        fines.recompute()
+        loan.refresh_from_db()
+        lost.refresh_from_db()
+        self.assertEqual(loan.fine_amount, Decimal('250.00'))
+        self.assertEqual(lost.fine_amount, Decimal('100.00'))
+        self.assertEqual(FineEntry.objects.get(borrow_record=lost, kind='overdue').amount, Decimal('4.00'))
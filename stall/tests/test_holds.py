@@ -0,0 +1,92 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.messages import get_messages
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from stall.circulation import HOLD_PICKUP_DAYS, CirculationError, checkout, hold_queue, place_hold, return_copy
+from stall.models import BorrowRecord, Reservation
+
+from .base import CirculationTestCase
+
+
+class HoldQueueTests(CirculationTestCase):
+    def test_returned_copy_goes_to_first_hold(self):
+        loans = [checkout(self.members[0], self.book, date.today()), checkout(self.members[1], self.book, date.today())]
+        first = place_hold(self.members[2], self.book)
+        second = place_hold(self.members[3], self.book)
+
+        next_loan = return_copy(loans[1])
+        self.assertEqual(next_loan.member, self.members[2])
+        self.assertEqual(next_loan.copy_id, loans[1].copy_id)
+        self.assertEqual(Reservation.objects.get(pk=first.pk).status, 'fulfilled')
+        self.assertEqual(Reservation.objects.get(pk=second.pk).status, 'pending')
+        # The copy went straight to the next member, so nothing came back to the shelf
+        self.assertCounters(total=2, available=0)
+
+    def test_return_without_holds_releases_copy(self):
+        loan = checkout(self.members[0], self.book, date.today())
+        self.assertIsNone(return_copy(loan))
+        self.assertCounters(total=2, available=2)
+
+    def test_second_return_is_refused(self):
+        loan = checkout(self.members[0], self.book, date.today())
+        checkout(self.members[1], self.book, date.today())
+        return_copy(loan)
+        with self.assertRaises(CirculationError):
+            return_copy(BorrowRecord.objects.get(pk=loan.pk))
+        self.assertCounters(total=2, available=1)
+
+    def test_second_return_through_view_shows_error(self):
+        loan = checkout(self.members[0], self.book, date.today())
+        url = reverse('return_book', args=[loan.pk])
+        self.client.post(url)
+        response = self.client.post(url)
+        self.assertRedirects(response, reverse('borrowing_list'), fetch_redirect_response=False)
+        self.assertIn('already returned', ' '.join(str(m) for m in get_messages(response.wsgi_request)))
+        self.assertCounters(total=2, available=2)
+
+
+class HoldExpiryTests(CirculationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.loans = [checkout(member, self.book, date.today()) for member in self.members[:2]]
+
+    def expire(self):
+        call_command('expire_reservations', stdout=StringIO())
+
+    def test_queued_hold_has_no_expiry(self):
+        hold = place_hold(self.members[2], self.book)
+        self.assertIsNone(hold.expiry_date)
+        # However long it waits, a queued hold stays in line
+        Reservation.objects.filter(pk=hold.pk).update(reservation_date=timezone.now() - timedelta(days=30))
+        self.expire()
+        self.assertEqual(Reservation.objects.get(pk=hold.pk).status, 'pending')
+        self.assertEqual(list(hold_queue(self.book)), [hold])
+
+    def test_hold_on_a_shelved_copy_gets_pickup_window(self):
+        return_copy(self.loans[0])
+        hold = place_hold(self.members[2], self.book)
+        self.assertEqual(hold.expiry_date, date.today() + timedelta(days=HOLD_PICKUP_DAYS))
+
+    def test_lapsed_pickup_passes_to_next_in_line(self):
+        return_copy(self.loans[0])
+        first = place_hold(self.members[2], self.book)
+        second = place_hold(self.members[3], self.book)
+        self.assertIsNone(second.expiry_date)
+
+        Reservation.objects.filter(pk=first.pk).update(expiry_date=date.today() - timedelta(days=1))
+        self.expire()
+        self.assertEqual(Reservation.objects.get(pk=first.pk).status, 'expired')
+        second.refresh_from_db()
+        self.assertEqual((second.status, second.expiry_date), ('pending', date.today() + timedelta(days=HOLD_PICKUP_DAYS)))
+
+    def test_cancelling_the_head_hold_passes_the_window_on(self):
+        return_copy(self.loans[0])
+        first = place_hold(self.members[2], self.book)
+        second = place_hold(self.members[3], self.book)
+        self.assertIsNone(second.expiry_date)
+        self.client.post(reverse('cancel_reservation', args=[first.pk]))
+        self.assertIsNotNone(Reservation.objects.get(pk=second.pk).expiry_date)
@@ -0,0 +1,84 @@
+from datetime import date
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+
+from stall import inventory
+from stall.circulation import checkout
+from stall.models import BookCopy
+
+from .base import CirculationTestCase
+
+
+class InventoryTests(CirculationTestCase):
+    def setUp(self):
+        super().setUp()
+        for number in range(3, 6):
+            BookCopy.objects.create(book=self.book, copy_number=f'C{number}')
+        shelves = {'C1': 'A', 'C2': 'A', 'C3': 'A', 'C4': 'B', 'C5': 'C'}
+        for copy in BookCopy.objects.all():
+            copy.location_shelf = shelves[copy.copy_number]
+            copy.save()
+        self.barcode = {copy.copy_number: copy.barcode for copy in BookCopy.objects.all()}
+        # C3 is out, so it isn't missing from shelf A
+        checkout(self.members[0], self.book, date.today(), copy=BookCopy.objects.get(copy_number='C3'))
+
+    def scan_file(self):
+        b = self.barcode
+        return [
+            'shelf,barcode,condition',
+            '# shelf A',
+            f'A,{b["C1"]},good',
+            f'A,{b["C4"]}',
+            'A,NOPE-1',
+            f'B,{b["C3"]},damaged',
+            '',
+        ]
+
+    def test_read_scans(self):
+        scans, conditions = inventory.read_scans(self.scan_file())
+        self.assertEqual(scans, {'A': {self.barcode['C1'], self.barcode['C4'], 'NOPE-1'}, 'B': {self.barcode['C3']}})
+        self.assertEqual(conditions, {self.barcode['C1']: 'good', self.barcode['C3']: 'damaged'})
+        scans, _ = inventory.read_scans(['x1', 'x2'], shelf='D')
+        self.assertEqual(scans, {'D': {'x1', 'x2'}})
+
+    def test_bad_lines_are_reported(self):
+        with self.assertRaisesMessage(inventory.ScanFormatError, 'Line 1'):
+            inventory.read_scans(['just-a-barcode'])
+        with self.assertRaisesMessage(inventory.ScanFormatError, 'unknown condition "shiny"'):
+            inventory.read_scans(['A,x1,shiny'])
+
+    def test_reconcile(self):
+        report = inventory.reconcile(inventory.read_scans(self.scan_file())[0])
+        b = self.barcode
+        self.assertEqual(report['A'], {
+            'expected': 3, 'found': 3,
+            'missing': [b['C2']],
+            'misplaced': {b['C4']: 'B'},
+            'unexpected': ['NOPE-1'],
+            'on_loan': [],
+        })
+        self.assertEqual(report['B']['on_loan'], [b['C3']])
+        # Shelf C wasn't scanned, so C5 isn't reported missing
+        self.assertNotIn('C', report)
+        self.assertEqual(inventory.totals(report)['missing'], 1)
+
+    def test_apply(self):
+        scans, conditions = inventory.read_scans(self.scan_file())
+        # C1 is already in good condition
+        self.assertEqual(inventory.apply(scans, conditions, relocate=True), (1, 2))
+        copies = {copy.copy_number: (copy.location_shelf, copy.condition) for copy in BookCopy.objects.all()}
+        self.assertEqual(copies['C4'][0], 'A')
+        self.assertEqual(copies['C3'], ('B', 'damaged'))
+        # Nothing left to change
+        self.assertEqual(inventory.apply(scans, conditions, relocate=True), (0, 0))
+
+    def test_upload_as_json(self):
+        upload = SimpleUploadedFile('scans.csv', '\n'.join(self.scan_file()).encode('utf-8-sig'))
+        response = self.client.post(f"{reverse('inventory_reconcile')}?format=json", {'scans': upload})
+        body = response.json()
+        self.assertEqual((body['summary']['shelves'], body['summary']['unexpected'], body['updated']), (2, 1, None))
+
+        upload = SimpleUploadedFile('scans.csv', b'A,x1,shiny')
+        response = self.client.post(f"{reverse('inventory_reconcile')}?format=json", {'scans': upload})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,86 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from stall import isbn
+from stall.models import Book, BookCopy
+
+ODYSSEY = {
+    'title': 'The Odyssey', 'subtitle': 'A new translation', 'isbn_10': ['0-14-044913-2'],
+    'publishers': ['Penguin'], 'publish_date': 'March 3, 2003', 'number_of_pages': 416,
+    'languages': [{'key': '/languages/eng'}], 'by_statement': 'Homer',
+}
+CALCULUS = {'title': 'Calculus', 'isbn_13': ['9780306406157'], 'publish_date': '1998'}
+# A later edition listing the same ISBN doesn't replace the first
+REPRINT = {'title': 'Calculus (reprint)', 'isbn_10': ['0306406152']}
+
+
+def dump_line(record):
+    return f'/type/edition\t/books/OL1M\t1\t2020-01-01\t{json.dumps(record)}\n'
+
+
+class NormalizeTests(SimpleTestCase):
+    def test_isbn10_becomes_isbn13(self):
+        self.assertEqual(isbn.normalize('0-14-044913-2'), '9780140449136')
+        self.assertEqual(isbn.normalize('978-0-14-044913-6'), '9780140449136')
+
+    def test_bad_check_digits(self):
+        self.assertIsNone(isbn.normalize('0-14-044913-3'))
+        self.assertIsNone(isbn.normalize('9780140449137'))
+        self.assertIsNone(isbn.normalize('not an isbn'))
+
+
+class IndexTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = Path(directory.name)
+        self.source = self.dir / 'editions.txt'
+        self.source.write_text(
+            dump_line(ODYSSEY) + 'not json\n' + dump_line({'title': 'No ISBN'}) + dump_line(CALCULUS) + dump_line(REPRINT),
+            encoding='utf-8',
+        )
+        self.target = self.dir / 'isbn.idx'
+
+    def test_build_and_lookup(self):
+        self.assertEqual(isbn.build(self.source, self.target), 2)
+        index = isbn.ISBNIndex(self.target)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.lookup('0140449132'), {
+            'isbn': '9780140449136', 'title': 'The Odyssey: A new translation', 'pages': 416, 'publisher': 'Penguin',
+            'publication_date': '2003-03-03', 'year': 2003, 'language': 'en', 'by': 'Homer',
+        })
+        self.assertEqual(index.lookup('978-0-306-40615-7'), {'isbn': '9780306406157', 'title': 'Calculus', 'year': 1998})
+        self.assertIsNone(index.lookup('9780262033848'))
+
+    def test_rebuilt_index_is_picked_up(self):
+        isbn.build(self.source, self.target)
+        index = isbn.ISBNIndex(self.target)
+        self.assertIsNotNone(index.lookup('9780140449136'))
+        self.source.write_text(dump_line(CALCULUS), encoding='utf-8')
+        isbn.build(self.source, self.target)
+        self.assertIsNone(index.lookup('9780140449136'))
+        self.assertEqual(len(index), 1)
+
+    def test_missing_index(self):
+        with self.assertRaises(isbn.IndexMissing):
+            isbn.ISBNIndex(self.dir / 'absent.idx').lookup('9780140449136')
+
+    def test_lookup_api_and_import(self):
+        isbn.build(self.source, self.target)
+        with override_settings(ISBN_INDEX_PATH=self.target):
+            response = self.client.get(reverse('isbn_lookup_api'), {'isbn': '0140449132'})
+            self.assertEqual(response.json()['book']['title'], 'The Odyssey: A new translation')
+            self.assertEqual(self.client.get(reverse('isbn_lookup_api'), {'isbn': '123'}).status_code, 400)
+
+            isbn_file = self.dir / 'isbns.txt'
+            isbn_file.write_text('0140449132,2\n9780262033848\n', encoding='utf-8')
+            call_command('import_isbns', str(isbn_file), category='Classics', stdout=StringIO())
+        book = Book.objects.get(isbn='9780140449136')
+        self.assertEqual((book.publisher.name, book.pages, BookCopy.objects.filter(book=book).count()), ('Penguin', 416, 2))
+        self.assertEqual(Book.objects.count(), 1)
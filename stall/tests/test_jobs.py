@@ -0,0 +1,80 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from stall import jobs
+from stall.models import Job
+
+calls = []
+
+
+def record(value):
+    calls.append(value)
+    return {'value': value}
+
+
+def explode():
+    raise RuntimeError('boom')
+
+
+@mock.patch.dict(jobs.TASKS, {'record': (record, 3), 'explode': (explode, 2)})
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def run_due(self):
+        for job_id in jobs.claim('test-worker', limit=10):
+            jobs.run(job_id)
+
+    def test_enqueue_claim_run(self):
+        job = jobs.enqueue('record', value=7)
+        self.run_due()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result), ('done', 1, {'value': 7}))
+        self.assertEqual(calls, [7])
+
+    def test_unknown_task_is_refused(self):
+        with self.assertRaises(KeyError):
+            jobs.enqueue('no_such_task')
+
+    def test_dedup_key_returns_the_queued_job(self):
+        first = jobs.enqueue('record', dedup_key='daily', value=1)
+        self.assertEqual(jobs.enqueue('record', dedup_key='daily', value=2), first)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_a_job_is_claimed_once(self):
+        job = jobs.enqueue('record', value=1)
+        self.assertEqual(jobs.claim('one'), [job.pk])
+        self.assertEqual(jobs.claim('two'), [])
+
+    def test_delayed_job_waits(self):
+        jobs.enqueue('record', delay=timedelta(minutes=5), value=1)
+        self.assertEqual(jobs.claim('test-worker'), [])
+
+    def test_failures_back_off_then_give_up(self):
+        job = jobs.enqueue('explode')
+        self.run_due()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('boom', job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.run_due()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_fail_records_a_lost_run(self):
+        job = jobs.enqueue('record', value=1)
+        jobs.claim('test-worker')
+        jobs.fail(job.pk, 'worker process died')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), ('queued', 'worker process died'))
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = jobs.enqueue('record', value=1)
+        jobs.claim('test-worker')
+        self.assertEqual(jobs.requeue_stale(timezone.now() + jobs.STALE_AFTER * 2), 1)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, 'queued')
@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from stall.circulation import checkout, return_copy
+from stall.models import Author, Book, BookCopy, BorrowRecord, Member
+
+from .base import CirculationTestCase
+
+
+class MemberHistoryTests(CirculationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.member = self.members[0]
+        returned = checkout(self.member, self.book, date.today() + timedelta(days=7))
+        return_copy(returned)
+        BorrowRecord.objects.filter(pk=returned.pk).update(fine_amount=Decimal('3.00'))
+        self.overdue = checkout(self.member, self.book, date.today() - timedelta(days=2))
+
+    def add_loan(self, title):
+        book = Book.objects.create(title=title, category=self.category)
+        book.authors.add(Author.objects.create(first_name='Kazi', last_name=title))
+        BookCopy.objects.create(book=book, copy_number='C1')
+        return checkout(self.member, book, date.today() + timedelta(days=7))
+
+    def test_history_is_partitioned(self):
+        current = self.add_loan('Agnibina')
+        member = Member.objects.get(pk=self.member.pk)
+        self.assertCountEqual(member.active_borrowings, [current, self.overdue])
+        self.assertEqual(member.overdue_books, [self.overdue])
+        self.assertEqual(len(member.returned_borrowings), 1)
+        self.assertEqual(member.borrowing_stats, {
+            'total_borrowed': 3,
+            'currently_borrowed': 2,
+            'overdue_count': 1,
+            'total_fines': Decimal('3.00'),
+        })
+
+    def test_detail_queries_do_not_grow_with_history(self):
+        url = reverse('member_detail', args=[self.member.pk])
+        with CaptureQueriesContext(connection) as before:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        for title in ('Agnibina', 'Bisher Banshi', 'Chhayanat'):
+            self.add_loan(title)
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url)
+        self.assertContains(response, 'Chhayanat')
+        self.assertEqual(len(after), len(before))
+
+    def test_list_counts_loans_per_member(self):
+        response = self.client.get(reverse('members_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['member_stats']['total'], 4)
+        member = next(m for m in response.context['members'] if m.pk == self.member.pk)
+        self.assertEqual((member.total_borrowings, member.active_count, member.overdue_count), (2, 1, 1))
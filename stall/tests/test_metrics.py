@@ -0,0 +1,63 @@
+from datetime import date
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from stall import metrics
+from stall.circulation import checkout
+
+from .base import CirculationTestCase
+
+
+@mock.patch.object(metrics, 'REGISTRY', [])
+class ExpositionTests(SimpleTestCase):
+    def test_counter(self):
+        counter = metrics.Counter('test_total', 'Things counted', ['kind'])
+        counter.inc(kind='a "quoted"\nvalue')
+        counter.inc(2, kind='b')
+        self.assertEqual(metrics.render(), (
+            '# HELP test_total Things counted\n'
+            '# TYPE test_total counter\n'
+            'test_total{kind="a \\"quoted\\"\\nvalue"} 1\n'
+            'test_total{kind="b"} 2\n'
+        ))
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram('test_seconds', 'Time taken', buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 3):
+            histogram.observe(value)
+        self.assertEqual(histogram.collect(), [
+            'test_seconds_bucket{le="0.1"} 1',
+            'test_seconds_bucket{le="1"} 3',
+            'test_seconds_bucket{le="+Inf"} 4',
+            'test_seconds_sum 4.05',
+            'test_seconds_count 4',
+        ])
+
+
+class MetricsViewTests(CirculationTestCase):
+    def sample(self, metric, **labels):
+        return metric._values.get(metric._key(labels), 0)
+
+    def test_requests_are_counted_per_view(self):
+        before = self.sample(metrics.REQUESTS, view='dashboard', method='GET', status=200)
+        self.client.get(reverse('dashboard'))
+        self.assertEqual(self.sample(metrics.REQUESTS, view='dashboard', method='GET', status=200), before + 1)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('library_http_requests_total{view="dashboard",method="GET",status="200"}', body)
+        self.assertIn('library_http_request_queries_count{view="dashboard"}', body)
+
+    def test_unmatched_paths_share_a_label(self):
+        self.client.get('/no/such/page/')
+        self.assertGreater(self.sample(metrics.REQUESTS, view='unmatched', method='GET', status=404), 0)
+
+    def test_checkouts_count_once_committed(self):
+        before = self.sample(metrics.CHECKOUTS, via='direct')
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout(self.members[0], self.book, date.today())
+            self.assertEqual(self.sample(metrics.CHECKOUTS, via='direct'), before)
+        self.assertEqual(self.sample(metrics.CHECKOUTS, via='direct'), before + 1)
@@ -0,0 +1,55 @@
+from datetime import date
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase
+
+from stall import recommendations
+from stall.models import Book, BookRecommendation, BorrowRecord, Category
+
+from .base import make_member
+
+
+class CooccurrenceTests(TestCase):
+    def test_counts_each_ordered_pair_per_member(self):
+        members = np.array([0, 0, 0, 1, 1, 2])
+        books = np.array([0, 1, 2, 0, 1, 2])
+        keys, counts = recommendations.cooccurrence(members, books, 3)
+        pairs = {(key // 3, key % 3): count for key, count in zip(keys.tolist(), counts.tolist())}
+        self.assertEqual(pairs, {(0, 1): 2, (1, 0): 2, (0, 2): 1, (2, 0): 1, (1, 2): 1, (2, 1): 1})
+
+    def test_merging_in_batches_gives_the_same_counts(self):
+        rng = np.random.default_rng(0)
+        members, books = rng.integers(0, 30, 400), rng.integers(0, 20, 400)
+        pairs = np.unique(np.stack([members, books], axis=1), axis=0)
+        expected = recommendations.cooccurrence(pairs[:, 0], pairs[:, 1], 20)
+        with mock.patch.object(recommendations, 'MERGE_EVERY', 10):
+            batched = recommendations.cooccurrence(pairs[:, 0], pairs[:, 1], 20)
+        np.testing.assert_array_equal(batched[0], expected[0])
+        np.testing.assert_array_equal(batched[1], expected[1])
+
+
+class BuildTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Fiction')
+        self.books = [Book.objects.create(title=title, category=category) for title in ('Gora', 'Chokher Bali', 'Ghare Baire', 'Noukadubi')]
+        histories = [(0, 1, 2), (0, 1), (0, 1, 3), (2, 3), (2, 3)]
+        for i, history in enumerate(histories):
+            member = make_member(i)
+            for book in history:
+                BorrowRecord.objects.create(member=member, book=self.books[book], due_date=date.today())
+
+    def test_build_ranks_by_cosine_similarity(self):
+        stored = recommendations.build(min_shared=2)
+        self.assertEqual(stored, BookRecommendation.objects.count())
+        gora, chokher_bali, ghare_baire, noukadubi = self.books
+        self.assertEqual(recommendations.also_borrowed(gora), [chokher_bali])
+        self.assertEqual(recommendations.also_borrowed(ghare_baire), [noukadubi])
+        rec = BookRecommendation.objects.get(book=gora, recommended=chokher_bali)
+        self.assertEqual((rec.rank, rec.shared_borrowers), (1, 3))
+        self.assertAlmostEqual(rec.score, 1.0)
+
+    def test_titles_for_several_books(self):
+        recommendations.build(min_shared=1)
+        titles = recommendations.also_borrowed_for([self.books[0].pk], limit=1)
+        self.assertEqual(titles, {self.books[0].pk: ['Chokher Bali']})
@@ -0,0 +1,76 @@
+from datetime import date, timedelta
+from smtplib import SMTPServerDisconnected
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+
+from stall import reminders
+from stall.circulation import checkout
+from stall.models import Book, BookCopy, OverdueReminder
+
+from .base import CirculationTestCase
+
+
+class FlakyBackend(EmailBackend):
+    """Delivers `limit` messages, then drops the connection"""
+    def __init__(self, limit, **kwargs):
+        super().__init__(**kwargs)
+        self.limit = limit
+
+    def send_messages(self, messages):
+        if len(mail.outbox) >= self.limit:
+            raise SMTPServerDisconnected('Connection unexpectedly closed')
+        return super().send_messages(messages)
+
+
+class ReminderTests(CirculationTestCase):
+    def setUp(self):
+        super().setUp()
+        late = date.today() - timedelta(days=3)
+        other = Book.objects.create(title='Tom & "Jerry"', category=self.category)
+        for number in ('C1', 'C2'):
+            BookCopy.objects.create(book=other, copy_number=number)
+        checkout(self.members[0], self.book, late)
+        checkout(self.members[0], other, late - timedelta(days=2))
+        checkout(self.members[1], self.book, late)
+        # Not overdue yet
+        checkout(self.members[2], other, date.today() + timedelta(days=1))
+
+    def test_one_digest_per_member(self):
+        self.assertEqual(reminders.send_reminders(), (2, 3))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['member0@example.com', 'member1@example.com'])
+        digest = next(message for message in mail.outbox if message.to == ['member0@example.com'])
+        self.assertEqual(digest.subject, 'You have 2 overdue books')
+        self.assertIn('Tom & "Jerry"', digest.body)
+        self.assertEqual(OverdueReminder.objects.count(), 3)
+
+    def test_subject_is_not_html_escaped(self):
+        mail.outbox = []
+        self.book.title = 'Gora & "Ghare Baire"'
+        self.book.save()
+        reminders.send_reminders()
+        subjects = {message.to[0]: message.subject for message in mail.outbox}
+        self.assertEqual(subjects['member1@example.com'], 'Overdue: "Gora & "Ghare Baire""')
+
+    def test_reminded_loans_wait_before_the_next_reminder(self):
+        reminders.send_reminders()
+        mail.outbox = []
+        self.assertEqual(reminders.send_reminders(), (0, 0))
+        self.assertEqual(mail.outbox, [])
+        OverdueReminder.objects.update(sent_at=OverdueReminder.objects.first().sent_at - reminders.REMIND_EVERY)
+        self.assertEqual(reminders.send_reminders(), (2, 3))
+
+    def test_dry_run_sends_and_records_nothing(self):
+        self.assertEqual(reminders.send_reminders(dry_run=True), (2, 3))
+        self.assertEqual((len(mail.outbox), OverdueReminder.objects.count()), (0, 0))
+
+    def test_sent_digests_are_recorded_when_a_later_one_fails(self):
+        with self.assertRaises(SMTPServerDisconnected):
+            reminders.send_reminders(connection=FlakyBackend(limit=1))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['member0@example.com'])
+        self.assertEqual(set(OverdueReminder.objects.values_list('member', flat=True)), {self.members[0].pk})
+        # The next run only sends what wasn't delivered
+        mail.outbox = []
+        self.assertEqual(reminders.send_reminders(), (1, 1))
+        self.assertEqual(mail.outbox[0].to, ['member1@example.com'])
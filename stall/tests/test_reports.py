@@ -0,0 +1,60 @@
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from stall import reports
+from stall.circulation import checkout, return_copy
+from stall.models import Book, BookCopy, BorrowRecord, Category
+
+from .base import CirculationTestCase
+
+
+class MonthlyReportTests(CirculationTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.month = reports.month_start(date.today())
+        # A second category with the same name as the first
+        self.other = Book.objects.create(title='Gora', category=Category.objects.create(name='Fiction'))
+        BookCopy.objects.create(book=self.other, copy_number='C1')
+
+    def lend(self, book, member, days=None):
+        loan = checkout(member, book, date.today() + timedelta(days=14))
+        if days is not None:
+            return_copy(loan)
+            BorrowRecord.objects.filter(pk=loan.pk).update(return_date=loan.borrow_date + timedelta(days=days))
+        return loan
+
+    def test_same_name_categories_stay_apart(self):
+        self.lend(self.book, self.members[0], days=4)
+        self.lend(self.book, self.members[1], days=2)
+        self.lend(self.other, self.members[2])
+
+        rows, summary = reports.monthly_report('category', self.month, self.month)
+        self.assertEqual(
+            [(row['label'], row['loans'], row['average_days']) for row in summary],
+            [('Fiction', 2, 3.0), ('Fiction', 1, None)],
+        )
+        self.assertEqual(len(rows), 2)
+
+    def test_totals_are_cached_per_month(self):
+        self.lend(self.book, self.members[0])
+        reports.month_totals(self.month)
+        self.lend(self.other, self.members[1])
+        self.assertEqual(sum(row[0] for row in reports.month_totals(self.month)['category'].values()), 1)
+        cache.clear()
+        self.assertEqual(sum(row[0] for row in reports.month_totals(self.month)['category'].values()), 2)
+
+    def test_chunks_cover_every_loan(self):
+        for member in self.members[:3]:
+            self.lend(self.book if member != self.members[2] else self.other, member)
+        totals = reports._aggregate_month(self.month, chunk_size=1)
+        self.assertEqual(totals['membership_type'], {'general': [3, 0, 0]})
+
+    def test_csv_export(self):
+        self.lend(self.book, self.members[0])
+        response = self.client.get(reverse('circulation_reports'), {'format': 'csv', 'dimension': 'language'})
+        lines = response.content.decode().splitlines()
+        self.assertEqual(lines[0], 'Month,Language,Loans,Average loan days')
+        self.assertEqual(len(lines), 2)
@@ -0,0 +1,63 @@
+from unittest import mock, skipIf
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from stall import search
+from stall.models import Author, Book, Category, SearchTrigram
+
+
+class NormalizeTests(SimpleTestCase):
+    def test_folds_marks_variants_and_repeats(self):
+        self.assertEqual(search.normalize('Émile  Zolla!'), 'emile zola')
+        self.assertEqual(search.normalize('أحمد'), search.normalize('احمد'))
+        self.assertEqual(search.trigrams('ab'), {'  a', ' ab', 'ab '})
+
+
+class TrigramSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Poetry')
+        self.gitanjali = Book.objects.create(title='Gitanjali', category=category)
+        self.gitanjali.authors.add(Author.objects.create(first_name='Rabindranath', last_name='Tagore'))
+        self.agnibina = Book.objects.create(title='Agnibina', category=category)
+        self.agnibina.authors.add(Author.objects.create(first_name='Kazi', last_name='Nazrul Islam'))
+        Book.objects.create(title='রবীন্দ্র রচনাবলী', category=category)
+
+    def titles(self, query, **kwargs):
+        return [book.title for book, _ in search.search_books(query, **kwargs)]
+
+    def test_typos_still_match(self):
+        self.assertEqual(self.titles('gitanjoli'), ['Gitanjali'])
+        self.assertEqual(self.titles('nazrool'), ['Agnibina'])
+        self.assertEqual(self.titles('xyz'), [])
+
+    def test_index_follows_author_changes(self):
+        author = self.agnibina.authors.get()
+        author.last_name = 'Islam'
+        author.first_name = 'Kazi Nazrul'
+        author.save()
+        self.gitanjali.authors.clear()
+        self.assertEqual(self.titles('tagore'), [])
+        self.assertEqual(self.titles('kazi nazrul'), ['Agnibina'])
+
+    def test_rebuild_matches_incremental_index(self):
+        before = set(SearchTrigram.objects.values_list('trigram', 'book'))
+        self.assertEqual(search.rebuild(chunk_size=1), 3)
+        self.assertEqual(set(SearchTrigram.objects.values_list('trigram', 'book')), before)
+
+    def test_common_trigrams_are_left_out(self):
+        with mock.patch.object(search, 'MAX_POSTINGS', 1), mock.patch.object(search, 'MIN_TRIGRAMS', 1):
+            grams, skipped = search._selective(search.trigrams('gitanjali'))
+            self.assertEqual((len(grams), skipped), (1, 9))
+            self.assertEqual(self.titles('gitanjali'), ['Gitanjali'])
+
+    @skipIf(search.unidecode is None, 'unidecode is not installed')
+    def test_transliterated_query(self):
+        self.assertIn('রবীন্দ্র রচনাবলী', self.titles('robindro'))
+
+    def test_api(self):
+        response = self.client.get(reverse('book_search_api'), {'q': 'gitanjoli'})
+        result, = response.json()['results']
+        self.assertEqual((result['id'], result['authors']), (self.gitanjali.pk, 'Rabindranath Tagore'))
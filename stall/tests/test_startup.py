@@ -0,0 +1,23 @@
+from django.test import SimpleTestCase, TestCase
+
+from stall import startup
+from stall.chatbot import LibraryChatbot
+
+
+class LazyImportTests(SimpleTestCase):
+    def test_startup_does_not_import_lazy_modules(self):
+        modules = {module for module, _, _ in startup.imports(startup.manage_py('check'))}
+        self.assertIn('stall.chatbot', modules)
+        for module in startup.LAZY_MODULES:
+            self.assertNotIn(module, modules)
+
+
+class ChatbotFailureTests(TestCase):
+    class TimingOutModel:
+        def generate_content(self, prompt, request_options=None):
+            raise TimeoutError('deadline exceeded')
+
+    def test_failed_call_returns_an_apology(self):
+        chatbot = LibraryChatbot()
+        chatbot.model = self.TimingOutModel()
+        self.assertIn('having trouble', chatbot.get_chat_response('Hello'))
@@ -0,0 +1,23 @@
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.test import TestCase
+from django.urls import reverse
+
+from stall.storage import trim_css
+
+
+class StaticStorageTests(TestCase):
+    def test_uncollected_files_keep_their_plain_name(self):
+        # The test runner has no manifest; pages must still render
+        self.assertEqual(staticfiles_storage.url('vendor/bootstrap/css/bootstrap.min.css'), '/static/vendor/bootstrap/css/bootstrap.min.css')
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/static/vendor/bootstrap/css/bootstrap.min.css')
+
+    def test_trim_css_keeps_rules_for_used_classes(self):
+        css = '.btn{color:red}.unused{color:blue}.btn.active,.gone{margin:0}@media (min-width:1px){.btn{padding:0}.gone{padding:1px}}'
+        trimmed = trim_css(css, {'btn', 'active'})
+        self.assertIn('.btn{color:red}', trimmed)
+        self.assertIn('.btn.active{margin:0}', trimmed)
+        self.assertNotIn('unused', trimmed)
+        self.assertNotIn('gone', trimmed)
+        self.assertIn('@media', trimmed)
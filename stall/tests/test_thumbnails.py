@@ -0,0 +1,59 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from stall import thumbnails
+from stall.models import Book, Category
+
+
+def png(width, height):
+    out = BytesIO()
+    Image.new('RGB', (width, height), 'red').save(out, 'PNG')
+    return SimpleUploadedFile('cover.png', out.getvalue(), content_type='image/png')
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.category = Category.objects.create(name='Fiction')
+
+    def thumbnails_for(self, width, height):
+        book = Book.objects.create(title='Gora', category=self.category, cover_image=png(width, height))
+        self.assertTrue(thumbnails.needs_thumbnails(book, 'cover_image'))
+        thumbs = thumbnails.generate(Book, book.pk, 'cover_image')
+        book.refresh_from_db()
+        self.assertEqual(book.cover_thumbnails, thumbs)
+        self.assertFalse(thumbnails.needs_thumbnails(book, 'cover_image'))
+        return thumbs
+
+    def rendered_width(self, name):
+        with default_storage.open(name) as f:
+            return Image.open(f).width
+
+    def test_every_width_and_format_is_rendered(self):
+        thumbs = self.thumbnails_for(800, 1200)
+        for fmt in ('jpeg', 'webp'):
+            self.assertEqual(sorted(thumbs[fmt], key=int), ['150', '300', '600'])
+            for width, name in thumbs[fmt].items():
+                self.assertEqual(self.rendered_width(name), int(width))
+        self.assertIn('600w', thumbnails.srcset(thumbs))
+        self.assertTrue(thumbnails.thumbnail_url(thumbs, 200).endswith('-300.jpg'))
+
+    def test_small_source_is_not_listed_at_widths_it_cannot_fill(self):
+        thumbs = self.thumbnails_for(400, 600)
+        self.assertEqual(sorted(thumbs['webp'], key=int), ['150', '300'])
+        self.assertNotIn('600w', thumbnails.srcset(thumbs))
+
+    def test_source_narrower_than_every_width_keeps_its_own_width(self):
+        thumbs = self.thumbnails_for(100, 150)
+        self.assertEqual(list(thumbs['jpeg']), ['100'])
+        self.assertEqual(self.rendered_width(thumbs['jpeg']['100']), 100)
@@ -0,0 +1,42 @@
+from datetime import date, timedelta
+
+from stall import trending
+from stall.circulation import checkout
+from stall.models import Book, DailyBorrowCount
+
+from .base import CirculationTestCase
+
+
+class TrendingTests(CirculationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = Book.objects.create(title='Gora', category=self.category)
+        self.today = date.today()
+
+    def test_checkout_updates_rollup(self):
+        checkout(self.members[0], self.book, self.today)
+        checkout(self.members[1], self.book, self.today)
+        self.assertEqual(DailyBorrowCount.objects.get(book=self.book, day=self.today).count, 2)
+
+    def test_top_books_respects_window(self):
+        trending.record_borrow(self.book.pk, self.today, count=2)
+        trending.record_borrow(self.other.pk, self.today - timedelta(days=20), count=5)
+
+        week = trending.top_books(days=7, today=self.today)
+        self.assertEqual([(book, book.borrow_count) for book in week], [(self.book, 2)])
+        month = trending.top_books(days=30, today=self.today)
+        self.assertEqual([(book, book.borrow_count) for book in month], [(self.other, 5), (self.book, 2)])
+        self.assertEqual(trending.top_books(days=None, limit=1), [self.other])
+
+    def test_rebuild_matches_loans(self):
+        checkout(self.members[0], self.book, self.today)
+        checkout(self.members[1], self.book, self.today)
+        # A stray row for a day without loans is dropped
+        trending.record_borrow(self.other.pk, self.today - timedelta(days=3))
+        DailyBorrowCount.objects.filter(book=self.book).update(count=9)
+
+        self.assertEqual(trending.rebuild(), 1)
+        self.assertEqual(
+            list(DailyBorrowCount.objects.values_list('book', 'day', 'count')),
+            [(self.book.pk, self.today, 2)],
+        )
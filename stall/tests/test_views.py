@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.urls import reverse
+
+from stall.circulation import checkout, place_hold
+from stall.models import Book, BookCopy
+
+from .base import CirculationTestCase
+
+
+class PageTests(CirculationTestCase):
+    def test_home_lists_and_searches_the_catalog(self):
+        gora = Book.objects.create(title='Gora', category=self.category)
+        BookCopy.objects.create(book=gora, copy_number='C1')
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['books']), 2)
+        response = self.client.get(reverse('home'), {'search': 'gitan'})
+        self.assertEqual([book.title for book in response.context['books']], ['Gitanjali'])
+
+    def test_home_falls_back_to_close_matches(self):
+        response = self.client.get(reverse('home'), {'search': 'gitanjoli'})
+        self.assertTrue(response.context['close_matches'])
+        self.assertEqual([book.title for book in response.context['books']], ['Gitanjali'])
+
+    def test_book_detail(self):
+        checkout(self.members[0], self.book, date.today())
+        checkout(self.members[1], self.book, date.today())
+        place_hold(self.members[2], self.book)
+        response = self.client.get(reverse('book_detail', args=[self.book.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.context['available_copies'], response.context['holds_waiting']), ([], 1))
+        self.assertEqual(self.client.get(reverse('book_detail', args=[self.book.pk + 100])).status_code, 404)
+
+    def test_dashboard(self):
+        checkout(self.members[0], self.book, date.today())
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['today_borrowings_count'], 1)
+        self.assertEqual([book.title for book in response.context['trending_books']], ['Gitanjali'])
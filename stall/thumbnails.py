@@ -0,0 +1,120 @@
+"""Fixed-size thumbnails for book covers and member photos.
+
+Thumbnails are generated by the background worker after the upload is committed
+and stored under MEDIA_ROOT/thumbs/ with content-hashed names, so they can be
+served with far-future cache headers.
+"""
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+THUMBNAIL_DIR = 'thumbs'
+
+# One year; the names change whenever the source image does
+THUMBNAIL_MAX_AGE = 60 * 60 * 24 * 365
+
+# Image field -> (JSON field holding the generated names, widths in pixels)
+THUMBNAIL_FIELDS = {
+    'cover_image': ('cover_thumbnails', (150, 300, 600)),
+    'photo': ('photo_thumbnails', (64, 128, 256)),
+}
+
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg'),
+    'webp': ('WEBP', 'webp'),
+}
+
+QUALITY = 82
+
+
+def needs_thumbnails(instance, field_name):
+    """True when the stored thumbnails don't belong to the current image"""
+    thumbs_field, _ = THUMBNAIL_FIELDS[field_name]
+    source = getattr(instance, field_name).name or ''
+    return source != (getattr(instance, thumbs_field) or {}).get('source', '')
+
+
+def schedule(instance, field_name):
+    """Queue thumbnail generation for the background worker once the upload is committed"""
+    from .jobs import enqueue_on_commit
+
+    label = instance._meta.label
+    enqueue_on_commit(
+        'generate_thumbnails',
+        dedup_key=f'thumbnails:{label}:{instance.pk}:{field_name}',
+        model=label,
+        pk=instance.pk,
+        field_name=field_name,
+    )
+
+
+def generate(model, pk, field_name):
+    """Render every configured size and format for one object's image"""
+    thumbs_field, widths = THUMBNAIL_FIELDS[field_name]
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return None
+
+    image_file = getattr(instance, field_name)
+    thumbs = {}
+    if image_file:
+        with image_file.open('rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:16]
+
+        image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+
+        thumbs['source'] = image_file.name
+        for fmt, (pil_format, ext) in FORMATS.items():
+            thumbs[fmt] = {}
+            for width in _widths(widths, image.width):
+                name = f'{THUMBNAIL_DIR}/{digest}-{width}.{ext}'
+                if not default_storage.exists(name):
+                    default_storage.save(name, ContentFile(_render(image, width, pil_format)))
+                thumbs[fmt][str(width)] = name
+
+    # Only store the result if the image wasn't replaced while we were working
+    current = model.objects.filter(pk=pk)
+    if image_file:
+        current = current.filter(**{field_name: image_file.name})
+    current.update(**{thumbs_field: thumbs})
+    return thumbs
+
+
+def _widths(configured, source_width):
+    """Configured widths the source can fill without upscaling; a source narrower than all of them gets one at its own width"""
+    return [width for width in configured if width <= source_width] or [source_width]
+
+
+def _render(image, width, pil_format):
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.LANCZOS)
+    if pil_format == 'JPEG' and resized.mode != 'RGB':
+        resized = resized.convert('RGB')
+    out = BytesIO()
+    resized.save(out, pil_format, quality=QUALITY, optimize=True)
+    return out.getvalue()
+
+
+def srcset(thumbs, fmt='webp'):
+    """Build an srcset attribute value from stored thumbnail names"""
+    sizes = (thumbs or {}).get(fmt, {})
+    return ', '.join(
+        f'{default_storage.url(name)} {width}w'
+        for width, name in sorted(sizes.items(), key=lambda item: int(item[0]))
+    )
+
+
+def thumbnail_url(thumbs, width, fmt='jpeg'):
+    """URL of the smallest thumbnail at least `width` pixels wide"""
+    sizes = (thumbs or {}).get(fmt)
+    if not sizes:
+        return ''
+    widths = sorted(int(w) for w in sizes)
+    chosen = next((w for w in widths if w >= width), widths[-1])
+    return default_storage.url(sizes[str(chosen)])
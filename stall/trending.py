@@ -0,0 +1,69 @@
+"""Windowed popularity from the DailyBorrowCount rollup table."""
+from collections import Counter
+from datetime import date, timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from .models import ArchivedBorrowRecord, Book, BorrowRecord, DailyBorrowCount
+
+# Windows offered by the dashboard, in days; None means all time
+WINDOWS = (7, 30, 365, None)
+
+
+def record_borrow(book_id, day, count=1):
+    """Add `count` borrows to a book's rollup row for `day`"""
+    rows = DailyBorrowCount.objects.filter(book_id=book_id, day=day)
+    if rows.update(count=F('count') + count):
+        return
+    try:
+        with transaction.atomic():
+            DailyBorrowCount.objects.create(book_id=book_id, day=day, count=count)
+    except IntegrityError:
+        # Another request created the row first
+        rows.update(count=F('count') + count)
+
+
+def top_books(days=7, limit=5, today=None):
+    """The `limit` most borrowed books over the last `days` days, with borrow_count set"""
+    rollups = DailyBorrowCount.objects.all()
+    if days is not None:
+        today = today or date.today()
+        rollups = rollups.filter(day__gt=today - timedelta(days=days))
+
+    top = list(
+        rollups.values('book')
+        .annotate(total=Sum('count'))
+        .order_by('-total', 'book')[:limit]
+    )
+    books = Book.objects.prefetch_related('authors').in_bulk([row['book'] for row in top])
+
+    result = []
+    for row in top:
+        book = books[row['book']]
+        book.borrow_count = row['total']
+        result.append(book)
+    return result
+
+
+def rebuild(start=None, end=None):
+    """Recompute rollup rows for borrow dates in [start, end] from live and archived loans"""
+    dates = {}
+    rollups = DailyBorrowCount.objects.all()
+    if start:
+        dates['borrow_date__gte'] = start
+        rollups = rollups.filter(day__gte=start)
+    if end:
+        dates['borrow_date__lte'] = end
+        rollups = rollups.filter(day__lte=end)
+
+    counts = Counter()
+    for model in (BorrowRecord, ArchivedBorrowRecord):
+        rows = model.objects.filter(**dates).order_by().values_list('book', 'borrow_date').annotate(count=Count('pk'))
+        for book_id, day, count in rows.iterator():
+            counts[book_id, day] += count
+    with transaction.atomic():
+        rollups.delete()
+        created = DailyBorrowCount.objects.bulk_create(
+            [DailyBorrowCount(book_id=book_id, day=day, count=count) for (book_id, day), count in counts.items()],
+            batch_size=1000,
+        )
+    return len(created)
@@ -9,10 +9,25 @@ urlpatterns = [
     path('member/<int:member_id>/select-books/', views.select_books_to_borrow, name='select_books_to_borrow'),
     path('return/<int:borrow_id>/', views.return_book, name='return_book'),
     path('borrowings/', views.borrowing_list, name='borrowing_list'),
+    path('reports/', views.circulation_reports, name='circulation_reports'),
+    path('inventory/', views.inventory_reconcile, name='inventory_reconcile'),
+    path('jobs/', views.job_status, name='job_status'),
+    path('api/borrowings/summary/', views.borrowing_summary_api, name='borrowing_summary_api'),
+    path('api/circulation/events/', views.circulation_events_api, name='circulation_events_api'),
+    path('api/circulation/on-loan/', views.on_loan_api, name='on_loan_api'),
+    path('desk/', views.circulation_desk, name='circulation_desk'),
+    path('api/desk/scan/', views.desk_scan_api, name='desk_scan_api'),
     path('member/<int:member_id>/', views.member_detail, name='member_detail'),
+    path('member/<int:member_id>/reserve/', views.reserve_book, name='reserve_book'),
+    path('reservation/<int:reservation_id>/cancel/', views.cancel_reservation, name='cancel_reservation'),
     path('authors/', views.authors_list, name='authors_list'),
     path('author/<int:author_id>/', views.author_detail, name='author_detail'),
     path('members/', views.members_list, name='members_list'),
+    path('metrics', views.metrics_view, name='metrics'),
     path('chatbot/', views.chatbot_page, name='chatbot'),
     path('api/chatbot/', views.chatbot_api, name='chatbot_api'),
+    path('api/autocomplete/', views.autocomplete_api, name='autocomplete_api'),
+    path('api/books/search/', views.book_search_api, name='book_search_api'),
+    path('api/isbn/', views.isbn_lookup_api, name='isbn_lookup_api'),
+    path('api/books/options/', views.book_options_api, name='book_options_api'),
 ]
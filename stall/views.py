@@ -1,63 +1,125 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.db.models import Q, Sum, F, Count
-from django.http import JsonResponse
-from .models import Book, Category, Author, Member, BorrowRecord, BookCopy, Reservation
-from .forms import BorrowForm, MemberForm, ReservationForm
+from django.db.models import Q, Sum, F, Count, prefetch_related_objects
+from django.http import HttpResponse, JsonResponse
+from django.conf import settings
+from django.urls import reverse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.static import serve
+from .models import Book, Category, Author, Publisher, Member, BorrowRecord, BookCopy, Reservation, Job, CirculationEvent
+from .forms import BOOK_SCOPES, BorrowForm, MemberForm, ReservationForm
+from .circulation import (
+    CirculationError, checkout, checkout_barcode, hold_queue, lookup_member_card,
+    place_hold, queue_position, return_barcode, return_copy, start_pickup_window
+)
+from .thumbnails import THUMBNAIL_DIR, THUMBNAIL_MAX_AGE
+from .trending import top_books
+from . import autocomplete, events, facets, inventory, isbn, jobs, metrics, recommendations, reports, search
+from .tasks import MAINTENANCE_TASKS
 from django.utils import timezone
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import csv
+import io
+import json
+import mimetypes
+import os
+import re
+
+HOME_CLOSE_MATCHES = 24
+
+# Values listed per facet, most books first; the selected value is always shown
+FACET_OPTIONS_SHOWN = 10
+
+def _facet_groups(request, chosen, counts):
+    """Sidebar data: each facet's top values with counts and the link that selects each one"""
+    groups = []
+    for facet in facets.FACETS:
+        shown = sorted(counts[facet], key=lambda value: -counts[facet][value])[:FACET_OPTIONS_SHOWN]
+        if facet in chosen and chosen[facet] not in shown:
+            shown.append(chosen[facet])
+        names = facets.labels(facet, shown)
+        params = request.GET.copy()
+        params[facet] = 'any'
+        options = [{'label': 'Any', 'count': None, 'url': f'?{params.urlencode()}', 'active': facet not in chosen}]
+        for value in sorted(shown, key=lambda value: (-counts[facet].get(value, 0), names[value])):
+            params[facet] = value
+            options.append({
+                'label': names[value],
+                'count': counts[facet].get(value, 0),
+                'url': f'?{params.urlencode()}',
+                'active': chosen.get(facet) == value,
+            })
+        groups.append({'name': facets.FACET_LABELS[facet], 'options': options})
+    return groups
+
+def _home_context(request):
+    chosen = facets.selection(request.GET)
+    catalog = facets.filter_books(Book.objects.all(), chosen)
+    books = catalog.select_related('category').prefetch_related('authors')
+    
+    # Search functionality
+    search_query = request.GET.get('search')
+    search_ids = None
+    if search_query:
+        search_ids = set(Book.objects.filter(
+            Q(title__icontains=search_query) | 
+            Q(description__icontains=search_query) |
+            Q(authors__first_name__icontains=search_query) |
+            Q(authors__last_name__icontains=search_query)
+        ).values_list('pk', flat=True).distinct())
+        books = books.filter(pk__in=search_ids)
+    
+    book_list = list(books)
+    close_matches = bool(search_query) and not book_list
+    if close_matches:
+        # Nothing contains the query as typed; fall back to titles and authors that resemble it
+        matches = search.search_books(search_query, limit=HOME_CLOSE_MATCHES)
+        search_ids = {book.pk for book, _ in matches}
+        shown = facets.index.matching(search_ids, chosen)
+        book_list = [book for book, _ in matches if book.pk in shown]
+    
+    # Counts come from the in-memory facet index, not a COUNT query per facet
+    counts, total = facets.index.counts(chosen, base_ids=search_ids)
+    return {
+        'books': book_list,
+        'facet_groups': _facet_groups(request, chosen, counts),
+        'total_matches': total,
+        # Kept when the search box is submitted
+        'facet_params': [(facet, request.GET[facet]) for facet in facets.FACETS if request.GET.get(facet)],
+        'search_query': search_query,
+        'close_matches': close_matches,
+    }
 
 def home(request):
-    """Home page showing available books"""
+    """Home page: the catalog with search and facet filters"""
     try:
-        categories = Category.objects.all()
-        books = Book.objects.filter(is_available=True).prefetch_related('authors')
-        
-        # Filter by category if specified
-        category_id = request.GET.get('category')
-        if category_id:
-            books = books.filter(category_id=category_id)
-        
-        # Search functionality
-        search_query = request.GET.get('search')
-        if search_query:
-            books = books.filter(
-                Q(title__icontains=search_query) | 
-                Q(description__icontains=search_query) |
-                Q(authors__first_name__icontains=search_query) |
-                Q(authors__last_name__icontains=search_query)
-            ).distinct()
-        
-        context = {
-            'books': books,
-            'categories': categories,
-            'search_query': search_query,
-            'selected_category': category_id
-        }
-        return render(request, 'stall/home.html', context)
+        context = _home_context(request)
     except Exception as e:
         # Handle any database errors gracefully
         context = {
             'books': [],
-            'categories': [],
+            'facet_groups': [],
             'search_query': '',
-            'selected_category': None,
             'error_message': f'Database error: {str(e)}'
         }
-        return render(request, 'stall/home.html', context)
+    return render(request, 'stall/home.html', context)
 
-def book_detail(request, book_id):
-    """Detail view for a specific book"""
-    book = get_object_or_404(Book, id=book_id)
-    available_copies = BookCopy.objects.filter(book=book, is_available=True)
-    
-    context = {
+def _book_detail_context(book_id):
+    book = get_object_or_404(
+        Book.objects.select_related('category', 'publisher').prefetch_related('authors'),
+        id=book_id
+    )
+    return {
         'book': book,
-        'available_copies': available_copies,
-        'total_copies': book.copies.count(),
-        'available_count': available_copies.count()
+        'available_copies': list(BookCopy.objects.filter(book=book, is_available=True)) if book.available_copies else [],
+        'holds_waiting': 0 if book.is_available else hold_queue(book).count(),
+        'also_borrowed': recommendations.also_borrowed(book),
     }
-    return render(request, 'stall/book_detail.html', context)
+
+def book_detail(request, book_id):
+    """Detail view for a specific book"""
+    return render(request, 'stall/book_detail.html', _book_detail_context(book_id))
 
 def borrow_book(request):
     """Create a new book borrowing record"""
@@ -86,10 +148,31 @@ def borrow_book(request):
     
     return render(request, 'stall/borrow_book.html', {'member_form': member_form})
 
+BOOK_OPTIONS_PAGE_SIZE = 20
+ARCHIVE_PAGE_SIZE = 25
+
+def _page_number(request):
+    try:
+        return max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return 1
+
+def _book_options(scope, query='', page=1, per_page=BOOK_OPTIONS_PAGE_SIZE):
+    """One page of books in `scope` matching `query`, plus whether more follow.
+
+    Fetches one row past the page instead of counting, so the cost depends on
+    the page size rather than the size of the catalog.
+    """
+    books = Book.objects.filter(BOOK_SCOPES[scope])
+    if query:
+        books = books.filter(Q(title__icontains=query) | Q(isbn__startswith=query))
+    start = (page - 1) * per_page
+    rows = list(books.order_by('title', 'pk')[start:start + per_page + 1])
+    return rows[:per_page], len(rows) > per_page
+
 def select_books_to_borrow(request, member_id):
     """Select books to borrow for a member"""
     member = get_object_or_404(Member, id=member_id)
-    available_books = Book.objects.filter(is_available=True).prefetch_related('authors')
     
     if request.method == 'POST':
         book_id = request.POST.get('book_id')
@@ -116,19 +199,16 @@ def select_books_to_borrow(request, member_id):
             except:
                 pass
         
-        borrow_record = BorrowRecord.objects.create(
-            member=member,
-            book=book,
-            due_date=due_date,
-            issued_by=request.user if request.user.is_authenticated else None
-        )
-        
-        # Update book availability if no more copies available
-        available_copies = BookCopy.objects.filter(book=book, is_available=True)
-        if available_copies.exists():
-            copy = available_copies.first()
-            copy.is_available = False
-            copy.save()
+        try:
+            checkout(
+                member,
+                book,
+                due_date,
+                issued_by=request.user if request.user.is_authenticated else None
+            )
+        except CirculationError as e:
+            messages.error(request, str(e))
+            return redirect('select_books_to_borrow', member_id=member.id)
         
         messages.success(request, f'Book "{book.title}" borrowed successfully!')
         return redirect('select_books_to_borrow', member_id=member.id)
@@ -139,9 +219,17 @@ def select_books_to_borrow(request, member_id):
         return_date__isnull=True
     ).select_related('book')
     
+    search_query = request.GET.get('search', '').strip()
+    page = _page_number(request)
+    books, has_more = _book_options('available', search_query, page, per_page=12)
+    prefetch_related_objects(books, 'authors', 'category')
+    
     context = {
         'member': member,
-        'available_books': available_books,
+        'books': books,
+        'search_query': search_query,
+        'page': page,
+        'has_more': has_more,
         'current_borrowings': current_borrowings
     }
     return render(request, 'stall/select_books_to_borrow.html', context)
@@ -151,99 +239,225 @@ def return_book(request, borrow_id):
     borrow_record = get_object_or_404(BorrowRecord, id=borrow_id)
     
     if request.method == 'POST':
-        borrow_record.return_date = date.today()
-        borrow_record.status = 'returned'
-        
-        # Calculate fine if overdue
-        if borrow_record.is_overdue:
-            days_overdue = borrow_record.days_overdue
-            fine_per_day = 5  # BDT 5 per day
-            borrow_record.fine_amount = days_overdue * fine_per_day
-        
-        borrow_record.save()
-        
-        # Make book copy available again
-        copy = BookCopy.objects.filter(book=borrow_record.book, is_available=False).first()
-        if copy:
-            copy.is_available = True
-            copy.save()
+        # Records the return, then passes the copy to the next hold or back to the shelf
+        try:
+            next_loan = return_copy(
+                borrow_record,
+                issued_by=request.user if request.user.is_authenticated else None
+            )
+        except CirculationError as e:
+            messages.error(request, str(e))
+            return redirect('borrowing_list')
         
         messages.success(request, f'Book "{borrow_record.book.title}" returned successfully!')
+        if next_loan:
+            messages.info(request, f'Copy issued to {next_loan.member.full_name} from the hold queue.')
         return redirect('borrowing_list')
     
     return render(request, 'stall/return_book.html', {'borrow_record': borrow_record})
 
-def borrowing_list(request):
-    """List all borrowing records"""
-    borrowings = BorrowRecord.objects.all().select_related('member', 'book').order_by('-borrow_date')
-    
-    # Filter by status
+def _filter_borrowings(request):
+    """Borrow records narrowed by the status and member filters in the query string"""
+    borrowings = BorrowRecord.objects.all()
     status = request.GET.get('status')
     if status:
         borrowings = borrowings.filter(status=status)
-    
-    # Filter by member
     member_id = request.GET.get('member')
     if member_id:
         borrowings = borrowings.filter(member_id=member_id)
+    return borrowings, status
+
+def _borrowing_summary(borrowings):
+    """Counts per status, open and overdue loans, and fines, from one GROUP BY status query"""
+    today = date.today()
+    rows = borrowings.order_by().values('status').annotate(
+        count=Count('pk'),
+        open=Count('pk', filter=Q(return_date__isnull=True)),
+        overdue=Count('pk', filter=Q(return_date__isnull=True, due_date__lt=today)),
+        fines=Sum('fine_amount'),
+    )
+    
+    summary = {
+        'by_status': {value: 0 for value, _ in BorrowRecord.STATUS_CHOICES},
+        'total': 0,
+        'currently_borrowed': 0,
+        'overdue': 0,
+        'total_fines': Decimal('0.00'),
+    }
+    for row in rows:
+        summary['by_status'][row['status']] = row['count']
+        summary['total'] += row['count']
+        summary['currently_borrowed'] += row['open']
+        summary['overdue'] += row['overdue']
+        summary['total_fines'] += row['fines'] or 0
+    return summary
+
+def borrowing_list(request):
+    """List all borrowing records"""
+    borrowings, status = _filter_borrowings(request)
     
     context = {
-        'borrowings': borrowings,
+        'borrowings': borrowings.select_related('member', 'book').prefetch_related('book__authors').order_by('-borrow_date'),
+        'summary': _borrowing_summary(borrowings),
         'status_choices': BorrowRecord.STATUS_CHOICES,
         'selected_status': status,
         'members': Member.objects.filter(is_active=True)
     }
     return render(request, 'stall/borrowing_list.html', context)
 
+def borrowing_summary_api(request):
+    """Borrowing summary for the current filters as JSON"""
+    borrowings, _ = _filter_borrowings(request)
+    return JsonResponse(_borrowing_summary(borrowings))
+
+def _parse_moment(value):
+    """A datetime (or a date, meaning its start) from the query string; ValueError if malformed"""
+    return datetime.fromisoformat(value) if value else None
+
+def circulation_events_api(request):
+    """Circulation events with start <= occurred_at < end, oldest first; pass `after` (an event id) for the next page"""
+    try:
+        start = _parse_moment(request.GET.get('start'))
+        end = _parse_moment(request.GET.get('end'))
+        limit = max(1, min(int(request.GET.get('limit', 100)), events.MAX_PAGE))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start, end or limit'}, status=400)
+    
+    after = None
+    if request.GET.get('after', '').isdigit():
+        after = CirculationEvent.objects.filter(pk=request.GET['after']).values_list('occurred_at', 'id').first()
+    rows = list(events.between(start, end, after=after)[:limit + 1])
+    kinds = dict(CirculationEvent.KIND_CHOICES)
+    return JsonResponse({
+        'events': [
+            {
+                'id': event.id,
+                'occurred_at': event.occurred_at.isoformat(),
+                'kind': kinds[event.kind],
+                'loan_id': event.loan_id,
+                'book_id': event.book_id,
+                'member_id': event.member_id,
+                'copy_id': event.copy_id,
+                'status': event.status,
+                'due_date': event.due_date.isoformat() if event.due_date else None,
+            }
+            for event in rows[:limit]
+        ],
+        'next': rows[limit - 1].id if len(rows) > limit else None,
+    })
+
+def on_loan_api(request):
+    """Loans that were open at `at`, replayed from the circulation event log"""
+    try:
+        at = _parse_moment(request.GET.get('at')) or timezone.now()
+    except ValueError:
+        return JsonResponse({'error': 'Invalid date'}, status=400)
+    
+    loans = events.on_loan_at(at)
+    rows = list(loans[:events.MAX_PAGE])
+    return JsonResponse({
+        'at': at.isoformat(),
+        'count': len(rows) if len(rows) < events.MAX_PAGE else loans.count(),
+        'loans': [
+            {
+                'loan_id': loan_id,
+                'book_id': book_id,
+                'member_id': member_id,
+                'copy_id': copy_id,
+                'since': since.isoformat(),
+            }
+            for loan_id, book_id, member_id, copy_id, since in rows
+        ],
+    })
+
 def member_detail(request, member_id):
     """Detail view for a specific member"""
     member = get_object_or_404(Member, id=member_id)
-    borrowing_history = BorrowRecord.objects.filter(member=member).select_related('book')
+    
+    reservations = list(
+        Reservation.objects.filter(member=member, status='pending').select_related('book')
+    )
+    for reservation in reservations:
+        reservation.queue_position = queue_position(reservation)
     
     context = {
         'member': member,
-        'borrowing_history': borrowing_history,
-        'active_borrowings': member.active_borrowings,
-        'overdue_books': member.overdue_books
+        # One query loads the live history; the rest is partitioned from it in memory
+        'borrowing_history': member.borrowing_history,
+        'current_borrowings': member.active_borrowings,
+        'overdue_books': member.overdue_books,
+        'borrowing_stats': member.borrowing_stats,
+        'archived_count': member.archived_totals['loans'],
+        'reservations': reservations
     }
+    # Archived loans are only read when the member's older history is asked for
+    if request.GET.get('history') == 'archived':
+        page = _page_number(request)
+        start = (page - 1) * ARCHIVE_PAGE_SIZE
+        rows = list(
+            member.archived_loans.select_related('book').prefetch_related('book__authors')[start:start + ARCHIVE_PAGE_SIZE + 1]
+        )
+        context.update({
+            'archived_loans': rows[:ARCHIVE_PAGE_SIZE],
+            'archive_page': page,
+            'archive_has_more': len(rows) > ARCHIVE_PAGE_SIZE,
+        })
     return render(request, 'stall/member_detail.html', context)
 
-def dashboard(request):
-    """Dashboard with library statistics"""
-    today = timezone.now().date()
-    
-    # Today's statistics
-    today_borrowings = BorrowRecord.objects.filter(borrow_date=today)
-    today_returns = BorrowRecord.objects.filter(return_date=today)
-    
-    # Overall statistics
-    total_books = Book.objects.count()
-    total_members = Member.objects.filter(is_active=True).count()
-    active_borrowings = BorrowRecord.objects.filter(return_date__isnull=True).count()
-    overdue_books = BorrowRecord.objects.filter(
-        return_date__isnull=True,
-        due_date__lt=today
-    ).count()
+def reserve_book(request, member_id):
+    """Place a member in the hold queue for a book"""
+    member = get_object_or_404(Member, id=member_id)
     
-    # Popular books
-    popular_books = Book.objects.annotate(
-        borrow_count=Count('borrowrecord')
-    ).order_by('-borrow_count')[:5]
+    if request.method == 'POST':
+        form = ReservationForm(request.POST)
+        if form.is_valid():
+            try:
+                reservation = place_hold(member, form.cleaned_data['book'], form.cleaned_data['notes'])
+            except CirculationError as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(
+                    request,
+                    f'Hold placed on "{reservation.book.title}" (position {queue_position(reservation)} in queue).'
+                )
+                return redirect('member_detail', member_id=member.id)
+    else:
+        form = ReservationForm(initial={'book': request.GET.get('book')})
     
-    # Recent activities
-    recent_borrowings = BorrowRecord.objects.all().select_related('member', 'book')[:5]
+    return render(request, 'stall/reserve_book.html', {'member': member, 'form': form})
+
+def cancel_reservation(request, reservation_id):
+    """Cancel a pending hold"""
+    reservation = get_object_or_404(Reservation, id=reservation_id)
     
-    context = {
-        'today_borrowings_count': today_borrowings.count(),
-        'today_returns_count': today_returns.count(),
-        'total_books': total_books,
-        'total_members': total_members,
-        'active_borrowings': active_borrowings,
-        'overdue_books': overdue_books,
-        'popular_books': popular_books,
-        'recent_borrowings': recent_borrowings
+    if request.method == 'POST':
+        Reservation.objects.filter(pk=reservation.pk, status='pending').update(status='cancelled')
+        # The next member in line may now have a copy waiting
+        start_pickup_window(reservation.book_id)
+        messages.success(request, f'Hold on "{reservation.book.title}" cancelled.')
+    return redirect('member_detail', member_id=reservation.member_id)
+
+def _dashboard_context():
+    today = timezone.now().date()
+    return {
+        # Today's statistics
+        'today_borrowings_count': BorrowRecord.objects.filter(borrow_date=today).count(),
+        'today_returns_count': BorrowRecord.objects.filter(return_date=today).count(),
+        # Overall statistics
+        'total_books': Book.objects.count(),
+        'total_members': Member.objects.filter(is_active=True).count(),
+        'active_borrowings': BorrowRecord.objects.filter(return_date__isnull=True).count(),
+        'overdue_books': BorrowRecord.objects.filter(return_date__isnull=True, due_date__lt=today).count(),
+        # Popular books, from the daily rollups instead of scanning every borrow record
+        'popular_books': top_books(days=None, limit=5, today=today),
+        'trending_books': top_books(days=7, limit=5, today=today),
+        # Recent activities
+        'recent_borrowings': list(BorrowRecord.objects.all().select_related('member', 'book')[:5]),
     }
-    return render(request, 'stall/dashboard.html', context)
+
+def dashboard(request):
+    """Dashboard with library statistics"""
+    return render(request, 'stall/dashboard.html', _dashboard_context())
 
 def authors_list(request):
     """List all authors"""
@@ -276,7 +490,7 @@ def author_detail(request, author_id):
 
 def members_list(request):
     """List all members"""
-    members = Member.objects.filter(is_active=True).order_by('last_name', 'first_name')
+    members = Member.objects.filter(is_active=True)
     
     search_query = request.GET.get('search')
     if search_query:
@@ -287,15 +501,304 @@ def members_list(request):
             Q(email__icontains=search_query)
         )
     
+    member_stats = members.aggregate(
+        total=Count('id'),
+        students=Count('id', filter=Q(membership_type='student')),
+        faculty=Count('id', filter=Q(membership_type='faculty'))
+    )
+    
+    # Per-member loan counts in the same query instead of three queries per card
+    today = date.today()
+    members = members.annotate(
+        total_borrowings=Count('borrowrecord'),
+        active_count=Count('borrowrecord', filter=Q(borrowrecord__return_date__isnull=True)),
+        overdue_count=Count(
+            'borrowrecord',
+            filter=Q(borrowrecord__return_date__isnull=True, borrowrecord__due_date__lt=today)
+        )
+    ).order_by('last_name', 'first_name')
+    
     context = {
         'members': members,
+        'member_stats': member_stats,
         'search_query': search_query
     }
     return render(request, 'stall/members_list.html', context)
 
+def serve_thumbnail(request, path):
+    """Serve generated thumbnails; names are content-hashed so they never go stale"""
+    response = serve(request, path, document_root=os.path.join(settings.MEDIA_ROOT, THUMBNAIL_DIR))
+    patch_cache_control(response, public=True, max_age=THUMBNAIL_MAX_AGE, immutable=True)
+    return response
+
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.')
+
+# Precompressed variants written by collectstatic, best first
+STATIC_ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+def serve_static(request, path):
+    """Serve collected static files, sending a precompressed copy when the client accepts one"""
+    accepted = request.headers.get('Accept-Encoding', '')
+    content_type, _ = mimetypes.guess_type(path)
+    response = None
+    for encoding, suffix in STATIC_ENCODINGS:
+        if encoding in accepted and os.path.isfile(os.path.join(settings.STATIC_ROOT, path + suffix)):
+            response = serve(request, path + suffix, document_root=settings.STATIC_ROOT)
+            if response.status_code == 200:
+                response.headers['Content-Type'] = content_type or 'application/octet-stream'
+                response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = serve(request, path, document_root=settings.STATIC_ROOT)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if HASHED_NAME.search(os.path.basename(path)):
+        patch_cache_control(response, public=True, max_age=STATIC_MAX_AGE, immutable=True)
+    return response
+
+def circulation_desk(request):
+    """Scan-driven checkout and return desk"""
+    member = None
+    member_id = request.session.get('desk_member_id')
+    if member_id:
+        member = Member.objects.filter(id=member_id, is_active=True).first()
+    return render(request, 'stall/circulation_desk.html', {'member': member})
+
+def desk_scan_api(request):
+    """Handle one desk scan: a member card, or a copy barcode to check out or return"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    mode = data.get('mode')
+    code = (data.get('code') or '').strip()
+    if not code:
+        return JsonResponse({'error': 'Code is required'}, status=400)
+    issued_by = request.user if request.user.is_authenticated else None
+    
+    try:
+        if mode == 'member':
+            member = lookup_member_card(code)
+            request.session['desk_member_id'] = member.id
+            return JsonResponse({
+                'status': 'success',
+                'member': {'id': member.id, 'name': member.full_name, 'membership_id': member.membership_id},
+                'message': f'{member.full_name} ready for checkout.'
+            })
+        
+        if mode == 'checkout':
+            member_id = request.session.get('desk_member_id')
+            if not member_id:
+                return JsonResponse({'error': 'Scan a member card first'}, status=400)
+            member = Member.objects.filter(id=member_id, is_active=True).first()
+            if member is None:
+                # Removed or deactivated since the card was scanned
+                del request.session['desk_member_id']
+                return JsonResponse({'error': 'Member not found; scan the card again'}, status=404)
+            loan = checkout_barcode(member, code, issued_by=issued_by)
+            return JsonResponse({
+                'status': 'success',
+                'loan_id': loan.id,
+                'message': f'"{loan.book.title}" due {loan.due_date:%b %d, %Y}.'
+            })
+        
+        if mode == 'return':
+            loan, next_loan = return_barcode(code, issued_by=issued_by)
+            message = f'"{loan.book.title}" returned by {loan.member.full_name}.'
+            if next_loan:
+                message += f' Issued to next hold: {next_loan.member.full_name}.'
+            return JsonResponse({
+                'status': 'success',
+                'loan_id': loan.id,
+                'fine_amount': str(loan.fine_amount),
+                'message': message
+            })
+    except CirculationError as e:
+        return JsonResponse({'error': str(e)}, status=409)
+    
+    return JsonResponse({'error': 'Unknown mode'}, status=400)
+
+def autocomplete_api(request):
+    """Typeahead suggestions for the book, author and member search boxes"""
+    query = request.GET.get('q', '')
+    kinds = [kind for kind in request.GET.get('type', '').split(',') if kind in autocomplete.KINDS]
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), autocomplete.MAX_LIMIT))
+    except ValueError:
+        limit = 10
+    
+    results = autocomplete.index.search(query, kinds=kinds or autocomplete.KINDS, limit=limit)
+    return JsonResponse({'query': query, 'results': results})
+
+def book_search_api(request):
+    """Books whose title or authors resemble the query, ranked by trigram similarity"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), autocomplete.MAX_LIMIT))
+    except ValueError:
+        limit = 10
+    
+    results = [
+        {
+            'id': book.id,
+            'title': book.title,
+            'authors': book.author_names,
+            'score': score,
+            'url': reverse('book_detail', args=[book.id]),
+        }
+        for book, score in search.search_books(query, limit=limit)
+    ]
+    return JsonResponse({'query': query, 'results': results})
+
+def isbn_lookup_api(request):
+    """Catalog details for an ISBN from the local ISBN index, to prefill new books"""
+    number = isbn.normalize(request.GET.get('isbn', ''))
+    if number is None:
+        return JsonResponse({'error': 'Invalid ISBN'}, status=400)
+    try:
+        fields = isbn.index.lookup(number)
+    except isbn.IndexMissing as e:
+        return JsonResponse({'error': str(e)}, status=503)
+    if fields is None:
+        return JsonResponse({'error': 'ISBN not found'}, status=404)
+    
+    publisher = Publisher.objects.filter(name__iexact=fields.get('publisher', '')).values('id', 'name').first()
+    return JsonResponse({
+        'isbn': number,
+        'book': isbn.book_fields(fields),
+        'publisher': publisher or ({'id': None, 'name': fields['publisher']} if fields.get('publisher') else None),
+        'year': fields.get('year'),
+        'by': fields.get('by', ''),
+        'existing_book_id': Book.objects.filter(isbn=number).values_list('id', flat=True).first(),
+    })
+
+def _parse_month(value, default):
+    try:
+        return date.fromisoformat(f'{value}-01')
+    except (TypeError, ValueError):
+        return default
+
+def circulation_reports(request):
+    """Monthly loan volume and average loan length by category, language, membership type or publisher"""
+    dimension = request.GET.get('dimension', 'category')
+    if dimension not in reports.DIMENSIONS:
+        dimension = 'category'
+    this_month = reports.month_start(date.today())
+    end = min(_parse_month(request.GET.get('end'), this_month), this_month)
+    start = min(_parse_month(request.GET.get('start'), end.replace(year=end.year - 1)), end)
+    # Each month is aggregated separately, so keep a request to a bounded number of them
+    earliest = end.replace(year=end.year - reports.MAX_MONTHS // 12)
+    start = max(start, earliest)
+    
+    rows, summary = reports.monthly_report(dimension, start, end)
+    dimension_label = dict(reports.DIMENSION_CHOICES)[dimension]
+    
+    if request.GET.get('format') == 'csv':
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = (
+            f'attachment; filename="circulation-{dimension}-{start:%Y-%m}-{end:%Y-%m}.csv"'
+        )
+        writer = csv.writer(response)
+        writer.writerow(['Month', dimension_label, 'Loans', 'Average loan days'])
+        for row in rows:
+            writer.writerow([f"{row['month']:%Y-%m}", row['label'], row['loans'], row['average_days'] or ''])
+        return response
+    
+    context = {
+        'rows': rows,
+        'summary': summary,
+        'dimension': dimension,
+        'dimension_label': dimension_label,
+        'dimension_choices': reports.DIMENSION_CHOICES,
+        'start': start,
+        'end': end,
+    }
+    return render(request, 'stall/reports.html', context)
+
+# Barcodes listed per category and shelf on the stock-take page; the JSON has them all
+INVENTORY_DETAIL_LIMIT = 50
+
+def inventory_reconcile(request):
+    """Upload a shelf scan file and compare it with the recorded copies (JSON with ?format=json)"""
+    wants_json = request.GET.get('format') == 'json'
+    context = {'report': None, 'detail_limit': INVENTORY_DETAIL_LIMIT}
+    if request.method == 'POST':
+        upload = request.FILES.get('scans')
+        error = None
+        if upload is None:
+            error = 'Choose a scan file to upload.'
+        else:
+            try:
+                # Read line by line from the upload, which Django spools to disk when large
+                lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+                scans, conditions = inventory.read_scans(lines, shelf=request.POST.get('shelf', '').strip() or None)
+            except inventory.ScanFormatError as e:
+                error = str(e)
+            except UnicodeDecodeError:
+                error = 'The scan file must be UTF-8 text.'
+        if error:
+            if wants_json:
+                return JsonResponse({'error': error}, status=400)
+            messages.error(request, error)
+            return render(request, 'stall/inventory.html', context)
+        
+        copies = inventory.snapshot()
+        report = inventory.reconcile(scans, copies)
+        updated = None
+        if request.POST.get('apply'):
+            changed, relocated = inventory.apply(scans, conditions, relocate=bool(request.POST.get('relocate')), copies=copies)
+            updated = {'conditions': changed, 'relocated': relocated}
+        if wants_json:
+            return JsonResponse({'summary': inventory.totals(report), 'shelves': report, 'updated': updated})
+        
+        if updated is not None:
+            messages.success(request, f'Saved {changed} condition change(s) and {relocated} shelf move(s).')
+        context.update({'report': report, 'summary': inventory.totals(report)})
+    return render(request, 'stall/inventory.html', context)
+
+def job_status(request):
+    """Background job queue: counts, recent jobs and buttons to start maintenance jobs"""
+    if request.method == 'POST':
+        name = request.POST.get('job')
+        if name not in dict(MAINTENANCE_TASKS):
+            messages.error(request, 'Unknown job.')
+        else:
+            job = jobs.enqueue(name, dedup_key=name)
+            messages.success(request, f'Job "{job.name}" is {job.get_status_display().lower()} (#{job.pk}).')
+        return redirect('job_status')
+    
+    counts = dict(Job.objects.order_by().values_list('status').annotate(count=Count('pk')))
+    context = {
+        'status_counts': [(label, counts.get(value, 0)) for value, label in Job.STATUS_CHOICES],
+        'recent_jobs': Job.objects.all()[:50],
+        'maintenance_tasks': MAINTENANCE_TASKS,
+    }
+    return render(request, 'stall/job_status.html', context)
+
+def book_options_api(request):
+    """Paged book search for LazySelect pickers"""
+    scope = request.GET.get('scope', 'available')
+    if scope not in BOOK_SCOPES:
+        return JsonResponse({'error': f'Unknown scope "{scope}"'}, status=400)
+    
+    page = _page_number(request)
+    books, has_more = _book_options(scope, request.GET.get('q', '').strip(), page)
+    return JsonResponse({
+        'results': [{'id': book.id, 'text': str(book)} for book in books],
+        'page': page,
+        'has_more': has_more,
+    })
+
+def metrics_view(request):
+    """This process's metrics in the Prometheus text format"""
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # Chatbot Views
 from .chatbot import LibraryChatbot
-import json
 
 def chatbot_page(request):
     """Chatbot page"""
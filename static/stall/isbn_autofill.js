@@ -0,0 +1,47 @@
+// Fill the empty fields of the book form from the local ISBN index when an ISBN is typed or scanned
+document.addEventListener('DOMContentLoaded', function () {
+    const isbnInput = document.getElementById('id_isbn');
+    if (!isbnInput || !isbnInput.dataset.lookupUrl) return;
+
+    const status = document.createElement('div');
+    status.className = 'help';
+    isbnInput.insertAdjacentElement('afterend', status);
+
+    function fillIfEmpty(id, value) {
+        const field = document.getElementById(id);
+        if (field && value && !field.value) field.value = value;
+    }
+
+    isbnInput.addEventListener('change', function () {
+        const value = isbnInput.value.trim();
+        if (!value) return;
+        status.textContent = 'Looking up ISBN…';
+        fetch(isbnInput.dataset.lookupUrl + '?isbn=' + encodeURIComponent(value))
+            .then(response => response.json())
+            .then(data => {
+                if (data.error) {
+                    status.textContent = data.error;
+                    return;
+                }
+                const isNew = !document.getElementById('id_title').value;
+                isbnInput.value = data.isbn;
+                fillIfEmpty('id_title', data.book.title);
+                fillIfEmpty('id_pages', data.book.pages);
+                fillIfEmpty('id_publication_date', data.book.publication_date);
+                if (isNew && data.book.language) document.getElementById('id_language').value = data.book.language;
+
+                const publisher = document.getElementById('id_publisher');
+                if (publisher && !publisher.value && data.publisher && data.publisher.id && window.django) {
+                    django.jQuery(publisher).append(new Option(data.publisher.name, data.publisher.id, true, true)).trigger('change');
+                }
+
+                const notes = [];
+                if (data.existing_book_id) notes.push('Already catalogued as book #' + data.existing_book_id + '.');
+                if (data.publisher && !data.publisher.id) notes.push('Publisher "' + data.publisher.name + '" is not in the catalog yet.');
+                if (!data.book.publication_date && data.year) notes.push('Published ' + data.year + '.');
+                if (data.by) notes.push(data.by);
+                status.textContent = notes.join(' ') || 'Filled from the ISBN index.';
+            })
+            .catch(() => { status.textContent = 'ISBN lookup failed.'; });
+    });
+});
@@ -18,9 +18,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from stall.thumbnails import THUMBNAIL_DIR
+from stall.views import serve_static, serve_thumbnail
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path(f"{settings.MEDIA_URL.strip('/')}/{THUMBNAIL_DIR}/<path:path>", serve_thumbnail, name='thumbnail'),
+    path(f"{settings.STATIC_URL.strip('/')}/<path:path>", serve_static, name='static'),
     path('', include('stall.urls')),
 ]
 